@@ -0,0 +1,189 @@
+"""Auto-battle: the rest of a fight, or a string of encounters, resolved in one go.
+
+`auto_resolve()` plays the rounds of an `Encounter` in a plain loop, with
+the rules of the combat keys (`Encounter.play_round`, then the loot and
+gold of every monster defeated) but none of their per-swing messages or
+redraws. It stops when the fight is won, when the hero dies, or when the
+`AutoPolicy` hands control back to the player: HP below `stop_below` with
+no potion left to drink. Potions are drunk between rounds, for free as from
+the inventory, when HP falls below `drink_below`.
+
+`auto_explore()` chains `Game.wander_encounter` and `auto_resolve` for a
+number of encounters. Both fill a `BattleReport`, shown as a single line.
+
+Policies can be given as text, e.g. "stop=0.3,drink=0.5,potions=no,repeat=20"
+(`parse_policy`): `DND_AUTO` for the terminal game, `--auto` for server.py.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from compat import add_slots
+from encounter import Encounter
+from entities import Player, Potion
+from game import Game
+
+# why an auto-battle stopped
+WON = 'won'
+SLAIN = 'slain'
+LOW_HP = 'low_hp'
+MAX_ROUNDS = 'max_rounds'
+
+
+@add_slots
+@dataclass
+class AutoPolicy:
+	stop_below: float = 0.25  # hand the fight back when HP is below this fraction of max HP (and no potion helps)
+	drink_below: float = 0.5  # drink a potion when HP is below this fraction of max HP
+	use_potions: bool = True
+	max_rounds: int = 1000  # per fight
+	repeat: int = 10  # encounters played by auto_explore
+
+
+# short names of the AutoPolicy fields in a policy spec
+POLICY_KEYS = {'stop': 'stop_below', 'drink': 'drink_below', 'potions': 'use_potions', 'rounds': 'max_rounds', 'repeat': 'repeat'}
+
+
+def parse_policy(spec: str) -> AutoPolicy:
+	"""AutoPolicy from a spec like "stop=0.3,drink=0.5,potions=no,repeat=20"; fields left out keep their default."""
+	policy = AutoPolicy()
+	for item in filter(None, (part.strip() for part in spec.split(','))):
+		key, sep, value = item.partition('=')
+		attr = POLICY_KEYS.get(key.strip())
+		if not sep or attr is None:
+			raise ValueError(f"bad auto-battle setting {item!r}, expected one of {', '.join(k + '=' for k in POLICY_KEYS)}")
+		value = value.strip()
+		if attr == 'use_potions':
+			if value.lower() not in ('yes', 'no', 'on', 'off', '1', '0'):
+				raise ValueError(f"potions= takes yes or no, not {value!r}")
+			setattr(policy, attr, value.lower() in ('yes', 'on', '1'))
+		elif attr in ('max_rounds', 'repeat'):
+			setattr(policy, attr, int(value))
+		else:
+			setattr(policy, attr, float(value))
+	for key in ('stop', 'drink'):
+		fraction = getattr(policy, POLICY_KEYS[key])
+		if not 0 <= fraction <= 1:
+			raise ValueError(f"{key}= is a fraction of max HP between 0 and 1, not {fraction}")
+	for key in ('rounds', 'repeat'):
+		count = getattr(policy, POLICY_KEYS[key])
+		if count < 1:
+			raise ValueError(f"{key}= must be at least 1, not {count}")
+	return policy
+
+
+@add_slots
+@dataclass
+class BattleReport:
+	encounters: int = 0
+	won: int = 0
+	rounds: int = 0
+	kills: int = 0
+	dealt: int = 0
+	taken: int = 0
+	gold: int = 0
+	potions_found: int = 0
+	potions_drunk: int = 0
+	stopped: str = ''  # WON, SLAIN, LOW_HP or MAX_ROUNDS for the last fight
+
+	def summary(self, hero: Player) -> str:
+		if self.stopped == LOW_HP and not self.rounds:
+			return f"Auto-battle: too hurt to fight on ({hero.hp}/{hero.max_hp} HP)."
+		if self.stopped == SLAIN:
+			outcome = "slain"
+		elif self.stopped in (LOW_HP, MAX_ROUNDS):
+			outcome = f"stopped at {hero.hp}/{hero.max_hp} HP"
+		else:
+			outcome = "done" if self.encounters > 1 else "won"
+		fights = f"{self.won}/{self.encounters} fights won, " if self.encounters > 1 else ""
+		out = (f"Auto-battle {outcome}: {fights}{_count(self.rounds, 'round')}, {_count(self.kills, 'kill')}, "
+			f"dealt {self.dealt}, took {self.taken}, +{self.gold} gold")
+		if self.potions_found:
+			out += f", found {_count(self.potions_found, 'potion')}"
+		if self.potions_drunk:
+			out += f", drank {self.potions_drunk}"
+		return out + "."
+
+
+def _count(n: int, noun: str) -> str:
+	return f"{n} {noun}{'s' if n != 1 else ''}"
+
+
+def _pick_potion(hero: Player) -> Optional[Potion]:
+	"""The smallest potion that heals all the missing HP, else the biggest one."""
+	missing = hero.max_hp - hero.hp
+	potions = hero.list_potions()
+	if not potions:
+		return None
+	enough = [p for p in potions if p.heal >= missing]
+	if enough:
+		return min(enough, key=lambda p: p.heal)
+	return max(potions, key=lambda p: p.heal)
+
+
+def _below(hero: Player, fraction: float) -> bool:
+	return hero.hp < hero.max_hp * fraction
+
+
+def _ready(hero: Player, policy: AutoPolicy, report: BattleReport) -> bool:
+	"""Drink potions as the policy says; False when the hero is still too hurt to go on."""
+	if policy.use_potions:
+		while _below(hero, policy.drink_below):
+			potion = _pick_potion(hero)
+			if potion is None:
+				break
+			hero.drink_potion_kind(potion)
+			report.potions_drunk += 1
+	if _below(hero, policy.stop_below):
+		report.stopped = LOW_HP
+		return False
+	return True
+
+
+def auto_resolve(game: Game, hero: Player, encounter: Encounter, policy: AutoPolicy, report: BattleReport) -> str:
+	"""Fight `encounter` until it is won, the hero dies or the policy stops; returns why it stopped."""
+	rng = game.rng
+	for _ in range(policy.max_rounds):
+		if not _ready(hero, policy, report):
+			return LOW_HP
+		before = hero.hp
+		r = encounter.play_round(hero, rng)
+		report.rounds += 1
+		report.taken += before - hero.hp
+		report.dealt += r.dealt
+		if r.killed:
+			report.kills += 1
+			monster = encounter.monster(r.target)
+			p = game.handle_loot(monster)
+			if p:
+				hero.add_potion(p)
+				report.potions_found += 1
+			gold = game.gold_reward(monster)
+			if gold > 0:
+				hero.add_gold(gold)
+				report.gold += gold
+		if not hero.is_alive():
+			report.stopped = SLAIN
+			return SLAIN
+		if encounter.is_over():
+			report.won += 1
+			report.stopped = WON
+			return WON
+	report.stopped = MAX_ROUNDS
+	return MAX_ROUNDS
+
+
+def auto_explore(game: Game, hero: Player, policy: AutoPolicy, report: BattleReport) -> Optional[Encounter]:
+	"""Wander and auto-battle until `policy.repeat` encounters are fought or a fight stops early.
+	Returns the encounter still going when the policy stopped, None otherwise.
+	"""
+	while report.encounters < policy.repeat:
+		if not _ready(hero, policy, report):
+			# too hurt to look for the next fight
+			return None
+		_, encounter = game.wander_encounter(hero)
+		if encounter is None:
+			continue
+		report.encounters += 1
+		if auto_resolve(game, hero, encounter, policy, report) != WON:
+			return encounter if hero.is_alive() else None
+	return None
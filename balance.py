@@ -0,0 +1,260 @@
+"""Balance explorer: shop gear against monster difficulty.
+
+Sweeps a grid of (weapon, armor, monster difficulty, starting HP) and gives
+for each cell:
+- `death`, the probability that the hero dies in one encounter;
+- `gold_per_encounter`, the expected gold it brings back;
+- the payback of the next weapon and armor tiers: encounters of that gold
+  to afford them.
+
+A cell is a duel fought to the end, the hero striking first, against the
+monster `Game.generate_monster(difficulty)` makes. Every outcome of the
+monster's rolls, and of `Game.gold_reward`, is enumerated by running those
+very functions on a `Dice` stand-in (`outcomes`), and each duel is solved
+exactly (solver.py). Packs and fleeing are not modelled.
+
+Cells are solved on a process pool, and the results are cached in a JSON file
+keyed by a hash of what the cell depends on: the hero's stats and the
+monster distribution with its gold. Re-tuning prices never recomputes
+anything, and re-tuning `generate_monster` only recomputes the cells it
+changes. Output is a CSV table, one row per cell (long format, ready for a
+pivot or heatmap); `--pivot METRIC` also prints weapons x armors matrices.
+
+Usage:
+  python balance.py                                   all shop gear, difficulty 1-3, HP 20/30/40
+  python balance.py --difficulty 1 2 --hp 30 --out balance.csv --pivot death
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from catalog import ArmorType, WeaponType
+from entities import Armor, Player, Weapon
+from game import Game
+from save_manager import write_json_atomic
+from solver import Stats, duel_odds
+
+CACHE_FILE = 'balance_cache.json'
+MODEL_VERSION = 1  # bump when the way a cell is computed changes
+COLUMNS = ['weapon', 'weapon_damage', 'weapon_cost', 'armor', 'armor_value', 'armor_cost', 'difficulty', 'hp',
+	'win', 'death', 'gold_per_encounter', 'expected_rounds',
+	'next_weapon', 'weapon_payback', 'next_armor', 'armor_payback']
+METRICS = ('win', 'death', 'gold_per_encounter', 'expected_rounds', 'weapon_payback', 'armor_payback')
+
+T = TypeVar('T')
+# monster (hp, damage, armor_class), probability, expected gold reward
+MonsterOutcome = Tuple[Stats, float, float]
+
+
+class _Replay:
+	"""Dice stand-in giving scripted rolls; rolls past the script return the lowest face and extend it."""
+
+	def __init__(self, script: List[int]):
+		self.script = script
+		self.ranges: List[Tuple[int, int]] = []
+
+	def randint(self, a: int, b: int) -> int:
+		i = len(self.ranges)
+		self.ranges.append((a, b))
+		if i == len(self.script):
+			self.script.append(a)
+		return self.script[i]
+
+	def roll(self, faces: int) -> int:
+		return self.randint(1, faces)
+
+	def d20(self) -> int:
+		return self.randint(1, 20)
+
+	def d100(self) -> int:
+		return self.randint(1, 100)
+
+
+def outcomes(fn: Callable[[_Replay], T]) -> List[Tuple[T, float]]:
+	"""Every result of `fn(rng)` with its probability, for a fn that only rolls dice (no rng.random())."""
+	out = []
+	todo: List[List[int]] = [[]]
+	while todo:
+		script = todo.pop()
+		fixed = len(script)
+		rng = _Replay(script)
+		result = fn(rng)
+		p = 1.0
+		for a, b in rng.ranges:
+			p /= b - a + 1
+		out.append((result, p))
+		# the rolls this run made first: try their other faces
+		for i in range(fixed, len(rng.ranges)):
+			a, b = rng.ranges[i]
+			for face in range(a + 1, b + 1):
+				todo.append(script[:i] + [face])
+	return out
+
+
+def monster_outcomes(difficulty: int) -> List[MonsterOutcome]:
+	"""The monsters generate_monster(difficulty) can make, merged by stats, with their expected gold."""
+	merged: Dict[Stats, List[float]] = {}
+	for monster, p in outcomes(lambda rng: Game(rng=rng).generate_monster(difficulty)):
+		stats = (monster.hp, monster.damage, monster.armor_class)
+		gold = sum(g * q for g, q in outcomes(lambda rng: Game(rng=rng).gold_reward(monster)))
+		entry = merged.setdefault(stats, [0.0, gold])
+		entry[0] += p
+	return sorted((stats, p, gold) for stats, (p, gold) in merged.items())
+
+
+def hero_stats(weapon: Optional[WeaponType], armor: Optional[ArmorType], hp: int) -> Stats:
+	"""(hp, damage, armor_class) of a hero at full `hp` with this gear, as Player computes them."""
+	hero = Player(name='Hero', hp=hp, max_hp=hp)
+	if weapon is not None:
+		hero.equipped_weapon = Weapon(weapon)
+	if armor is not None:
+		hero.equipped_armor = Armor(armor)
+	return (hero.hp, hero.damage, hero.armor_class)
+
+
+def cell_key(hero: Stats, monsters: Sequence[MonsterOutcome]) -> str:
+	data = json.dumps([MODEL_VERSION, hero, monsters], separators=(',', ':'))
+	return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def solve_cell(hero: Stats, monsters: Sequence[MonsterOutcome]) -> Dict[str, float]:
+	"""Worker entry point: death odds, gold and length of one encounter."""
+	win = death = gold = rounds = 0.0
+	for stats, p, reward in monsters:
+		odds = duel_odds(hero, tuple(stats), with_rounds=False)
+		win += p * odds.win
+		death += p * odds.loss
+		gold += p * odds.win * reward
+		rounds += p * odds.expected_rounds
+	return {'win': win, 'death': death, 'gold_per_encounter': gold, 'expected_rounds': rounds}
+
+
+def load_cache(path: str) -> Dict[str, Dict[str, float]]:
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		# missing or damaged: everything is recomputed
+		return {}
+
+
+def _next_tier(items: Sequence[Any], current: Optional[Any], power: Callable[[Any], int]) -> Optional[Any]:
+	"""Cheapest item stronger than `current` (None: no gear yet, anything is stronger)."""
+	floor = power(current) if current is not None else -1
+	better = [t for t in items if power(t) > floor]
+	return min(better, key=lambda t: (t.cost, -power(t))) if better else None
+
+
+def _payback(cost: Optional[int], gold: float) -> Optional[float]:
+	if cost is None or gold <= 0:
+		return None
+	return cost / gold
+
+
+def explore(weapons: Sequence[Optional[WeaponType]], armors: Sequence[Optional[ArmorType]], difficulties: Sequence[int],
+		hps: Sequence[int], cache_path: str = CACHE_FILE, workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+	"""One row per cell (see COLUMNS) and the number of cells solved, the others coming from the cache."""
+	shop_weapons = [w for w in weapons if w is not None]
+	shop_armors = [a for a in armors if a is not None]
+	monsters = {d: monster_outcomes(d) for d in difficulties}
+	cells = []
+	for d in difficulties:
+		for hp in hps:
+			for w in weapons:
+				for a in armors:
+					hero = hero_stats(w, a, hp)
+					cells.append((w, a, d, hp, hero, cell_key(hero, monsters[d])))
+
+	cache = load_cache(cache_path)
+	todo = {}
+	for w, a, d, hp, hero, key in cells:
+		if key not in cache:
+			todo[key] = (hero, monsters[d])
+	if todo:
+		workers = workers or os.cpu_count() or 1
+		if workers == 1:
+			for key, (hero, ms) in todo.items():
+				cache[key] = solve_cell(hero, ms)
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as pool:
+				futures = {pool.submit(solve_cell, hero, ms): key for key, (hero, ms) in todo.items()}
+				for fut in as_completed(futures):
+					cache[futures[fut]] = fut.result()
+		write_json_atomic(cache_path, cache)
+
+	rows = []
+	for w, a, d, hp, hero, key in cells:
+		result = cache[key]
+		next_w = _next_tier(shop_weapons, w, lambda t: t.damage)
+		next_a = _next_tier(shop_armors, a, lambda t: t.value)
+		gold = result['gold_per_encounter']
+		rows.append({
+			'weapon': w.name if w else '-', 'weapon_damage': w.damage if w else 0, 'weapon_cost': w.cost if w else 0,
+			'armor': a.name if a else '-', 'armor_value': a.value if a else 0, 'armor_cost': a.cost if a else 0,
+			'difficulty': d, 'hp': hp, **result,
+			'next_weapon': next_w.name if next_w else '', 'weapon_payback': _payback(next_w.cost if next_w else None, gold),
+			'next_armor': next_a.name if next_a else '', 'armor_payback': _payback(next_a.cost if next_a else None, gold),
+		})
+	return rows, len(todo)
+
+
+def write_csv(rows: List[Dict[str, Any]], out) -> None:
+	writer = csv.DictWriter(out, fieldnames=COLUMNS, lineterminator='\n')
+	writer.writeheader()
+	for row in rows:
+		writer.writerow({k: (f"{v:.6g}" if isinstance(v, float) else ('' if v is None else v)) for k, v in row.items()})
+
+
+def pivot(rows: List[Dict[str, Any]], metric: str) -> str:
+	"""`metric` as weapons x armors matrices, one per (difficulty, hp)."""
+	armors = list(dict.fromkeys(r['armor'] for r in rows))
+	weapons = list(dict.fromkeys(r['weapon'] for r in rows))
+	width = max(10, *(len(a) + 1 for a in armors))
+	out = []
+	for d, hp in dict.fromkeys((r['difficulty'], r['hp']) for r in rows):
+		cells = {(r['weapon'], r['armor']): r[metric] for r in rows if r['difficulty'] == d and r['hp'] == hp}
+		out.append(f"{metric}, difficulty {d}, HP {hp}")
+		out.append(f"{'':<14}" + ''.join(f"{a:>{width}}" for a in armors))
+		for w in weapons:
+			values = (cells[(w, a)] for a in armors)
+			out.append(f"{w:<14}" + ''.join(f"{'-' if v is None else f'{v:.3g}':>{width}}" for v in values))
+		out.append('')
+	return '\n'.join(out)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Death odds, gold per encounter and upgrade payback for shop gear vs monster difficulty.")
+	parser.add_argument('--difficulty', type=int, nargs='+', default=[1, 2, 3], help="monster difficulties (default 1 2 3)")
+	parser.add_argument('--hp', type=int, nargs='+', default=[20, 30, 40], help="starting HP of the hero (default 20 30 40)")
+	parser.add_argument('--workers', type=int, help="processes solving cells (default: one per CPU)")
+	parser.add_argument('--cache', default=CACHE_FILE, help=f"results of solved cells (default {CACHE_FILE})")
+	parser.add_argument('--out', help="CSV file (default: standard output)")
+	parser.add_argument('--pivot', choices=METRICS, help="also print this metric as weapons x armors matrices (to stderr with no --out)")
+	args = parser.parse_args()
+
+	game = Game()
+	# no gear is a column too: what a new hero starts with
+	weapons = [None] + list(game.get_shop_weapons())
+	armors = [None] + list(game.get_shop_armors())
+	t0 = time.perf_counter()
+	rows, solved = explore(weapons, armors, args.difficulty, args.hp, args.cache, args.workers)
+	elapsed = time.perf_counter() - t0
+	if args.out:
+		with open(args.out, 'w', encoding='utf-8', newline='') as f:
+			write_csv(rows, f)
+	else:
+		write_csv(rows, sys.stdout)
+	info = sys.stdout if args.out else sys.stderr
+	if args.pivot:
+		print(pivot(rows, args.pivot), file=info)
+	print(f"{len(rows)} cells, {solved} solved, {len(rows) - solved} from {args.cache} ({elapsed:.2f}s)", file=info)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,100 @@
+"""Per-instance memory and construction throughput of the entity/item classes.
+
+"before" are plain dataclasses with the same fields (one `__dict__` per
+instance), "after" the slotted classes from entities.py / catalog.py.
+
+Usage: python benchmarks/bench_footprint.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import CATALOG, WeaponType, new_instance_id  # noqa: E402
+from entities import Armor, Monster, Player, Potion, Weapon  # noqa: E402
+from game import Game  # noqa: E402
+
+N = 100_000
+
+
+# Unslotted replicas of the classes, for comparison
+@dataclass
+class PlainPotion:
+	name: str
+	heal: int
+
+
+@dataclass(frozen=True)
+class PlainWeaponType:
+	name: str
+	damage: int
+	cost: int
+
+
+@dataclass
+class PlainWeapon:
+	item_type: WeaponType
+	uid: int = field(default_factory=new_instance_id)
+
+
+@dataclass
+class PlainEntity:
+	name: str
+	hp: int
+	max_hp: int
+
+
+@dataclass
+class PlainMonster(PlainEntity):
+	_damage: int = 2
+	armor: int = 10
+
+
+@dataclass
+class PlainPlayer(PlainEntity):
+	gold: int = 0
+	inventory: List[PlainPotion] = field(default_factory=list)
+	weapons: List[PlainWeapon] = field(default_factory=list)
+	armors: List[Armor] = field(default_factory=list)
+	equipped_weapon: Optional[PlainWeapon] = None
+	equipped_armor: Optional[Armor] = None
+
+
+def bytes_per_instance(factory) -> float:
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	keep = [factory() for _ in range(N)]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	# the list itself holds one pointer per instance
+	return (after - before - sys.getsizeof(keep)) / len(keep)
+
+
+def per_second(factory) -> float:
+	number = 200_000
+	return number / min(timeit.repeat(factory, number=number, repeat=3))
+
+
+def main() -> None:
+	sword = CATALOG.weapon_type('Long Sword', 4, 20)
+	cases = [
+		('Potion', lambda: PlainPotion('Small Healing Potion', 5), lambda: Potion('Small Healing Potion', 5)),
+		('WeaponType', lambda: PlainWeaponType('Long Sword', 4, 20), lambda: WeaponType('Long Sword', 4, 20)),
+		('Weapon', lambda: PlainWeapon(sword), lambda: Weapon(sword)),
+		('Monster', lambda: PlainMonster(name='Goblin', hp=10, max_hp=10, _damage=3, armor=11), lambda: Monster(name='Goblin', hp=10, max_hp=10, _damage=3, armor=11)),
+		('Player', lambda: PlainPlayer(name='Hero', hp=20, max_hp=30), lambda: Player(name='Hero', hp=20, max_hp=30)),
+	]
+	print(f"{'class':<12} {'bytes before':>12} {'bytes after':>12} {'k/s before':>11} {'k/s after':>10}")
+	for name, before, after in cases:
+		print(f"{name:<12} {bytes_per_instance(before):>12.0f} {bytes_per_instance(after):>12.0f} {per_second(before) / 1e3:>11.0f} {per_second(after) / 1e3:>10.0f}")
+
+	game = Game(seed=1)
+	print(f"\nGame.generate_monster(): {per_second(game.generate_monster) / 1e3:.0f} k/s")
+
+
+if __name__ == '__main__':
+	main()
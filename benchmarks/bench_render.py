@@ -0,0 +1,104 @@
+"""Bytes per frame and frames per second of CursesUI.draw, per mode.
+
+Compares the historical full repaint (erase + every addstr sent to the
+terminal) with the DiffScreen renderer, on a recording window that counts
+what would be written to the terminal (text bytes plus a cursor move per
+addstr). Each frame follows a cursor move, as after a keypress.
+
+Usage: python benchmarks/bench_render.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entities import Armor, Player, Potion, Weapon  # noqa: E402
+from game import Game  # noqa: E402
+from render import CURSOR_MOVE_BYTES, DiffScreen  # noqa: E402
+from save_manager import SaveManager  # noqa: E402
+from ui_curses import CursesUI  # noqa: E402
+
+LINES, COLS = 40, 100
+FRAMES = 300
+
+
+class RecordingWindow:
+	"""Stand-in for a curses window that only counts output."""
+
+	def __init__(self):
+		self.bytes = 0
+
+	def getmaxyx(self):
+		return LINES, COLS
+
+	def addstr(self, y, x, text, attr=0):
+		self.bytes += CURSOR_MOVE_BYTES + len(text.encode('utf-8'))
+
+	def erase(self):
+		pass
+
+	def noutrefresh(self):
+		pass
+
+	def refresh(self):
+		pass
+
+
+def make_ui(window, saver) -> CursesUI:
+	hero = Player(name='Hero', hp=20, max_hp=30, gold=300)
+	for _ in range(5):
+		hero.add_potion(Potion('Small Healing Potion', 5))
+	for i in range(6):
+		hero.add_weapon(Weapon.create('Long Sword', 4, 20))
+		hero.add_armor(Armor.create('Chain Mail', 16, 28))
+	ui = CursesUI(window, hero, Game(seed=1), saver)
+	for i in range(60):
+		ui.push_exploration(f"You hit Goblin for {i % 7} damage.")
+	ui.encounter = ui.game.generate_pack(1)
+	return ui
+
+
+def step(ui: CursesUI, i: int) -> None:
+	"""Change what a keypress would change in the current mode."""
+	ui.menu_cursor = i % 3
+	ui.castle_menu_cursor = i % 4
+	ui.shop_view.cursor = i % 6
+	ui.sell_view.cursor = i % 12
+	ui.inventory_view.cursor = i % 17
+	if ui.mode in ('explore', 'combat'):
+		ui.push_exploration(f"Round {i}: Goblin misses!")
+
+
+def measure(ui: CursesUI, window: RecordingWindow, mode: str):
+	ui.mode = mode
+	ui.draw()
+	window.bytes = 0
+	t0 = time.perf_counter()
+	for i in range(FRAMES):
+		step(ui, i)
+		ui.draw()
+	elapsed = time.perf_counter() - t0
+	return window.bytes / FRAMES, FRAMES / elapsed
+
+
+def main() -> None:
+	modes = ('main_menu', 'castle_menu', 'castle_shop', 'sell', 'inventory', 'explore', 'combat')
+	with tempfile.TemporaryDirectory() as tmp:
+		saver = SaveManager(os.path.join(tmp, 'save.json'))
+		full_win, diff_win = RecordingWindow(), RecordingWindow()
+		full = make_ui(full_win, saver)
+		full.stdscr = full_win  # historical behaviour: draw straight to the terminal
+		diff = make_ui(diff_win, saver)
+		diff.stdscr = DiffScreen(diff_win, doupdate=lambda: None)
+		print(f"{'mode':<12} {'B/frame full':>13} {'B/frame diff':>13} {'fps full':>9} {'fps diff':>9}")
+		for mode in modes:
+			bf, ff = measure(full, full_win, mode)
+			bd, fd = measure(diff, diff_win, mode)
+			print(f"{mode:<12} {bf:>13.0f} {bd:>13.0f} {ff:>9.0f} {fd:>9.0f}")
+		saver.close()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,63 @@
+"""JSON vs binary save: file size, save and load time for growing inventories.
+
+Usage: python benchmarks/bench_save_formats.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entities import Armor, Player, Potion, Weapon  # noqa: E402
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+
+
+def make_player(items: int) -> Player:
+	"""Veteran hero with `items` items split between potions, weapons and armors."""
+	player = Player(name='Veteran', hp=30, max_hp=30, gold=12345)
+	for i in range(items):
+		kind = i % 3
+		if kind == 0:
+			player.inventory.add(Potion(name='Small Healing Potion', heal=5))
+		elif kind == 1:
+			player.weapons.append(Weapon.create(name=('Short Sword', 'Long Sword', 'Great Axe')[i % 3 - 1], damage=2 + i % 5, cost=10 + i % 7))
+		else:
+			player.armors.append(Armor.create(name='Chain Mail', value=16, cost=28))
+	if player.weapons:
+		player.equipped_weapon = player.weapons[0]
+	if player.armors:
+		player.equipped_armor = player.armors[-1]
+	return player
+
+
+def best_of(fn, repeat: int) -> float:
+	best = float('inf')
+	for _ in range(repeat):
+		t0 = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - t0)
+	return best
+
+
+def main() -> None:
+	print(f"{'items':>7} {'fmt':>6} {'size (KB)':>10} {'save (ms)':>10} {'load (ms)':>10}")
+	with tempfile.TemporaryDirectory() as tmp:
+		for n in SIZES:
+			player = make_player(n)
+			repeat = 5 if n <= 10_000 else 2
+			results = {}
+			for fmt, binary in (('json', False), ('binary', True)):
+				path = os.path.join(tmp, f'save_{n}.{fmt}')
+				t_save = best_of(lambda: player.save_to_file(path, binary=binary), repeat)
+				t_load = best_of(lambda: Player.load_from_file(path), repeat)
+				assert Player.load_from_file(path).to_dict() == player.to_dict()
+				results[fmt] = (os.path.getsize(path), t_load)
+				print(f"{n:>7} {fmt:>6} {os.path.getsize(path) / 1024:>10.1f} {1e3 * t_save:>10.2f} {1e3 * t_load:>10.2f}")
+			(js, jl), (bs, bl) = results['json'], results['binary']
+			print(f"{'':>7} {'ratio':>6} {js / bs:>9.1f}x {'':>10} {jl / bl:>9.1f}x")
+
+
+if __name__ == '__main__':
+	main()
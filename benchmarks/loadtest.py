@@ -0,0 +1,177 @@
+"""Load test of server.py: many players at once, latency per command.
+
+Starts the server in a subprocess on a free port with an empty save directory
+(or connects to a running one with `--port`), logs in `--clients` players at
+once, and has each send `--commands` commands taken in turn from `COMMANDS`
+(dungeon, fights, inventory, history, castle shop and sell panel). A player
+waits for the frame of a command before sending the next one, so latency is
+the time from sending a command to receiving its whole frame. Latencies are
+recorded per command in `profiler.Histogram`s.
+
+Usage:
+  python benchmarks/loadtest.py                         200 players x 100 commands
+  python benchmarks/loadtest.py --clients 500 --commands 50 --think 0.05
+  python benchmarks/loadtest.py --store                 saves in a SQLite store instead of files
+  python benchmarks/loadtest.py --port 7777             against a server already running
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from profiler import Histogram  # noqa: E402
+
+# played in a loop after the login; keys that do nothing in the current mode are ignored by the game
+COMMANDS = [
+	'ENTER',  # main menu -> dungeon
+	'w', 'a', 'a', 'w', 'a', 'a', 'r', 'w', 'a', 'a',
+	'RIGHT*4', 'DOWN*4', 'LEFT*4', 'UP*4',  # walk the dungeon map (ignored in combat)
+	'i', 'j', 'u', 'ESC',
+	'PGUP', 'k*3', 'ESC',
+	'r',  # restart if slain
+	'm', 'DOWN ENTER',  # main menu -> castle
+	'ENTER', 'j*2', 'ENTER', 'ESC',  # buy
+	'DOWN ENTER', 'ENTER', 'ESC',  # sell
+	'ESC',  # back to the main menu
+]
+
+
+class Stats:
+	def __init__(self):
+		self.commands: Dict[str, Histogram] = {}
+		self.login = Histogram()
+		self.errors: List[str] = []
+		self.quit_early = 0  # players who reached "Quit" by drifting through the menus
+
+	def record(self, command: str, ns: int) -> None:
+		hist = self.commands.get(command)
+		if hist is None:
+			hist = self.commands[command] = Histogram()
+		hist.record(ns)
+
+	def total(self) -> Histogram:
+		total = Histogram()
+		for h in self.commands.values():
+			total.merge(h)
+		return total
+
+	def format(self, elapsed: float) -> str:
+		out = [f"{'command':<14}{'n':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  ms"]
+
+		def row(name: str, h: Histogram) -> str:
+			p50, p95, p99 = h.percentiles(50, 95, 99)
+			return f"{name:<14}{h.count:>8}{p50 / 1e6:>9.2f}{p95 / 1e6:>9.2f}{p99 / 1e6:>9.2f}{h.max / 1e6:>9.2f}"
+
+		out.append(row('(login)', self.login))
+		for name, h in sorted(self.commands.items(), key=lambda kv: -kv[1].count):
+			out.append(row(name, h))
+		total = self.total()
+		out.append(row('(all)', total))
+		out.append(f"{total.count} commands in {elapsed:.2f}s: {total.count / elapsed:.0f} commands/s")
+		if self.quit_early:
+			out.append(f"{self.quit_early} players quit before the end")
+		if self.errors:
+			out.append(f"{len(self.errors)} errors, first: {self.errors[0]}")
+		return '\n'.join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> bytes:
+	"""Read one server reply (a whole frame); returns its first line."""
+	head = await reader.readline()
+	if not head:
+		raise ConnectionError("connection closed by the server")
+	if head.startswith(b'FRAME '):
+		for _ in range(int(head.split()[1])):
+			await reader.readline()
+	return head
+
+
+async def play(player: int, host: str, port: int, commands: int, think: float, stats: Stats) -> None:
+	clock = time.perf_counter_ns
+	try:
+		t0 = clock()
+		reader, writer = await asyncio.open_connection(host, port)
+		writer.write(f"load{player}\n".encode())
+		head = await read_reply(reader)
+		if not head.startswith(b'FRAME'):
+			raise ConnectionError(head.decode().strip())
+		stats.login.record(clock() - t0)
+		# players start at different points of the script, as they would in a real crowd
+		for i in range(player, player + commands):
+			command = COMMANDS[i % len(COMMANDS)]
+			t0 = clock()
+			writer.write(command.encode() + b'\n')
+			head = await read_reply(reader)
+			stats.record(command, clock() - t0)
+			if head.startswith(b'BYE'):
+				stats.quit_early += 1
+				break
+			if think:
+				await asyncio.sleep(think)
+		writer.close()
+		await writer.wait_closed()
+	except (OSError, ValueError) as e:
+		stats.errors.append(f"player {player}: {e}")
+
+
+def start_server(save_dir: str, store: bool = False) -> Tuple[subprocess.Popen, int]:
+	args = [sys.executable, os.path.join(ROOT, 'server.py'), '--port', '0', '--save-dir', save_dir]
+	if store:
+		args += ['--store', os.path.join(save_dir, 'players.db')]
+	proc = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+	line = proc.stdout.readline()  # "listening on host:port"
+	if not line.startswith('listening on'):
+		proc.kill()
+		raise RuntimeError(f"server did not start: {line!r}")
+	return proc, int(line.rsplit(':', 1)[1])
+
+
+def stop_server(proc: subprocess.Popen) -> str:
+	"""Stop the server (it closes and saves every session) and return its summary line."""
+	proc.terminate()
+	out, _ = proc.communicate(timeout=60)
+	return out.strip()
+
+
+async def run(host: str, port: int, clients: int, commands: int, think: float) -> Tuple[Stats, float]:
+	stats = Stats()
+	t0 = time.perf_counter()
+	await asyncio.gather(*(play(i, host, port, commands, think, stats) for i in range(clients)))
+	return stats, time.perf_counter() - t0
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Concurrent players against server.py, latency per command.")
+	parser.add_argument('--clients', type=int, default=200, help="players connected at once (default 200)")
+	parser.add_argument('--commands', type=int, default=100, help="commands per player (default 100)")
+	parser.add_argument('--think', type=float, default=0.0, help="seconds a player waits between commands (default 0)")
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, help="server already running (default: start one)")
+	parser.add_argument('--store', action='store_true', help="the server started keeps its saves in a SQLite store")
+	args = parser.parse_args()
+
+	proc: Optional[subprocess.Popen] = None
+	with tempfile.TemporaryDirectory() as tmp:
+		port = args.port
+		if port is None:
+			proc, port = start_server(tmp, args.store)
+		try:
+			stats, elapsed = asyncio.run(run(args.host, port, args.clients, args.commands, args.think))
+		finally:
+			summary = stop_server(proc) if proc is not None else None
+	print(f"{args.clients} players x {args.commands} commands, think {args.think:g}s"
+		+ (", SQLite store" if args.store else ""))
+	print(stats.format(elapsed))
+	if summary:
+		print(f"server: {summary}")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,435 @@
+"""Benchmark suite with JSON baselines: combat, persistence, rendering and startup.
+
+Every benchmark times one operation with timeit: the number of calls per
+sample is calibrated (`Timer.autorange`, about 0.2 s per sample), `--repeat`
+samples are taken and the median time per call is kept as the result (the
+fastest sample is recorded too). `--save` stores the results as the
+baseline; later runs are compared with it and every benchmark whose median
+got slower by more than `--threshold` percent is reported as a regression
+(exit status 1).
+
+Groups:
+  combat       Entity.attack, Game.wander + a whole encounter, a round against a pack,
+               ten encounters in auto-battle
+  map          generating a chunk of the dungeon map, a step into new territory
+               (prefetch + the tiles of a frame)
+  persistence  Player.to_dict/from_dict, save_to_file/load_from_file (JSON and
+               binary) with 10 to 10 000 items
+  store        SQLite save store: a batch of saves and its commit, loading a player,
+               top players by gold among 10 000
+  render       CursesUI.draw of each mode on a headless virtual screen
+  startup      cold start of main.py (imports + loading the save) in a new interpreter,
+               and up to the first frame drawn with and without the startup snapshot
+
+Usage:
+  python benchmarks/run.py                      run all, compare with benchmarks/baseline.json
+  python benchmarks/run.py --save               run all, store as the new baseline
+  python benchmarks/run.py -k persistence --threshold 20 --repeat 3
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from autobattle import AutoPolicy, BattleReport, auto_explore  # noqa: E402
+from bench_save_formats import make_player  # noqa: E402
+from binary_save import write_startup_snapshot  # noqa: E402
+from dungeon_map import DungeonMap, generate_chunk  # noqa: E402
+from entities import Armor, Monster, Player, Weapon  # noqa: E402
+from game import Game  # noqa: E402
+from headless import VirtualScreen, make_headless_ui  # noqa: E402
+from save_store import SQLiteStore  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SAVE_SIZES = (10, 1_000, 10_000)
+PACK_SIZE = 64  # monsters in combat.pack_round
+STORE_BATCH = 1_000  # saves committed together by store.save_batch
+STORE_PLAYERS = 10_000
+RENDER_MODES = ('main_menu', 'castle_menu', 'castle_shop', 'sell', 'inventory', 'explore', 'combat', 'scrollback')
+
+# name -> setup(tmp, stack) returning the callable to time; `tmp` is a scratch
+# directory and `stack` an ExitStack closed once the benchmark is measured
+BENCHMARKS: Dict[str, Callable[[str, contextlib.ExitStack], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+	def register(setup):
+		BENCHMARKS[name] = setup
+		return setup
+	return register
+
+
+# --- combat ---
+
+def _hero() -> Player:
+	return Player(name='Hero', hp=30, max_hp=30, equipped_weapon=Weapon.create('Long Sword', 4, 20), equipped_armor=Armor.create('Chain Mail', 16, 28))
+
+
+@benchmark('combat.attack.player')
+def _attack_player(tmp, stack):
+	game = Game(seed=1)
+	hero = _hero()
+	target = Monster(name='Dummy', hp=10**9, max_hp=10**9, _damage=3, armor=12)
+	return lambda: hero.attack(target, game.rng)
+
+
+@benchmark('combat.attack.monster')
+def _attack_monster(tmp, stack):
+	game = Game(seed=1)
+	hero = _hero()
+	hero.hp = hero.max_hp = 10**9
+	monster = Monster(name='Goblin', hp=10, max_hp=10, _damage=3, armor=12)
+	return lambda: monster.attack(hero, game.rng)
+
+
+@benchmark('combat.encounter')
+def _encounter(tmp, stack):
+	"""One wander and, when a monster shows up, the fight to the end (hero healed after each)."""
+	game = Game(seed=1)
+	hero = _hero()
+
+	def run():
+		hero.hp = hero.max_hp
+		_, monster = game.wander(hero)
+		if monster is None:
+			return
+		while True:
+			game.attack(hero, monster)
+			if not monster.is_alive():
+				game.handle_loot(monster)
+				game.gold_reward(monster)
+				return
+			game.attack(monster, hero)
+			if not hero.is_alive():
+				return
+	return run
+
+
+@benchmark(f'combat.pack_round.{PACK_SIZE}')
+def _pack_round(tmp, stack):
+	"""One round against a pack: the hero's attack and the batched attacks of every monster standing."""
+	game = Game(seed=1)
+	hero = _hero()
+	hero.hp = hero.max_hp = 10**9
+	pack = [game.generate_pack(PACK_SIZE)]
+
+	def run():
+		encounter = pack[0]
+		if encounter.is_over():
+			encounter = pack[0] = game.generate_pack(PACK_SIZE)
+		encounter.attacks_before_hero(hero, game.rng)
+		encounter.hero_attack(hero, game.rng)
+		encounter.attacks_after_hero(hero, game.rng)
+	return run
+
+
+@benchmark('combat.auto_explore.10')
+def _auto_explore(tmp, stack):
+	"""Ten encounters fought by auto-battle (hero healed before each batch)."""
+	game = Game(seed=1)
+	hero = _hero()
+	policy = AutoPolicy(stop_below=0, use_potions=False)
+
+	def run():
+		hero.hp = hero.max_hp = 10**9
+		auto_explore(game, hero, policy, BattleReport())
+	return run
+
+
+# --- map ---
+
+@benchmark('map.generate_chunk')
+def _generate_chunk(tmp, stack):
+	step = [0]
+
+	def run():
+		i = step[0] = step[0] + 1
+		return generate_chunk(1, i, -i)
+	return run
+
+
+@benchmark('map.walk.80x24')
+def _map_walk(tmp, stack):
+	"""One step east, forever into new territory: the prefetch and the map rows of an 80x24 frame."""
+	dungeon = DungeonMap(1)
+	step = [0]
+
+	def run():
+		x = step[0] = step[0] + 1
+		dungeon.prefetch(x - 40, -12, 80, 24)
+		return dungeon.view(x - 40, -4, 79, 9)
+	return run
+
+
+# --- persistence ---
+
+def _register_persistence(n: int) -> None:
+	@benchmark(f'persistence.to_dict.{n}')
+	def _to_dict(tmp, stack):
+		player = make_player(n)
+		return player.to_dict
+
+	@benchmark(f'persistence.from_dict.{n}')
+	def _from_dict(tmp, stack):
+		data = make_player(n).to_dict()
+		return lambda: Player.from_dict(data)
+
+	for fmt, binary in (('json', False), ('binary', True)):
+		def _save(tmp, stack, binary=binary, fmt=fmt):
+			player = make_player(n)
+			path = os.path.join(tmp, f'save_{n}.{fmt}')
+			return lambda: player.save_to_file(path, binary=binary)
+
+		def _load(tmp, stack, binary=binary, fmt=fmt):
+			path = os.path.join(tmp, f'load_{n}.{fmt}')
+			make_player(n).save_to_file(path, binary=binary)
+			return lambda: Player.load_from_file(path)
+
+		benchmark(f'persistence.save_{fmt}.{n}')(_save)
+		benchmark(f'persistence.load_{fmt}.{n}')(_load)
+
+
+for _n in SAVE_SIZES:
+	_register_persistence(_n)
+
+
+# --- store ---
+
+def _store(tmp: str, stack: contextlib.ExitStack, players: int = 0) -> SQLiteStore:
+	"""A store in `tmp` holding `players` small players (10 items each)."""
+	store = SQLiteStore(os.path.join(tmp, 'players.db'))
+	stack.callback(store.close)
+	for i in range(players):
+		player = make_player(10)
+		player.gold = i
+		store.save(f'p{i}', player)
+	store.flush()
+	return store
+
+
+@benchmark(f'store.save_batch.{STORE_BATCH}')
+def _store_save_batch(tmp, stack):
+	"""STORE_BATCH players saved, then committed in one transaction (divide by STORE_BATCH for one save)."""
+	store = _store(tmp, stack)
+	players = [make_player(10) for _ in range(STORE_BATCH)]
+
+	def run():
+		for i, player in enumerate(players):
+			store.save(f'p{i}', player)
+		store.flush()
+	return run
+
+
+@benchmark('store.load')
+def _store_load(tmp, stack):
+	store = _store(tmp, stack, STORE_PLAYERS)
+	return lambda: store.load('p1234')
+
+
+@benchmark(f'store.top_by_gold.{STORE_PLAYERS}')
+def _store_top(tmp, stack):
+	store = _store(tmp, stack, STORE_PLAYERS)
+	return lambda: store.top_by_gold(10)
+
+
+# --- render ---
+
+def _register_render(mode: str) -> None:
+	@benchmark(f'render.draw.{mode}')
+	def _draw(tmp, stack):
+		"""A frame after a keypress: the cursor moved or a message was logged."""
+		ui = make_headless_ui(VirtualScreen(40, 100), tmp)
+		stack.callback(ui.exploration_log.close)
+		stack.callback(ui.saver.close)
+		for _ in range(20):
+			ui.hero.add_weapon(Weapon.create('Long Sword', 4, 20))
+		for i in range(300):
+			ui.push_exploration(f"You hit Goblin for {i % 7} damage.")
+		ui.encounter = ui.game.generate_pack(1)
+		if mode == 'scrollback':
+			ui.open_scrollback()
+		ui.mode = mode
+		step = [0]
+
+		def frame():
+			i = step[0] = step[0] + 1
+			ui.menu_cursor = i % 3
+			ui.castle_menu_cursor = i % 4
+			ui.shop_view.cursor = i % 6
+			ui.sell_view.cursor = i % 20
+			ui.inventory_view.cursor = i % 25
+			if mode in ('explore', 'combat'):
+				ui.push_exploration(f"Round {i}: Goblin misses!")
+			elif mode == 'scrollback':
+				ui.scroll_to(i % 200)
+			ui.draw()
+		return frame
+
+
+for _mode in RENDER_MODES:
+	_register_render(_mode)
+
+
+# --- startup ---
+
+STARTUP_CODE = "import main\nfrom entities import Player\nPlayer.load_from_file(main.SAVE_FILE)\n"
+
+
+@benchmark('startup.interpreter')
+def _interpreter(tmp, stack):
+	"""Bare `python -c pass`, to tell the game's own startup from the interpreter's."""
+	return lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True)
+
+
+@benchmark('startup.main')
+def _startup(tmp, stack):
+	"""Everything main.py does before curses starts: imports and loading a 1000-item save."""
+	make_player(1_000).save_to_file(os.path.join(tmp, 'save_player.json'))
+	env = dict(os.environ, PYTHONPATH=ROOT)
+	return lambda: subprocess.run([sys.executable, '-c', STARTUP_CODE], cwd=tmp, env=env, check=True)
+
+
+# imports, the save, the UI and its first frame, on a screen that draws nothing
+FIRST_FRAME_CODE = """\
+import main
+from game import Game
+from save_manager import SaveManager
+from ui_curses import CursesUI
+class Screen:
+	def getmaxyx(self): return 30, 100
+	def addstr(self, *args): pass
+	def erase(self): pass
+	def noutrefresh(self): pass
+player = main.load_player(main.SAVE_FILE)
+saver = SaveManager('other_save.json')
+CursesUI(Screen(), player, Game(), saver, doupdate=lambda: None, curs_set=lambda visibility: None).draw()
+saver.close()
+"""
+
+
+def _register_first_frame(snapshot: bool) -> None:
+	@benchmark(f"startup.first_frame.{'snapshot' if snapshot else 'json'}")
+	def _first_frame(tmp, stack):
+		"""Launch to first frame with a 10 000-item JSON save, read through its snapshot or parsed."""
+		path = os.path.join(tmp, 'save_player.json')
+		make_player(10_000).save_to_file(path)
+		if snapshot:
+			write_startup_snapshot(path)
+		env = dict(os.environ, PYTHONPATH=ROOT)
+		return lambda: subprocess.run([sys.executable, '-c', FIRST_FRAME_CODE], cwd=tmp, env=env, check=True)
+
+
+for _snapshot in (False, True):
+	_register_first_frame(_snapshot)
+
+
+# --- runner ---
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+	timer = timeit.Timer(fn)
+	number, _ = timer.autorange()
+	samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+	return {
+		'median_us': statistics.median(samples) * 1e6,
+		'min_us': min(samples) * 1e6,
+		'number': number,
+		'repeat': repeat,
+	}
+
+
+def run(names: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+	results = {}
+	for name in names:
+		# each benchmark gets its own directory (saves, session log)
+		with contextlib.ExitStack() as stack:
+			tmp = stack.enter_context(tempfile.TemporaryDirectory())
+			fn = BENCHMARKS[name](tmp, stack)
+			results[name] = measure(fn, repeat)
+		print(f"{name:<32} {format_time(results[name]['median_us']):>10}", file=sys.stderr)
+	return results
+
+
+def format_time(us: float) -> str:
+	if us >= 1e6:
+		return f"{us / 1e6:.2f} s"
+	if us >= 1e3:
+		return f"{us / 1e3:.2f} ms"
+	return f"{us:.2f} us"
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Optional[Dict], threshold: float) -> List[str]:
+	"""Print the results against the baseline; returns the names of the regressions."""
+	base = baseline['results'] if baseline else {}
+	regressions = []
+	print(f"{'benchmark':<32} {'median':>10} {'min':>10} {'baseline':>10} {'change':>8}")
+	for name, r in results.items():
+		line = f"{name:<32} {format_time(r['median_us']):>10} {format_time(r['min_us']):>10}"
+		b = base.get(name)
+		if b is None:
+			print(f"{line} {'-':>10} {'new':>8}")
+			continue
+		change = (r['median_us'] / b['median_us'] - 1) * 100
+		flag = ''
+		if change > threshold:
+			flag = '  REGRESSION'
+			regressions.append(name)
+		print(f"{line} {format_time(b['median_us']):>10} {change:>+7.1f}%{flag}")
+	return regressions
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description="Run the benchmark suite and compare it with a JSON baseline.")
+	parser.add_argument('-k', dest='filter', default='', help="only benchmarks whose name contains this text")
+	parser.add_argument('--repeat', type=int, default=5, help="timed samples per benchmark (default 5)")
+	parser.add_argument('--threshold', type=float, default=10.0, help="slowdown reported as a regression, in percent (default 10)")
+	parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline file (default benchmarks/baseline.json)")
+	parser.add_argument('--save', action='store_true', help="store the results as the baseline (merged with the benchmarks not run)")
+	parser.add_argument('--json', dest='output', help="also write the results of this run to this file")
+	args = parser.parse_args()
+
+	names = [name for name in BENCHMARKS if args.filter in name]
+	if not names:
+		parser.error(f"no benchmark matches {args.filter!r}")
+	baseline = None
+	if os.path.exists(args.baseline):
+		with open(args.baseline, 'r', encoding='utf-8') as f:
+			baseline = json.load(f)
+
+	results = run(names, args.repeat)
+	report = {
+		'created': datetime.datetime.now().isoformat(timespec='seconds'),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'results': results,
+	}
+	if args.output:
+		with open(args.output, 'w', encoding='utf-8') as f:
+			json.dump(report, f, indent=1)
+	if args.save:
+		if baseline:
+			report['results'] = dict(baseline['results'], **results)
+		with open(args.baseline, 'w', encoding='utf-8') as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+			f.write('\n')
+		print(f"baseline written to {args.baseline}")
+		return 0
+	regressions = compare(results, baseline, args.threshold)
+	if regressions:
+		print(f"{len(regressions)} regression(s) above {args.threshold:g}%: {', '.join(regressions)}")
+		return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
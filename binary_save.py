@@ -0,0 +1,308 @@
+"""Compact binary save format.
+
+Sits next to the JSON format: `Player.load_from_file` detects it from the
+magic bytes, `Player.save_to_file(path, binary=True)` writes it.
+
+Layout (little endian), schema version 2:
+
+	header        4s magic | H version | H reserved
+	strings       I count | count * H byte lengths | utf-8 blob   (interned item names)
+	player        I name | i hp | i max_hp | q gold
+	potions       I count | count * (I name, i heal)
+	weapon types  I count | count * (I name, i damage, i cost)
+	weapons       I count | count * (I type, Q uid)
+	armor types   I count | count * (I name, i armor, i cost)
+	armors        I count | count * (I type, Q uid)
+	equipped      i weapon index | i armor index   (-1: none, -2: inline (I type, Q uid) follows)
+
+Names are indexes into the string table and owned items point into the type
+tables, so a thousand identical potions cost 8 bytes each and a thousand
+identical swords 12 bytes each. Files written by an older schema version are
+decoded by that version's reader (see `_READERS`), which is where migrations
+live: version 1 stored (name, stats) per item and had no instance ids.
+
+Startup snapshot: `<save>.snapshot` holds the player a JSON save (journal
+included) loads to, in this format, behind a header recording the mtime and
+size of the save and of its journal. `load_startup_snapshot` only uses it
+while both files are unchanged, which skips JSON parsing and journal replay.
+"""
+import os
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from catalog import CATALOG, INSTANCE_IDS
+from entities import Armor, Player, Potion, Weapon
+from inventory import OwnedItems
+from save_journal import journal_path
+from save_manager import write_bytes_atomic, write_json_atomic
+
+MAGIC = b'DNDS'
+SCHEMA_VERSION = 2
+
+_HEADER = struct.Struct('<4sHH')
+_COUNT = struct.Struct('<I')
+_PLAYER = struct.Struct('<Iiiq')
+_POTION = struct.Struct('<Ii')
+_ITEM = struct.Struct('<Iii')  # item type (v1: owned item)
+_OWNED = struct.Struct('<IQ')
+_EQUIPPED = struct.Struct('<ii')
+
+reserve = INSTANCE_IDS.reserve
+
+NO_ITEM = -1
+INLINE_ITEM = -2
+
+
+class BinarySaveError(ValueError):
+	pass
+
+
+def is_binary_save(path: str) -> bool:
+	try:
+		with open(path, 'rb') as f:
+			return f.read(len(MAGIC)) == MAGIC
+	except OSError:
+		return False
+
+
+def encode_player(player: Player) -> bytes:
+	strings: Dict[str, int] = {}
+
+	def intern(s: str) -> int:
+		idx = strings.get(s)
+		if idx is None:
+			idx = strings[s] = len(strings)
+		return idx
+
+	weapon_types: Dict[Any, int] = {}
+	armor_types: Dict[Any, int] = {}
+	name = intern(player.name)
+	potions = b''.join(_POTION.pack(intern(p.name), p.heal) for p in player.inventory.expand())
+	weapons = b''.join(_OWNED.pack(weapon_types.setdefault(w.item_type, len(weapon_types)), w.uid) for w in player.weapons)
+	armors = b''.join(_OWNED.pack(armor_types.setdefault(a.item_type, len(armor_types)), a.uid) for a in player.armors)
+
+	inline = []
+	eq_w = _equipped_index(player.equipped_weapon, player.weapons)
+	if eq_w == INLINE_ITEM:
+		w = player.equipped_weapon
+		inline.append(_OWNED.pack(weapon_types.setdefault(w.item_type, len(weapon_types)), w.uid))
+	eq_a = _equipped_index(player.equipped_armor, player.armors)
+	if eq_a == INLINE_ITEM:
+		a = player.equipped_armor
+		inline.append(_OWNED.pack(armor_types.setdefault(a.item_type, len(armor_types)), a.uid))
+
+	weapon_table = b''.join(_ITEM.pack(intern(t.name), t.damage, t.cost) for t in weapon_types)
+	armor_table = b''.join(_ITEM.pack(intern(t.name), t.value, t.cost) for t in armor_types)
+	encoded = [s.encode('utf-8') for s in strings]
+	out = [
+		_HEADER.pack(MAGIC, SCHEMA_VERSION, 0),
+		_COUNT.pack(len(encoded)),
+		struct.pack(f'<{len(encoded)}H', *(len(e) for e in encoded)),
+		b''.join(encoded),
+		_PLAYER.pack(name, player.hp, player.max_hp, player.gold),
+		_COUNT.pack(player.inventory.total), potions,
+		_COUNT.pack(len(weapon_types)), weapon_table,
+		_COUNT.pack(len(player.weapons)), weapons,
+		_COUNT.pack(len(armor_types)), armor_table,
+		_COUNT.pack(len(player.armors)), armors,
+		_EQUIPPED.pack(eq_w, eq_a),
+	]
+	return b''.join(out + inline)
+
+
+def _equipped_index(item, owned: OwnedItems) -> int:
+	if item is None:
+		return NO_ITEM
+	return owned.index(item) if owned.owns(item) else INLINE_ITEM
+
+
+def decode_player(data: bytes) -> Player:
+	if len(data) < _HEADER.size:
+		raise BinarySaveError("truncated header")
+	magic, version, _ = _HEADER.unpack_from(data, 0)
+	if magic != MAGIC:
+		raise BinarySaveError("not a binary save")
+	reader = _READERS.get(version)
+	if reader is None:
+		raise BinarySaveError(f"unsupported save version {version} (this build reads up to {SCHEMA_VERSION})")
+	try:
+		return reader(memoryview(data), _HEADER.size)
+	except struct.error as e:
+		raise BinarySaveError(f"corrupt save: {e}") from e
+
+
+def _read_strings(buf: memoryview, off: int) -> Tuple[List[str], int]:
+	(n,) = _COUNT.unpack_from(buf, off)
+	off += _COUNT.size
+	lengths = struct.unpack_from(f'<{n}H', buf, off)
+	off += 2 * n
+	names = []
+	for ln in lengths:
+		names.append(str(buf[off:off + ln], 'utf-8'))
+		off += ln
+	return names, off
+
+
+def _read_v2(buf: memoryview, off: int) -> Player:
+	names, off = _read_strings(buf, off)
+	name, hp, max_hp, gold = _PLAYER.unpack_from(buf, off)
+	off += _PLAYER.size
+
+	potions, off = _read_records(buf, off, _POTION, lambda r: Potion(names[r[0]], r[1]))
+	weapon_types, off = _read_records(buf, off, _ITEM, lambda r: CATALOG.weapon_type(names[r[0]], r[1], r[2]))
+	weapons, off = _read_records(buf, off, _OWNED, lambda r: Weapon(weapon_types[r[0]], reserve(r[1])))
+	armor_types, off = _read_records(buf, off, _ITEM, lambda r: CATALOG.armor_type(names[r[0]], r[1], r[2]))
+	armors, off = _read_records(buf, off, _OWNED, lambda r: Armor(armor_types[r[0]], reserve(r[1])))
+
+	eq_w, eq_a = _EQUIPPED.unpack_from(buf, off)
+	off += _EQUIPPED.size
+	equipped = []
+	for idx, owned, cls, types in ((eq_w, weapons, Weapon, weapon_types), (eq_a, armors, Armor, armor_types)):
+		if idx == NO_ITEM:
+			equipped.append(None)
+		elif idx == INLINE_ITEM:
+			t, uid = _OWNED.unpack_from(buf, off)
+			off += _OWNED.size
+			equipped.append(cls(types[t], reserve(uid)))
+		else:
+			equipped.append(owned[idx])
+
+	return Player(name=names[name], hp=hp, max_hp=max_hp, gold=gold, inventory=potions, weapons=weapons, armors=armors, equipped_weapon=equipped[0], equipped_armor=equipped[1])
+
+
+def _read_v1(buf: memoryview, off: int) -> Player:
+	"""Schema 1: one (name, stats) record per owned item. Items get fresh instance ids."""
+	names, off = _read_strings(buf, off)
+	name, hp, max_hp, gold = _PLAYER.unpack_from(buf, off)
+	off += _PLAYER.size
+
+	potions, off = _read_records(buf, off, _POTION, lambda r: Potion(names[r[0]], r[1]))
+	weapons, off = _read_records(buf, off, _ITEM, lambda r: Weapon.create(names[r[0]], r[1], r[2]))
+	armors, off = _read_records(buf, off, _ITEM, lambda r: Armor.create(names[r[0]], r[1], r[2]))
+
+	eq_w, eq_a = _EQUIPPED.unpack_from(buf, off)
+	off += _EQUIPPED.size
+	equipped = []
+	for idx, owned, cls in ((eq_w, weapons, Weapon), (eq_a, armors, Armor)):
+		if idx == NO_ITEM:
+			equipped.append(None)
+		elif idx == INLINE_ITEM:
+			r = _ITEM.unpack_from(buf, off)
+			off += _ITEM.size
+			equipped.append(cls.create(names[r[0]], r[1], r[2]))
+		else:
+			equipped.append(owned[idx])
+
+	return Player(name=names[name], hp=hp, max_hp=max_hp, gold=gold, inventory=potions, weapons=weapons, armors=armors, equipped_weapon=equipped[0], equipped_armor=equipped[1])
+
+
+def _read_records(buf: memoryview, off: int, rec: struct.Struct, build: Callable[[Tuple], Any]) -> Tuple[List[Any], int]:
+	(count,) = _COUNT.unpack_from(buf, off)
+	off += _COUNT.size
+	end = off + count * rec.size
+	if end > len(buf):
+		raise BinarySaveError("truncated record block")
+	return [build(r) for r in rec.iter_unpack(buf[off:end])], end
+
+
+# schema version -> reader; older readers stay here to migrate old files on load
+_READERS: Dict[int, Callable[[memoryview, int], Player]] = {
+	1: _read_v1,
+	2: _read_v2,
+}
+
+
+def save_binary(player: Player, path: str) -> None:
+	write_bytes_atomic(path, encode_player(player))
+
+
+def load_binary(path: str) -> Player:
+	with open(path, 'rb') as f:
+		return decode_player(f.read())
+
+
+def json_to_binary(src: str, dst: str) -> None:
+	"""Convert a JSON save (journal included) to the binary format."""
+	player = Player.load_from_file(src)
+	if player is None:
+		raise BinarySaveError(f"cannot read {src}")
+	save_binary(player, dst)
+
+
+def binary_to_json(src: str, dst: str) -> None:
+	write_json_atomic(dst, load_binary(src).to_dict())
+
+
+SNAPSHOT_MAGIC = b'DNDX'
+_SNAPSHOT = struct.Struct('<4s4q')  # magic | save mtime_ns, size | journal mtime_ns, size
+
+
+def snapshot_path(path: str) -> str:
+	return path + '.snapshot'
+
+
+def _save_stamp(path: str) -> Tuple[int, ...]:
+	stamp: List[int] = []
+	for p in (path, journal_path(path)):
+		try:
+			st = os.stat(p)
+			stamp += (st.st_mtime_ns, st.st_size)
+		except OSError:
+			stamp += (-1, -1)
+	return tuple(stamp)
+
+
+def _snapshot_header(path: str) -> Tuple[bytes, Tuple[int, ...]]:
+	try:
+		with open(snapshot_path(path), 'rb') as f:
+			head = f.read(_SNAPSHOT.size)
+	except OSError:
+		return b'', ()
+	if len(head) < _SNAPSHOT.size:
+		return b'', ()
+	magic, *stamp = _SNAPSHOT.unpack(head)
+	return magic, tuple(stamp)
+
+
+def write_startup_snapshot(path: str) -> bool:
+	"""(Re)build the startup snapshot of save `path` if it is missing or stale. False if there is no save."""
+	stamp = _save_stamp(path)
+	if _snapshot_header(path) == (SNAPSHOT_MAGIC, stamp):
+		return True
+	player = Player.load_from_file(path)
+	if player is None:
+		return False
+	# stamped before loading: a save written meanwhile makes the snapshot stale, never wrong
+	write_bytes_atomic(snapshot_path(path), _SNAPSHOT.pack(SNAPSHOT_MAGIC, *stamp) + encode_player(player))
+	return True
+
+
+def load_startup_snapshot(path: str) -> Optional[Player]:
+	"""The player save `path` loads to, read from its snapshot; None if there is none or it is stale."""
+	try:
+		with open(snapshot_path(path), 'rb') as f:
+			data = f.read()
+	except OSError:
+		return None
+	if len(data) < _SNAPSHOT.size:
+		return None
+	magic, *stamp = _SNAPSHOT.unpack_from(data)
+	if magic != SNAPSHOT_MAGIC or tuple(stamp) != _save_stamp(path):
+		return None
+	try:
+		return decode_player(memoryview(data)[_SNAPSHOT.size:])
+	except (ValueError, IndexError, KeyError):
+		# damaged snapshot (BinarySaveError is a ValueError): the save itself is still there
+		return None
+
+
+if __name__ == '__main__':
+	import sys
+
+	if len(sys.argv) != 3:
+		print("usage: python binary_save.py SRC DST  (direction picked from SRC's format)")
+		sys.exit(2)
+	if is_binary_save(sys.argv[1]):
+		binary_to_json(sys.argv[1], sys.argv[2])
+	else:
+		json_to_binary(sys.argv[1], sys.argv[2])
@@ -0,0 +1,106 @@
+"""Item catalog: shared immutable item types (flyweights) and instance IDs.
+
+An owned `Weapon`/`Armor` only holds a reference to its type plus a unique
+instance id, so a hundred identical swords share one `WeaponType`. Types are
+interned by value: asking the catalog twice for the same stats returns the
+same object, and copying or unpickling a type goes back through the catalog.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from compat import add_slots
+
+
+@add_slots
+@dataclass(frozen=True)
+class WeaponType:
+	name: str
+	damage: int
+	cost: int
+
+	def __copy__(self) -> 'WeaponType':
+		return self
+
+	def __deepcopy__(self, memo) -> 'WeaponType':
+		return self
+
+	def __reduce__(self):
+		return (_intern_weapon_type, (self.name, self.damage, self.cost))
+
+
+@add_slots
+@dataclass(frozen=True)
+class ArmorType:
+	name: str
+	value: int
+	cost: int
+
+	def __copy__(self) -> 'ArmorType':
+		return self
+
+	def __deepcopy__(self, memo) -> 'ArmorType':
+		return self
+
+	def __reduce__(self):
+		return (_intern_armor_type, (self.name, self.value, self.cost))
+
+
+class ItemCatalog:
+	"""Interning tables for item types."""
+
+	def __init__(self):
+		self._weapons: Dict[Tuple[str, int, int], WeaponType] = {}
+		self._armors: Dict[Tuple[str, int, int], ArmorType] = {}
+
+	def weapon_type(self, name: str, damage: int, cost: int) -> WeaponType:
+		key = (name, damage, cost)
+		t = self._weapons.get(key)
+		if t is None:
+			t = self._weapons.setdefault(key, WeaponType(name, damage, cost))
+		return t
+
+	def armor_type(self, name: str, value: int, cost: int) -> ArmorType:
+		key = (name, value, cost)
+		t = self._armors.get(key)
+		if t is None:
+			t = self._armors.setdefault(key, ArmorType(name, value, cost))
+		return t
+
+
+class InstanceIds:
+	"""Allocator of unique ids for owned items; ids read from a save are reserved."""
+
+	def __init__(self):
+		self._next = 1
+		self._lock = threading.Lock()
+
+	def new(self) -> int:
+		with self._lock:
+			uid = self._next
+			self._next += 1
+			return uid
+
+	def reserve(self, uid: int) -> int:
+		"""Make sure `uid` will never be handed out again; returns it."""
+		with self._lock:
+			if uid >= self._next:
+				self._next = uid + 1
+		return uid
+
+
+CATALOG = ItemCatalog()
+INSTANCE_IDS = InstanceIds()
+
+
+def new_instance_id() -> int:
+	return INSTANCE_IDS.new()
+
+
+# module-level so that pickling a type (e.g. to a simulation worker) re-interns it on load
+def _intern_weapon_type(name: str, damage: int, cost: int) -> WeaponType:
+	return CATALOG.weapon_type(name, damage, cost)
+
+
+def _intern_armor_type(name: str, value: int, cost: int) -> ArmorType:
+	return CATALOG.armor_type(name, value, cost)
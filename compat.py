@@ -0,0 +1,41 @@
+"""Backports for older Python versions (the project supports 3.8+)."""
+from dataclasses import fields
+from typing import Iterable
+
+
+def add_slots(cls=None, extra: Iterable[str] = ()):
+	"""Equivalent of `@dataclass(slots=True)` (Python 3.10+): rebuild a dataclass with `__slots__`.
+
+	Apply it above `@dataclass`. `extra` names additional non-field attributes
+	that need a slot. Frozen classes get `__getstate__`/`__setstate__` so that
+	they can still be copied and pickled.
+	"""
+	def wrap(cls):
+		cls_dict = dict(cls.__dict__)
+		field_names = tuple(f.name for f in fields(cls))
+		inherited = set()
+		for base in cls.__mro__[1:-1]:
+			inherited.update(getattr(base, '__slots__', ()))
+		cls_dict['__slots__'] = tuple(n for n in field_names + tuple(extra) if n not in inherited)
+		for name in field_names:
+			# defaults live in the generated __init__; a class attribute would clash with the slot
+			cls_dict.pop(name, None)
+		cls_dict.pop('__dict__', None)
+		cls_dict.pop('__weakref__', None)
+		new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+		new_cls.__qualname__ = cls.__qualname__
+		if cls.__dataclass_params__.frozen and '__reduce__' not in cls_dict:
+			new_cls.__getstate__ = _frozen_getstate
+			new_cls.__setstate__ = _frozen_setstate
+		return new_cls
+
+	return wrap if cls is None else wrap(cls)
+
+
+def _frozen_getstate(self):
+	return [getattr(self, f.name) for f in fields(self)]
+
+
+def _frozen_setstate(self, state):
+	for f, value in zip(fields(self), state):
+		object.__setattr__(self, f.name, value)
@@ -0,0 +1,98 @@
+"""Buffered dice for the game loop.
+
+`random.randint` costs several Python-level calls per roll. `Dice` draws
+rolls in large blocks (one `getrandbits` call per block, turned into rolls by
+unbiased rejection on bytes) and then serves them with a single `list.pop()`,
+which is what tight simulation loops need. A seeded `Dice` always produces the
+same sequence of rolls.
+"""
+import random
+from typing import Dict, List, Optional
+
+BLOCK_SIZE = 4096
+
+
+class Dice:
+	"""Seedable RNG serving dN / range / float rolls from pre-generated blocks."""
+
+	def __init__(self, seed: Optional[int] = None, block_size: int = BLOCK_SIZE):
+		if block_size < 1:
+			raise ValueError(f"block_size must be at least 1, got {block_size}")
+		self.seed = seed
+		self.block_size = block_size
+		self._random = random.Random(seed)
+		self._blocks: Dict[int, List[int]] = {}  # faces -> remaining rolls
+		self._floats: List[float] = []
+
+	def _refill(self, faces: int) -> List[int]:
+		if faces < 1:
+			raise ValueError(f"a die needs at least 1 face, got {faces}")
+		n = self.block_size
+		if faces > 256:
+			block = self._random.choices(range(1, faces + 1), k=n)
+		else:
+			# keep only bytes below the largest multiple of `faces` so every face is equally likely;
+			# a small block may lose all its bytes: draw again then
+			limit = 256 - 256 % faces
+			block = []
+			while not block:
+				data = self._random.getrandbits(8 * n).to_bytes(n, 'little')
+				block = [b % faces + 1 for b in data if b < limit]
+		self._blocks[faces] = block
+		return block
+
+	def roll(self, faces: int) -> int:
+		"""Roll one die with `faces` faces (1..faces)."""
+		block = self._blocks.get(faces)
+		if not block:
+			block = self._refill(faces)
+		return block.pop()
+
+	def rolls(self, faces: int, n: int) -> List[int]:
+		"""`n` rolls at once: the rolls `n` calls of roll() would give, in the same order."""
+		out: List[int] = []
+		while len(out) < n:
+			block = self._blocks.get(faces)
+			if not block:
+				block = self._refill(faces)
+			take = min(n - len(out), len(block))
+			out += block[:-take - 1:-1]  # the tail, reversed: pop() order
+			del block[-take:]
+		return out
+
+	def d20(self) -> int:
+		block = self._blocks.get(20)
+		if not block:
+			block = self._refill(20)
+		return block.pop()
+
+	def d100(self) -> int:
+		block = self._blocks.get(100)
+		if not block:
+			block = self._refill(100)
+		return block.pop()
+
+	def randint(self, a: int, b: int) -> int:
+		"""Same contract as random.randint: a <= N <= b (ValueError if b < a)."""
+		return a - 1 + self.roll(b - a + 1)
+
+	def random(self) -> float:
+		"""Float in [0.0, 1.0)."""
+		if not self._floats:
+			rnd = self._random.random
+			self._floats = [rnd() for _ in range(self.block_size)]
+		return self._floats.pop()
+
+
+if __name__ == '__main__':
+	import timeit
+
+	n = 1_000_000
+	rng = random.Random(1)
+	dice = Dice(1)
+	t_randint = timeit.timeit(lambda: rng.randint(1, 20), number=n)
+	t_d20 = timeit.timeit(dice.d20, number=n)
+	t_range = timeit.timeit(lambda: dice.randint(0, 4), number=n)
+	print(f"random.randint(1, 20): {1e9 * t_randint / n:.0f} ns/roll")
+	print(f"Dice.d20():            {1e9 * t_d20 / n:.0f} ns/roll ({t_randint / t_d20:.1f}x)")
+	print(f"Dice.randint(0, 4):    {1e9 * t_range / n:.0f} ns/roll")
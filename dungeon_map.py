@@ -0,0 +1,183 @@
+"""Procedural dungeon map: an endless seeded tile map of rooms and corridors.
+
+The map is cut into CHUNK x CHUNK squares generated on demand. A chunk
+depends only on (seed, chunk coordinates): it is never saved, and a chunk
+evicted from the cache is generated again, identical, when the hero comes
+back. `DungeonMap` keeps the last `capacity` chunks used in an LRU cache, so
+its memory stays the same however far the hero walks.
+
+Each chunk has 1 to 3 rooms joined by corridors, and one opening in the
+middle part of each of its four borders. The position of an opening is drawn
+from the border itself (seed, which border, its coordinates), so the two
+chunks sharing a border agree on it without looking at each other, and a
+corridor runs from every opening to the chunk's rooms: every floor tile of
+the map can be reached from every other.
+
+`prefetch()` generates the chunks around a rectangle ahead of time, a few
+per call (`budget`), nearest first: a front-end prefetching a chunk beyond
+its view on every step spreads the row or column of chunks it walks into
+over the next steps, and its frames never wait for a chunk.
+"""
+import random
+from collections import OrderedDict
+from typing import List, Tuple
+
+CHUNK = 32  # tiles per side of a chunk
+CAPACITY = 64  # chunks kept in the cache
+PREFETCH_BUDGET = 2  # chunks generated per prefetch() call at most
+WALL = '#'
+FLOOR = '.'
+
+# rows of a chunk, top to bottom
+Chunk = Tuple[str, ...]
+
+
+def _rng(seed: int, *key) -> random.Random:
+	# string seeds are hashed (sha512): the same map on every platform and run
+	return random.Random('/'.join(map(str, (seed,) + key)))
+
+
+def _opening(seed: int, kind: str, x: int, y: int) -> int:
+	"""Offset of the opening in a border: 'v' the west border of chunk (x, y), 'h' its north border."""
+	return _rng(seed, kind, x, y).randint(2, CHUNK - 3)
+
+
+def _carve(grid: List[bytearray], x0: int, y0: int, x1: int, y1: int) -> None:
+	"""Floor on the rectangle [x0, x1] x [y0, y1] (corners in any order)."""
+	if x0 > x1:
+		x0, x1 = x1, x0
+	if y0 > y1:
+		y0, y1 = y1, y0
+	floor = FLOOR.encode() * (x1 - x0 + 1)
+	for y in range(y0, y1 + 1):
+		grid[y][x0:x1 + 1] = floor
+
+
+def _corridor(grid: List[bytearray], a: Tuple[int, int], b: Tuple[int, int], horizontal_first: bool) -> None:
+	"""L-shaped corridor from a to b."""
+	(ax, ay), (bx, by) = a, b
+	if horizontal_first:
+		_carve(grid, ax, ay, bx, ay)
+		_carve(grid, bx, ay, bx, by)
+	else:
+		_carve(grid, ax, ay, ax, by)
+		_carve(grid, ax, by, bx, by)
+
+
+def generate_chunk(seed: int, cx: int, cy: int) -> Chunk:
+	"""The tiles of chunk (cx, cy); the same for the same arguments."""
+	rng = _rng(seed, 'chunk', cx, cy)
+	grid = [bytearray(WALL.encode() * CHUNK) for _ in range(CHUNK)]
+	centers = []
+	for _ in range(rng.randint(1, 3)):
+		w = rng.randint(4, 10)
+		h = rng.randint(3, 7)
+		x = rng.randint(1, CHUNK - w - 1)
+		y = rng.randint(1, CHUNK - h - 1)
+		_carve(grid, x, y, x + w - 1, y + h - 1)
+		centers.append((x + w // 2, y + h // 2))
+	for a, b in zip(centers, centers[1:]):
+		_corridor(grid, a, b, rng.random() < 0.5)
+	# openings shared with the neighbours: west, east, north, south
+	doors = [
+		(0, _opening(seed, 'v', cx, cy)),
+		(CHUNK - 1, _opening(seed, 'v', cx + 1, cy)),
+		(_opening(seed, 'h', cx, cy), 0),
+		(_opening(seed, 'h', cx, cy + 1), CHUNK - 1),
+	]
+	for i, door in enumerate(doors):
+		# leave the border straight (west/east doors go across first, north/south down first)
+		_corridor(grid, door, rng.choice(centers), i < 2)
+	return tuple(row.decode('ascii') for row in grid)
+
+
+class DungeonMap:
+	"""Tiles of the endless map around the hero; chunks are generated lazily and evicted least recently used first."""
+
+	def __init__(self, seed: int, capacity: int = CAPACITY):
+		self.seed = seed
+		self.capacity = capacity
+		self._chunks: 'OrderedDict[Tuple[int, int], Chunk]' = OrderedDict()
+		self.generated = 0  # chunks generated, again after an eviction included
+		self.evicted = 0
+		self._prefetched: Tuple[int, int, int, int] = (0, 0, -1, -1)  # chunks of the last prefetch (cx0, cy0, cx1, cy1)
+		self._todo: List[Tuple[int, int]] = []  # chunks it still has to generate, the nearest last
+
+	def __len__(self) -> int:
+		return len(self._chunks)
+
+	def chunk(self, cx: int, cy: int) -> Chunk:
+		key = (cx, cy)
+		chunks = self._chunks
+		tiles = chunks.get(key)
+		if tiles is not None:
+			chunks.move_to_end(key)
+			return tiles
+		tiles = chunks[key] = generate_chunk(self.seed, cx, cy)
+		self.generated += 1
+		if len(chunks) > self.capacity:
+			chunks.popitem(last=False)
+			self.evicted += 1
+		return tiles
+
+	def tile(self, x: int, y: int) -> str:
+		cx, tx = divmod(x, CHUNK)
+		cy, ty = divmod(y, CHUNK)
+		return self.chunk(cx, cy)[ty][tx]
+
+	def is_floor(self, x: int, y: int) -> bool:
+		return self.tile(x, y) == FLOOR
+
+	def start(self) -> Tuple[int, int]:
+		"""Floor tile closest to the middle of chunk (0, 0): where the hero enters the dungeon."""
+		tiles = self.chunk(0, 0)
+		mid = CHUNK // 2
+		return min(((x, y) for y, row in enumerate(tiles) for x, t in enumerate(row) if t == FLOOR),
+			key=lambda p: (abs(p[0] - mid) + abs(p[1] - mid), p[1], p[0]))
+
+	def view(self, x0: int, y0: int, width: int, height: int) -> List[str]:
+		"""Rows of tiles of the rectangle whose top-left tile is (x0, y0)."""
+		rows = []
+		end = x0 + width
+		for y in range(y0, y0 + height):
+			cy, ty = divmod(y, CHUNK)
+			parts = []
+			x = x0
+			while x < end:
+				cx, tx = divmod(x, CHUNK)
+				n = min(CHUNK - tx, end - x)
+				parts.append(self.chunk(cx, cy)[ty][tx:tx + n])
+				x += n
+			rows.append(''.join(parts))
+		return rows
+
+	def prefetch(self, x0: int, y0: int, width: int, height: int, margin: int = CHUNK, budget: int = PREFETCH_BUDGET) -> int:
+		"""Generate the chunks of a rectangle and `margin` tiles around it, `budget` of them at most
+		(the rest on the next calls); returns how many it generated.
+
+		The cache grows to twice that area if it is smaller, so prefetching never evicts what it is
+		about to show."""
+		cx0, cy0 = (x0 - margin) // CHUNK, (y0 - margin) // CHUNK
+		cx1, cy1 = (x0 + width + margin - 1) // CHUNK, (y0 + height + margin - 1) // CHUNK
+		chunks = self._chunks
+		if (cx0, cy0, cx1, cy1) != self._prefetched:
+			# most steps keep the same chunks: nothing to look up then
+			self._prefetched = (cx0, cy0, cx1, cy1)
+			self.capacity = max(self.capacity, 2 * (cx1 - cx0 + 1) * (cy1 - cy0 + 1))
+			todo = []
+			for cy in range(cy0, cy1 + 1):
+				for cx in range(cx0, cx1 + 1):
+					if (cx, cy) in chunks:
+						chunks.move_to_end((cx, cy))
+					else:
+						todo.append((cx, cy))
+			mx, my = (cx0 + cx1) / 2, (cy0 + cy1) / 2
+			todo.sort(key=lambda c: abs(c[0] - mx) + abs(c[1] - my), reverse=True)
+			self._todo = todo
+		done = 0
+		while self._todo and done < budget:
+			key = self._todo.pop()
+			if key not in chunks:
+				self.chunk(*key)
+				done += 1
+		return done
@@ -0,0 +1,155 @@
+"""Fights against one monster or a whole pack.
+
+`Encounter` keeps its monsters as a struct of arrays, one list per stat
+(`names`, `hp`, `max_hp`, `damage`, `armor`, `initiative`), index i being
+the i-th monster in turn order: everyone rolls a d20 for initiative when the
+fight starts and the monsters are sorted by it, highest first. Every round
+the monsters whose initiative beats the hero's act before the hero, the
+others after (ties go to the hero). Each of these two groups attacks in one
+pass over its slice of the arrays with one batch of d20 rolls
+(`Dice.rolls`), and the group's attacks come back as a single
+`AttackSummary` for the combat log; `play_round` returns the whole round
+as a `Round`.
+
+The hero attacks the first monster still standing in turn order.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from compat import add_slots
+from dice import Dice
+from entities import Entity, Monster
+
+
+@add_slots
+@dataclass(frozen=True)
+class AttackSummary:
+	"""Attacks of a group of monsters on the hero."""
+	attacks: int = 0  # monsters still standing that attacked
+	hits: int = 0
+	damage: int = 0
+	attacker: str = ''  # name of the monster when only one attacked
+
+	@property
+	def misses(self) -> int:
+		return self.attacks - self.hits
+
+
+@add_slots
+@dataclass(frozen=True)
+class Round:
+	"""One combat round, in the order things happened."""
+	before: AttackSummary  # monsters ahead of the hero in initiative
+	target: int = -1  # monster the hero attacked; -1 when the hero fell before acting
+	dealt: int = 0
+	killed: bool = False  # the hero's attack defeated `target`
+	after: AttackSummary = AttackSummary()  # the other monsters
+
+
+def _numbered(names: List[str]) -> List[str]:
+	"""'Goblin 1', 'Goblin 2'... for names shared by several monsters."""
+	counts: Dict[str, int] = {}
+	for name in names:
+		counts[name] = counts.get(name, 0) + 1
+	seen: Dict[str, int] = {}
+	out = []
+	for name in names:
+		if counts[name] > 1:
+			seen[name] = seen.get(name, 0) + 1
+			name = f"{name} {seen[name]}"
+		out.append(name)
+	return out
+
+
+class Encounter:
+	def __init__(self, monsters: Sequence[Monster], rng: Dice):
+		if not monsters:
+			raise ValueError("an encounter needs at least one monster")
+		self.size = len(monsters)
+		self.hero_initiative = rng.d20()
+		rolls = rng.rolls(20, len(monsters))
+		# stable: monsters with the same roll keep the order they came in
+		order = sorted(range(len(monsters)), key=lambda i: -rolls[i])
+		names = _numbered([m.name for m in monsters])
+		self.kinds = [monsters[i].name for i in order]  # names without the numbers
+		self.names = [names[i] for i in order]
+		self.hp = [monsters[i].hp for i in order]
+		self.max_hp = [monsters[i].max_hp for i in order]
+		self.damage = [monsters[i].damage for i in order]
+		self.armor = [monsters[i].armor_class for i in order]
+		self.initiative = [rolls[i] for i in order]
+		# monsters [0, ahead) act before the hero, [ahead, size) after
+		self.ahead = sum(1 for r in self.initiative if r > self.hero_initiative)
+		self.alive = sum(1 for hp in self.hp if hp > 0)
+		self.target = self._next_target(0)
+
+	def __len__(self) -> int:
+		return self.size
+
+	def is_over(self) -> bool:
+		return self.alive == 0
+
+	def total_hp(self) -> int:
+		return sum(self.hp)
+
+	def monster(self, i: int) -> Monster:
+		"""Monster i as an entity (loot, gold reward, odds)."""
+		return Monster(name=self.kinds[i], hp=self.hp[i], max_hp=self.max_hp[i], _damage=self.damage[i], armor=self.armor[i])
+
+	def duel_foe(self) -> Optional[Monster]:
+		"""The last monster standing when it acts after the hero: the duel solver.py and simulation.py model."""
+		if self.alive != 1 or self.target < self.ahead:
+			return None
+		return self.monster(self.target)
+
+	def _next_target(self, start: int) -> int:
+		hp = self.hp
+		for i in range(start, self.size):
+			if hp[i] > 0:
+				return i
+		return -1
+
+	def hero_attack(self, hero: Entity, rng: Dice) -> int:
+		"""The hero attacks `target` (same rule as Entity.attack); returns the damage dealt."""
+		t = self.target
+		if t < 0 or hero.attack_roll(rng) < self.armor[t]:
+			return 0
+		damage = hero.damage
+		self.hp[t] = max(0, self.hp[t] - damage)
+		if self.hp[t] == 0:
+			self.alive -= 1
+			self.target = self._next_target(t + 1)
+		return damage
+
+	def attack_hero(self, hero: Entity, rng: Dice, start: int = 0, stop: Optional[int] = None) -> AttackSummary:
+		"""Monsters [start, stop) still standing attack the hero, all at once."""
+		hp = self.hp[start:stop]
+		damage = self.damage[start:stop]
+		live = [d for h, d in zip(hp, damage) if h > 0]
+		if not live:
+			return AttackSummary()
+		ac = hero.armor_class
+		hits = [d for d, roll in zip(live, rng.rolls(20, len(live))) if roll >= ac]
+		total = sum(hits)
+		hero.hp = max(0, hero.hp - total)
+		attacker = ''
+		if len(live) == 1:
+			attacker = self.names[start + next(j for j, h in enumerate(hp) if h > 0)]
+		return AttackSummary(len(live), len(hits), total, attacker)
+
+	def attacks_before_hero(self, hero: Entity, rng: Dice) -> AttackSummary:
+		return self.attack_hero(hero, rng, 0, self.ahead)
+
+	def attacks_after_hero(self, hero: Entity, rng: Dice) -> AttackSummary:
+		return self.attack_hero(hero, rng, self.ahead)
+
+	def play_round(self, hero: Entity, rng: Dice) -> Round:
+		"""Monsters ahead of the hero, the hero's attack, then the other monsters. Loot is left to the caller."""
+		before = self.attacks_before_hero(hero, rng)
+		if not hero.is_alive():
+			return Round(before)
+		target = self.target
+		dealt = self.hero_attack(hero, rng)
+		killed = self.hp[target] == 0
+		after = self.attacks_after_hero(hero, rng) if not self.is_over() else AttackSummary()
+		return Round(before, target, dealt, killed, after)
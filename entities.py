@@ -1,9 +1,22 @@
 from dataclasses import dataclass, field
+from operator import attrgetter
 from random import randint
 from typing import List, Optional, Dict, Any
 import json
+from compat import add_slots
+from catalog import CATALOG, INSTANCE_IDS, ArmorType, WeaponType, new_instance_id
+from inventory import OwnedItems, PotionStacks
+from save_manager import write_json_atomic
 
+# save locations `sqlite:<database>#<player id>` are rows of a SQLite store (save_store.py)
+STORE_SCHEME = 'sqlite:'
 
+
+class SaveLoadError(Exception):
+	"""A save exists but cannot be loaded (damaged or unreadable): do not start over and save on top of it."""
+
+
+@add_slots
 @dataclass
 class Potion:
 	name: str
@@ -17,34 +30,71 @@ class Potion:
 		return Potion(name=d["name"], heal=int(d["heal"]))
 
 
+@add_slots
 @dataclass
 class Weapon:
-	name: str
-	damage: int
-	cost: int
+	"""Arme possédée : type partagé du catalogue + identifiant d'instance unique."""
+	item_type: WeaponType
+	uid: int = field(default_factory=new_instance_id)
+
+	@property
+	def name(self) -> str:
+		return self.item_type.name
+
+	@property
+	def damage(self) -> int:
+		return self.item_type.damage
+
+	@property
+	def cost(self) -> int:
+		return self.item_type.cost
+
+	@staticmethod
+	def create(name: str, damage: int, cost: int) -> 'Weapon':
+		return Weapon(CATALOG.weapon_type(name, damage, cost))
 
 	def to_dict(self) -> Dict[str, Any]:
-		return {"name": self.name, "damage": self.damage, "cost": self.cost}
+		return {"name": self.name, "damage": self.damage, "cost": self.cost, "uid": self.uid}
 
 	@staticmethod
 	def from_dict(d: Dict[str, Any]) -> 'Weapon':
-		return Weapon(name=d["name"], damage=int(d["damage"]), cost=int(d["cost"]))
+		t = CATALOG.weapon_type(d["name"], int(d["damage"]), int(d["cost"]))
+		return Weapon(t, INSTANCE_IDS.reserve(int(d["uid"]))) if "uid" in d else Weapon(t)
 
 
+@add_slots
 @dataclass
 class Armor:
-	name: str
-	value: int
-	cost: int
+	"""Armure possédée : type partagé du catalogue + identifiant d'instance unique."""
+	item_type: ArmorType
+	uid: int = field(default_factory=new_instance_id)
+
+	@property
+	def name(self) -> str:
+		return self.item_type.name
+
+	@property
+	def value(self) -> int:
+		return self.item_type.value
+
+	@property
+	def cost(self) -> int:
+		return self.item_type.cost
+
+	@staticmethod
+	def create(name: str, value: int, cost: int) -> 'Armor':
+		return Armor(CATALOG.armor_type(name, value, cost))
 
 	def to_dict(self) -> Dict[str, Any]:
-		return {"name": self.name, "armor": self.value, "cost": self.cost}
+		return {"name": self.name, "armor": self.value, "cost": self.cost, "uid": self.uid}
 
 	@staticmethod
 	def from_dict(d: Dict[str, Any]) -> 'Armor':
-		return Armor(name=d["name"], value=int(d["armor"]), cost=int(d["cost"]))
+		t = CATALOG.armor_type(d["name"], int(d["armor"]), int(d["cost"]))
+		return Armor(t, INSTANCE_IDS.reserve(int(d["uid"]))) if "uid" in d else Armor(t)
 
 
+@add_slots
 @dataclass
 class Entity:
 	"""Classe de base pour Player et Monster contenant les champs et comportements communs."""
@@ -52,14 +102,17 @@ class Entity:
 	hp: int
 	max_hp: int
 
-	def attack_roll(self) -> int:
-		return randint(1, 20)
+	def attack_roll(self, dice=None) -> int:
+		if dice is None:
+			return randint(1, 20)
+		return dice.d20()
 
-	def attack(self, other) -> int:
+	def attack(self, other, dice=None) -> int:
 		""" Effectue une attaque sur une autre entité.
 			Renvoie les dégâts infligés (0 si manqué).
+			dice : dés du jeu (dice.Dice) ; module random si absent.
 		"""
-		if self.attack_roll() >= other.armor_class:
+		if self.attack_roll(dice) >= other.armor_class:
 			damage = self.damage
 			other.hp = max(0, other.hp - damage)
 			return damage
@@ -79,6 +132,7 @@ class Entity:
 		raise NotImplementedError("damage doit être défini dans les sous-classes")
 
 
+@add_slots
 @dataclass
 class Monster(Entity):
 	_damage: int = field(default=2)
@@ -93,15 +147,44 @@ class Monster(Entity):
 		return self._damage
 
 
+# Sorted views kept by the player's weapon and armor containers
+WEAPON_SORT_KEYS = {'damage': attrgetter('damage'), 'cost': attrgetter('cost')}
+ARMOR_SORT_KEYS = {'value': attrgetter('value'), 'cost': attrgetter('cost')}
+
+
+def _weapon_items(items=()) -> OwnedItems:
+	return OwnedItems(items, WEAPON_SORT_KEYS)
+
+
+def _armor_items(items=()) -> OwnedItems:
+	return OwnedItems(items, ARMOR_SORT_KEYS)
+
+
+@add_slots(extra=('_journal',))
 @dataclass
 class Player(Entity):
 	gold: int = 0
-	inventory: List[Potion] = field(default_factory=list)
-	weapons: List[Weapon] = field(default_factory=list)
-	armors: List[Armor] = field(default_factory=list)
+	inventory: PotionStacks = field(default_factory=PotionStacks)
+	weapons: OwnedItems = field(default_factory=_weapon_items)
+	armors: OwnedItems = field(default_factory=_armor_items)
 	equipped_weapon: Optional[Weapon] = None
 	equipped_armor: Optional[Armor] = None
 
+	def __post_init__(self):
+		# plain lists are accepted (saves, scripts) and indexed here
+		if not isinstance(self.inventory, PotionStacks):
+			self.inventory = PotionStacks(self.inventory)
+		if not isinstance(self.weapons, OwnedItems):
+			self.weapons = _weapon_items(self.weapons)
+		if not isinstance(self.armors, OwnedItems):
+			self.armors = _armor_items(self.armors)
+		# save_journal.SaveJournal notified of every mutation, when attached (not a dataclass field)
+		self._journal = None
+
+	def _record(self, op: str, *args) -> None:
+		if self._journal is not None:
+			self._journal.record(op, list(args))
+
 	@property
 	def armor_class(self):
 		return self.equipped_armor.value if self.equipped_armor else 10
@@ -113,55 +196,78 @@ class Player(Entity):
 	def unequip_weapon(self) -> bool:
 		if self.equipped_weapon:
 			self.equipped_weapon = None
+			self._record('unequip_weapon')
 			return True
 		return False
 
 	def unequip_armor(self) -> bool:
 		if self.equipped_armor:
 			self.equipped_armor = None
+			self._record('unequip_armor')
 			return True
 		return False
 
 	def heal(self, amount: int) -> None:
 		self.hp = min(self.max_hp, self.hp + amount)
 
-	# Inventory methods for potions
+	# Inventory methods for potions (identical potions share one stack)
 	def add_potion(self, potion: Potion) -> None:
-		self.inventory.append(potion)
+		self.inventory.add(potion)
+		self._record('add_potion', potion.to_dict())
 
 	def list_potions(self) -> List[Potion]:
-		return [p for p in self.inventory]
+		"""One potion per stack, in inventory order."""
+		return [s.potion for s in self.inventory]
 
 	def drink_potion(self, index: int) -> Optional[int]:
-		"""Drink potion by index in inventory. Returns amount healed or None if invalid index."""
+		"""Drink one potion of the stack at `index`. Returns amount healed or None if invalid index."""
 		if index < 0 or index >= len(self.inventory):
 			return None
-		p = self.inventory.pop(index)
+		return self._drink(self.inventory.take(index))
+
+	def drink_potion_kind(self, potion: Potion) -> Optional[int]:
+		"""Drink one potion of the same kind as `potion`. None if there is none left."""
+		p = self.inventory.take_kind(potion)
+		return self._drink(p) if p is not None else None
+
+	def _drink(self, p: Potion) -> int:
 		before = self.hp
 		self.heal(p.heal)
-		healed = self.hp - before
-		return healed
+		# journaled by kind: stack indexes shift when a stack runs out
+		self._record('drink_potion_kind', p.to_dict())
+		return self.hp - before
 
 	# Gold and shop related
 	def add_gold(self, amount: int) -> None:
 		self.gold += amount
+		self._record('add_gold', amount)
 
 	def spend_gold(self, amount: int) -> bool:
 		if amount <= self.gold:
 			self.gold -= amount
+			self._record('spend_gold', amount)
 			return True
 		return False
 
+	def best_weapon(self) -> Optional[Weapon]:
+		return self.weapons.best('damage')
+
+	def best_armor(self) -> Optional[Armor]:
+		return self.armors.best('value')
+
 	def add_weapon(self, weapon: Weapon) -> None:
 		self.weapons.append(weapon)
+		self._record('add_weapon', weapon.to_dict())
 
 	def add_armor(self, armor: Armor) -> None:
 		self.armors.append(armor)
+		self._record('add_armor', armor.to_dict())
 
 	def equip_weapon(self, index: int) -> bool:
 		if index < 0 or index >= len(self.weapons):
 			return False
 		self.equipped_weapon = self.weapons[index]
+		self._record('equip_weapon', index)
 		return True
 
 	def equip_armor(self, index: int) -> bool:
@@ -169,18 +275,20 @@ class Player(Entity):
 			return False
 		# do not overwrite base armor; keep equipped_armor as a bonus
 		self.equipped_armor = self.armors[index]
+		self._record('equip_armor', index)
 		return True
 
 	def sell_weapon(self, index: int) -> Optional[int]:
 		if index < 0 or index >= len(self.weapons):
 			return None
 		w = self.weapons.pop(index)
-		# sell at half price
+		# sell at half price (gold added directly: the sale is journaled as a whole)
 		value = w.cost // 2
-		self.add_gold(value)
+		self.gold += value
 		# unequip if it was equipped (compare by identity)
 		if self.equipped_weapon is w:
 			self.equipped_weapon = None
+		self._record('sell_weapon', index)
 		return value
 
 	def sell_armor(self, index: int) -> Optional[int]:
@@ -188,34 +296,91 @@ class Player(Entity):
 			return None
 		a = self.armors.pop(index)
 		value = a.cost // 2
-		self.add_gold(value)
+		self.gold += value
 		# unequip if it was equipped (compare by identity)
 		if self.equipped_armor is a:
 			self.equipped_armor = None
+		self._record('sell_armor', index)
 		return value
 
 	def to_dict(self) -> Dict[str, Any]:
-		return {"name": self.name, "hp": self.hp, "max_hp": self.max_hp, "gold": self.gold, "inventory": [p.to_dict() for p in self.inventory], "weapons": [w.to_dict() for w in self.weapons], "armors": [a.to_dict() for a in self.armors], "equipped_weapon": self.equipped_weapon.to_dict() if self.equipped_weapon else None, "equipped_armor": self.equipped_armor.to_dict() if self.equipped_armor else None, }
+		# Weapons and armors are saved as [type index, uid] pairs pointing into a per-save type table;
+		# equipped items are referenced by uid.
+		weapon_types: Dict[WeaponType, int] = {}
+		armor_types: Dict[ArmorType, int] = {}
+		weapons = [[weapon_types.setdefault(w.item_type, len(weapon_types)), w.uid] for w in self.weapons]
+		armors = [[armor_types.setdefault(a.item_type, len(armor_types)), a.uid] for a in self.armors]
+		# potions are written one entry per potion, as before stacking
+		return {"name": self.name, "hp": self.hp, "max_hp": self.max_hp, "gold": self.gold, "inventory": [p.to_dict() for p in self.inventory.expand()], "item_types": {"weapons": [[t.name, t.damage, t.cost] for t in weapon_types], "armors": [[t.name, t.value, t.cost] for t in armor_types]}, "weapons": weapons, "armors": armors, "equipped_weapon": _equipped_ref(self.equipped_weapon, self.weapons), "equipped_armor": _equipped_ref(self.equipped_armor, self.armors), }
 
 	@staticmethod
 	def from_dict(d: Dict[str, Any]) -> 'Player':
 		inv = [Potion.from_dict(x) for x in d.get("inventory", [])]
-		weps = [Weapon.from_dict(x) for x in d.get("weapons", [])]
-		arms = [Armor.from_dict(x) for x in d.get("armors", [])]
-		eq_w = Weapon.from_dict(d["equipped_weapon"]) if d.get("equipped_weapon") else None
-		eq_a = Armor.from_dict(d["equipped_armor"]) if d.get("equipped_armor") else None
+		types = d.get("item_types", {})
+		weapon_types = [CATALOG.weapon_type(n, int(dmg), int(c)) for n, dmg, c in types.get("weapons", [])]
+		armor_types = [CATALOG.armor_type(n, int(v), int(c)) for n, v, c in types.get("armors", [])]
+		# older saves store one full dict per item
+		weps = _weapon_items(Weapon.from_dict(x) if isinstance(x, dict) else Weapon(weapon_types[x[0]], INSTANCE_IDS.reserve(int(x[1]))) for x in d.get("weapons", []))
+		arms = _armor_items(Armor.from_dict(x) if isinstance(x, dict) else Armor(armor_types[x[0]], INSTANCE_IDS.reserve(int(x[1]))) for x in d.get("armors", []))
+		eq_w = _resolve_equipped(d.get("equipped_weapon"), weps, Weapon.from_dict)
+		eq_a = _resolve_equipped(d.get("equipped_armor"), arms, Armor.from_dict)
 		player = Player(name=d.get("name", "Hero"), hp=int(d.get("hp", 10)), max_hp=int(d.get("max_hp", d.get("hp", 10))), inventory=inv, gold=int(d.get("gold", 0)), weapons=weps, armors=arms, equipped_weapon=eq_w, equipped_armor=eq_a, )
 		return player
 
-	def save_to_file(self, path: str) -> None:
-		with open(path, 'w', encoding='utf-8') as f:
-			json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+	def save_to_file(self, path: str, binary: bool = False) -> None:
+		# atomic: a crash mid-write leaves the previous save intact
+		if path.startswith(STORE_SCHEME):
+			# imported only when used: sqlite3 is slow to import
+			from save_store import save_to_store
+			save_to_store(self, path)
+			return
+		if binary:
+			from binary_save import save_binary
+			save_binary(self, path)
+			return
+		write_json_atomic(path, self.to_dict())
 
 	@staticmethod
 	def load_from_file(path: str) -> Optional['Player']:
+		"""The player saved at `path`, None if there is no save; SaveLoadError if there is one but it cannot be read."""
 		try:
+			if path.startswith(STORE_SCHEME):
+				from save_store import load_from_store
+				return load_from_store(path)
+			from binary_save import is_binary_save, load_binary
+			if is_binary_save(path):
+				return load_binary(path)
 			with open(path, 'r', encoding='utf-8') as f:
 				data = json.load(f)
-			return Player.from_dict(data)
-		except Exception:
+			player = Player.from_dict(data)
+			# journaled saves: apply the changes appended since this snapshot
+			from save_journal import replay_journal
+			replay_journal(player, data, path)
+			return player
+		except FileNotFoundError:
 			return None
+		except Exception as e:
+			raise SaveLoadError(f"cannot load the save {path}: {e}") from e
+
+
+def _equipped_ref(item, owned: OwnedItems):
+	"""uid of an equipped owned item, full dict if it is not owned (or None)."""
+	if item is None:
+		return None
+	if owned.owns(item):
+		return item.uid
+	return item.to_dict()
+
+
+def _resolve_equipped(ref, owned: OwnedItems, from_dict):
+	"""Inverse of _equipped_ref; also accepts the old full-dict format (matched by type)."""
+	if ref is None:
+		return None
+	if isinstance(ref, dict):
+		if "uid" not in ref:
+			# old saves: point at an owned item of the same type so identity checks keep working
+			t = from_dict(ref).item_type
+			same = owned.by_type(t)
+			return same[0] if same else from_dict(ref)
+		return owned.get(int(ref["uid"])) or from_dict(ref)
+	return owned.get(ref)
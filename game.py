@@ -1,14 +1,50 @@
-from random import randint, random
-from typing import Optional, Tuple, List
-from entities import Entity, Potion, Weapon, Armor, Monster, Player
+from typing import TYPE_CHECKING, Optional, Tuple, List, Union
+from catalog import ArmorType, WeaponType
+from dice import Dice
+from encounter import Encounter
+from entities import Entity, Potion, Monster, Player
 
+if TYPE_CHECKING:
+	from shop import ShopLoader, ShopVisit
+
+_SHOP: Optional['ShopLoader'] = None
+
+
+def shared_shop() -> 'ShopLoader':
+	"""Shop loader shared by every Game: the shop file is parsed once and re-read only when it changes.
+	Created (and shop.py imported) on first use, the first screens don't need it.
+	"""
+	global _SHOP
+	if _SHOP is None:
+		from shop import SHOP_FILE, ShopLoader
+		_SHOP = ShopLoader(SHOP_FILE)
+	return _SHOP
+
+
+# Flee odds, shared with the headless simulators so both stay in sync
+FLEE_CHANCE = 0.6
+FLEE_HP_BONUS = 0.1
+# d100 roll at or below which a monster met by wander_encounter comes with a pack of 2d4 goblins
+PACK_CHANCE = 10
+# d100 roll at or below which a step on the dungeon map meets a monster (see step_encounter)
+STEP_ENCOUNTER_CHANCE = 5
 
 class Game:
 	"""Encapsulates non-UI game logic: wandering, encounters, combat resolution."""
 
-	def __init__(self, seed: Optional[int] = None):
+	def __init__(self, seed: Optional[int] = None, rng: Optional[Dice] = None, shop: Optional['ShopLoader'] = None):
 		self.rng_seed = seed
-		# If deterministic behavior required, user can set seed externally via random.seed(seed)
+		# Every roll of this game (and of the attacks it resolves) goes through this RNG,
+		# so a given seed replays the same dungeon
+		self.rng = rng if rng is not None else Dice(seed)
+		self._shop = shop
+		self._shop_visit: Optional['ShopVisit'] = None
+
+	@property
+	def shop(self) -> 'ShopLoader':
+		if self._shop is None:
+			self._shop = shared_shop()
+		return self._shop
 
 	def create_healing_potion(self, small: bool = True) -> Potion:
 		if small:
@@ -17,43 +53,77 @@ class Game:
 
 	def generate_monster(self, difficulty: int = 1) -> Entity:
 		# Simple monster generator: scale hp and damage with difficulty
-		hp = 8 + randint(0, 4) * difficulty
-		damage = 2 + randint(0, 2) * difficulty
-		armor = 10 + randint(0, 2)
+		hp = 8 + self.rng.randint(0, 4) * difficulty
+		damage = 2 + self.rng.randint(0, 2) * difficulty
+		armor = 10 + self.rng.randint(0, 2)
 		return Monster(name='Goblin', hp=hp, _damage=damage, max_hp=hp, armor=armor)
 
+	def generate_pack(self, size: int, difficulty: int = 1) -> Encounter:
+		return Encounter([self.generate_monster(difficulty) for _ in range(size)], self.rng)
+
+	def wander_encounter(self, hero: Player) -> Tuple[str, Optional[Encounter]]:
+		"""wander(), where the monster may come with a pack of 2d4 goblins (led by it if it is an orc).
+		Return: (message, encounter_or_None)
+		"""
+		msg, monster = self.wander(hero)
+		if monster is None:
+			return (msg, None)
+		return self._with_pack(msg, monster)
+
+	def step_encounter(self, hero: Player) -> Tuple[str, Optional[Encounter]]:
+		"""A step on the dungeon map: STEP_ENCOUNTER_CHANCE% of the time, the monsters of wander_encounter.
+		Return: (message, encounter_or_None); the message is empty when nothing happens
+		"""
+		if self.rng.d100() > STEP_ENCOUNTER_CHANCE:
+			return ("", None)
+		# the rolls of wander() that bring a monster
+		monster = self._wandering_monster(self.rng.randint(41, 100))
+		return self._with_pack(f"A {monster.name} appears!", monster)
+
+	def _with_pack(self, msg: str, monster: Entity) -> Tuple[str, Encounter]:
+		if self.rng.d100() > PACK_CHANCE:
+			return (msg, Encounter([monster], self.rng))
+		goblins = [self.generate_monster(difficulty=1) for _ in range(self.rng.roll(4) + self.rng.roll(4))]
+		if monster.name == 'Orc':
+			return (f"An {monster.name} leads a pack of {len(goblins)} Goblins!", Encounter(goblins + [monster], self.rng))
+		return (f"A pack of {len(goblins) + 1} Goblins appears!", Encounter([monster] + goblins, self.rng))
+
 	def wander(self, hero: Player) -> Tuple[str, Optional[Entity]]:
 		"""Hero wanders: either finds nothing or encounters a monster.
 		Return: (message, monster_or_None)
 		"""
-		roll = randint(1, 100)
+		roll = self.rng.d100()
 		if roll <= 40:
 			# 40% chance nothing
 			return ("You wander the dungeon but find nothing.", None)
-		elif roll <= 85:
+		monster = self._wandering_monster(roll)
+		return (f"A {monster.name} appears!", monster)
+
+	def _wandering_monster(self, roll: int) -> Entity:
+		"""Monster met on a wander roll above 40."""
+		if roll <= 85:
 			# 45% chance small encounter
-			monster = self.generate_monster(difficulty=1)
-			return (f"A {monster.name} appears!", monster)
-		else:
-			# 15% chance tougher monster
-			monster = self.generate_monster(difficulty=2)
-			monster.name = 'Orc'
-			return (f"A {monster.name} appears!", monster)
+			return self.generate_monster(difficulty=1)
+		# 15% chance tougher monster
+		monster = self.generate_monster(difficulty=2)
+		monster.name = 'Orc'
+		return monster
 
 	def attack(self, attacker: Entity, defender: Entity) -> int:
 		"""Resolve an attack; returns damage dealt."""
-		dmg = attacker.attack(defender)
+		dmg = attacker.attack(defender, self.rng)
 		return dmg
 
-	def attempt_flee(self, hero: Player, monster: Monster) -> bool:
+	def attempt_flee(self, hero: Player, monster: Union[Monster, Encounter]) -> bool:
 		"""Hero attempts to flee: success chance based on random roll and simple modifier.
 		Returns True if flee succeeded.
 		"""
-		chance = 0.6
-		# small modifier: if hero has more hp than monster, easier to flee
-		if hero.hp > monster.hp:
-			chance += 0.1
-		return random() < chance
+		chance = FLEE_CHANCE
+		# small modifier: if hero has more hp than the monster (or the whole pack), easier to flee
+		foe_hp = monster.total_hp() if isinstance(monster, Encounter) else monster.hp
+		if hero.hp > foe_hp:
+			chance += FLEE_HP_BONUS
+		return self.rng.random() < chance
 
 	def clamp_hp(self, entity: Entity) -> None:
 		entity.hp = max(0, min(entity.max_hp, entity.hp))
@@ -61,7 +131,7 @@ class Game:
 	def handle_loot(self, monster: Monster) -> Optional[Potion]:
 		"""When a monster is defeated, there is a chance to drop a healing potion."""
 		# 30% chance to drop a small potion, 5% chance large
-		roll = randint(1, 100)
+		roll = self.rng.d100()
 		if roll <= 5:
 			return self.create_healing_potion(small=False)
 		if roll <= 35:
@@ -73,19 +143,23 @@ class Game:
 		# base on monster max_hp and damage
 		base = max(1, monster.max_hp // 2 + monster.damage)
 		# randomize a bit
-		return randint(base, base + 5)
-
-	def get_shop_weapons(self) -> List[Weapon]:
-		# static list for the shop
-		return [
-			Weapon(name='Short Sword', damage=2, cost=10),
-			Weapon(name='Long Sword', damage=4, cost=20),
-			Weapon(name='Great Axe', damage=6, cost=35),
-		]
-
-	def get_shop_armors(self) -> List[Armor]:
-		return [
-			Armor(name='Leather Armor', value=12, cost=12),
-			Armor(name='Chain Mail', value=16, cost=28),
-			Armor(name='Plate Armor', value=20, cost=50),
-		]
\ No newline at end of file
+		return self.rng.randint(base, base + 5)
+
+	def get_shop_weapons(self) -> List[WeaponType]:
+		# item types on sale (shop.json), instantiated on purchase
+		return self.shop.get().weapon_types
+
+	def get_shop_armors(self) -> List[ArmorType]:
+		return self.shop.get().armor_types
+
+	def enter_shop(self) -> 'ShopVisit':
+		"""Start a new visit: prices and stock are rolled again."""
+		self._shop_visit = self.shop.get().visit(self.rng)
+		return self._shop_visit
+
+	def shop_visit(self) -> 'ShopVisit':
+		"""Current visit; restarted if the shop file was reloaded meanwhile."""
+		visit = self._shop_visit
+		if visit is None or visit.catalog is not self.shop.get():
+			visit = self.enter_shop()
+		return visit
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""Headless backend for the curses UI: a virtual screen and a keystroke replay driver.
+
+`VirtualScreen` implements the part of the curses window API that CursesUI
+uses (`addstr`, `erase`, `clear`, `refresh`, `getmaxyx`, `getch`, ...) on an
+in-memory grid, so the UI runs without a terminal. Keys come from a queue;
+`row()` and `text()` give the screen contents back.
+
+`replay()` feeds a keystroke script through `CursesUI.run()` (the real event
+loop, with frames drawn as soon as they are requested) and times every
+keypress: the mode's handler, then the frame drawn after it. `ReplayReport`
+groups the timings by the mode that handled the key.
+
+Scripts are whitespace-separated tokens, `#` starting a comment:
+  w a j        single keys
+  /goblin      several characters typed in a row
+  ENTER ESC UP DOWN LEFT RIGHT PGUP PGDN HOME END BACKSPACE SPACE
+  RESIZE:24x80 resize the screen (delivers KEY_RESIZE)
+  w*20         any token repeated
+
+Usage: python headless.py [SCRIPT]   (a built-in tour of every mode by default)
+"""
+import asyncio
+import curses
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from entities import Armor, Player, Potion, Weapon
+from game import Game
+from message_log import MessageLog
+from save_manager import SaveManager
+from session import parse_keys as parse_key_tokens
+from ui_curses import LOG_CAPACITY, CursesUI
+
+# main menu -> dungeon (fights, inventory, history search) -> castle (buy, sell) -> quit
+DEFAULT_SCRIPT = """
+ENTER h w*6 a*8 w*6 a*8 r a*4
+i u j*3 e s s s ESC
+PGUP PGUP j*5 /goblin ENTER n n N q
+w*6 a*8 m
+DOWN ENTER ENTER DOWN*3 PGDN ENTER UP ENTER ESC
+DOWN ENTER j*4 ENTER ESC
+DOWN ENTER s j*2 ESC
+RESIZE:24x80 ESC UP ENTER w*4 a*6
+RESIZE:30x100 m DOWN*2 ENTER
+"""
+
+# a queued key, or a pending resize (lines, cols)
+Key = Union[int, Tuple[int, int]]
+
+
+def parse_keys(script: str) -> List[Key]:
+	keys: List[Key] = []
+	for line in script.splitlines():
+		for token in line.split('#', 1)[0].split():
+			if token.startswith('RESIZE:'):
+				count = 1
+				if '*' in token:
+					token, n = token.rsplit('*', 1)
+					count = int(n)
+				lines, cols = token[len('RESIZE:'):].split('x')
+				keys.extend([(int(lines), int(cols))] * count)
+			else:
+				keys.extend(parse_key_tokens(token, max_keys=None))  # a local script: no limit
+	return keys
+
+
+class VirtualScreen:
+	"""In-memory stand-in for a curses window.
+
+	Like curses, text runs on to the next line at the right edge and
+	writing the bottom-right cell raises `curses.error` (after drawing it).
+	`getch()` hands out at most `keys_per_read` queued keys, then returns -1
+	once, as a terminal does between two keypresses.
+	"""
+
+	def __init__(self, lines: int = 30, cols: int = 100, keys: Iterable[Key] = (), keys_per_read: int = 1):
+		self.keys: Deque[Key] = deque(keys)
+		self.keys_per_read = keys_per_read
+		self._read = 0
+		self.resize(lines, cols)
+
+	def resize(self, lines: int, cols: int) -> None:
+		self.lines, self.cols = lines, cols
+		self.chars = [[' '] * cols for _ in range(lines)]
+		self.attrs = [[0] * cols for _ in range(lines)]
+
+	def feed(self, keys: Iterable[Key]) -> None:
+		self.keys.extend(keys)
+
+	def getmaxyx(self) -> Tuple[int, int]:
+		return self.lines, self.cols
+
+	def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+		if not (0 <= y < self.lines and 0 <= x < self.cols):
+			raise curses.error("addstr() returned ERR")
+		for ch in text:
+			self.chars[y][x] = ch
+			self.attrs[y][x] = attr
+			x += 1
+			if x == self.cols:
+				y, x = y + 1, 0
+				if y == self.lines:
+					raise curses.error("addstr() returned ERR")
+
+	def erase(self) -> None:
+		for y in range(self.lines):
+			self.chars[y][:] = [' '] * self.cols
+			self.attrs[y][:] = [0] * self.cols
+
+	def clear(self) -> None:
+		self.erase()
+
+	def refresh(self) -> None:
+		pass
+
+	def noutrefresh(self) -> None:
+		pass
+
+	def nodelay(self, flag: bool) -> None:
+		pass
+
+	def keypad(self, flag: bool) -> None:
+		pass
+
+	def getch(self) -> int:
+		if not self.keys or self._read >= self.keys_per_read:
+			self._read = 0
+			return -1
+		self._read += 1
+		key = self.keys.popleft()
+		if isinstance(key, tuple):
+			self.resize(*key)
+			return curses.KEY_RESIZE
+		return key
+
+	def row(self, y: int) -> str:
+		return ''.join(self.chars[y]).rstrip()
+
+	def text(self) -> str:
+		return '\n'.join(self.row(y) for y in range(self.lines))
+
+
+def percentile(values: List[float], p: float) -> float:
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class ModeTimings:
+	def __init__(self):
+		self.handler: List[float] = []  # seconds, one per key
+		self.draw: List[float] = []  # seconds, frame drawn after each key
+
+	@property
+	def keys(self) -> int:
+		return len(self.handler)
+
+	@property
+	def keys_per_sec(self) -> float:
+		busy = sum(self.handler) + sum(self.draw)
+		return self.keys / busy if busy else 0.0
+
+
+class ReplayReport:
+	def __init__(self):
+		self.modes: Dict[str, ModeTimings] = {}
+		self.keys = 0
+		self.frames = 0  # a frame can follow several keys, or none (timers, background results)
+		self.elapsed = 0.0  # wall clock of the whole replay, event loop included
+
+	@property
+	def keys_per_sec(self) -> float:
+		return self.keys / self.elapsed if self.elapsed else 0.0
+
+	def format(self) -> str:
+		out = [f"{'mode':<12} {'keys':>6} {'handler avg':>12} {'p95':>8} {'draw avg':>10} {'p95':>8} {'keys/s':>9}"]
+		for mode, t in sorted(self.modes.items(), key=lambda kv: -kv[1].keys):
+			out.append(
+				f"{mode:<12} {t.keys:>6} {sum(t.handler) / t.keys * 1e6:>10.0f}us {percentile(t.handler, 95) * 1e6:>6.0f}us"
+				f" {sum(t.draw) / t.keys * 1e6:>8.0f}us {percentile(t.draw, 95) * 1e6:>6.0f}us {t.keys_per_sec:>9.0f}")
+		out.append(f"total: {self.keys} keys, {self.frames} frames in {self.elapsed:.3f}s ({self.keys_per_sec:.0f} keys/s)")
+		return '\n'.join(out)
+
+
+def replay(ui: CursesUI, keys: Iterable[Key]) -> ReplayReport:
+	"""Run `ui` on its event loop until every key is handled and drawn (or the script quits).
+
+	`ui.stdscr` must wrap a `VirtualScreen`; frames are not rate limited.
+	"""
+	screen: VirtualScreen = ui.stdscr.window
+	screen.feed(keys)
+	report = ReplayReport()
+	waiting: List[Tuple[str, float]] = []  # (mode, handler time) of keys not drawn yet
+	handle_key, draw = ui.handle_key, ui.draw
+	previous = {attr: vars(ui).get(attr) for attr in ('handle_key', 'draw')}
+
+	def timed_handle_key(c: int) -> bool:
+		mode = ui.mode
+		t0 = time.perf_counter()
+		result = handle_key(c)
+		waiting.append((mode, time.perf_counter() - t0))
+		return result
+
+	def timed_draw() -> None:
+		t0 = time.perf_counter()
+		draw()
+		elapsed = time.perf_counter() - t0
+		report.frames += 1
+		for mode, handler in waiting:
+			t = report.modes.setdefault(mode, ModeTimings())
+			t.handler.append(handler)
+			t.draw.append(elapsed / len(waiting))
+		report.keys += len(waiting)
+		waiting.clear()
+
+	async def drive() -> None:
+		task = asyncio.ensure_future(ui.run(watch_stdin=False))
+		while not task.done() and (screen.keys or waiting):
+			await asyncio.sleep(0)
+		ui.stop()
+		await task
+
+	ui.handle_key, ui.draw = timed_handle_key, timed_draw
+	ui.frame_time = ui.poll_interval = 0
+	t0 = time.perf_counter()
+	try:
+		asyncio.run(drive())
+	finally:
+		report.elapsed = time.perf_counter() - t0
+		for attr, own in (('handle_key', timed_handle_key), ('draw', timed_draw)):
+			# leave alone a wrapper installed on top of ours meanwhile (e.g. the profiler's)
+			if vars(ui).get(attr) is own:
+				if previous[attr] is None:
+					delattr(ui, attr)
+				else:
+					setattr(ui, attr, previous[attr])
+	return report
+
+
+def make_headless_ui(screen: VirtualScreen, workdir: str, hero: Optional[Player] = None, seed: int = 1) -> CursesUI:
+	"""A CursesUI on `screen`, saving to and logging in `workdir`, with a seeded game."""
+	if hero is None:
+		# sturdy enough to live through the default script
+		hero = Player(name='Hero', hp=60, max_hp=60, gold=300,
+			equipped_weapon=Weapon.create('Long Sword', 4, 20), equipped_armor=Armor.create('Chain Mail', 16, 28))
+		for _ in range(3):
+			hero.add_potion(Potion('Small Healing Potion', 5))
+	saver = SaveManager(os.path.join(workdir, 'save_player.json'))
+	log = MessageLog(LOG_CAPACITY, path=os.path.join(workdir, 'session.log'))
+	return CursesUI(screen, hero, Game(seed=seed), saver, log, doupdate=lambda: None, curs_set=lambda visibility: None,
+		resize_term=lambda: None)
+
+
+def main() -> None:
+	script = DEFAULT_SCRIPT
+	if len(sys.argv) > 1:
+		with open(sys.argv[1], 'r', encoding='utf-8') as f:
+			script = f.read()
+	keys = parse_keys(script)
+	with tempfile.TemporaryDirectory() as tmp:
+		ui = make_headless_ui(VirtualScreen(), tmp)
+		try:
+			report = replay(ui, keys)
+		finally:
+			ui.saver.close()
+			ui.exploration_log.close()
+	print(report.format())
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,330 @@
+"""Player inventory containers.
+
+`PotionStacks` groups identical potions (same name and heal) into one stack
+with a count. `OwnedItems` holds weapons or armors: it keeps the order items
+were added in (the order shown in the UI and written to saves) and indexes
+them by instance id, by catalog type and, incrementally, by the sort keys it
+was given (damage, armor value, cost...).
+
+Positions are kept in a list with tombstones for removed items; a Fenwick
+tree over the "slot is alive" flags turns "i-th item" and "position of this
+item" into O(log n) queries, so removing from the middle never shifts the
+list. Tombstones are compacted once they outnumber the live items.
+
+A sorted view is a plain sorted list of (key, uid), built on first use and
+then kept up to date: finding the place of an item is a binary search, but
+inserting or deleting it shifts the list, O(n) (a memmove of n pointers,
+microseconds for thousands of items). Views that are never asked for cost
+nothing.
+"""
+import bisect
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from compat import add_slots
+
+if TYPE_CHECKING:
+	from entities import Potion
+
+
+@add_slots
+@dataclass
+class PotionStack:
+	potion: 'Potion'
+	count: int = 1
+
+
+class PotionStacks:
+	"""Potions stacked by kind, in the order each kind was first picked up."""
+
+	def __init__(self, potions: Iterable['Potion'] = ()):
+		self._stacks: List[PotionStack] = []
+		self._by_kind: Dict[Tuple[str, int], PotionStack] = {}
+		self.total = 0  # potions, all stacks together
+		counts: Dict[Tuple[str, int], int] = {}
+		first: Dict[Tuple[str, int], 'Potion'] = {}
+		for p in potions:
+			key = (p.name, p.heal)
+			counts[key] = counts.get(key, 0) + 1
+			first.setdefault(key, p)
+		for key, n in counts.items():
+			self.add(first[key], n)
+
+	def add(self, potion: 'Potion', count: int = 1) -> PotionStack:
+		key = (potion.name, potion.heal)
+		stack = self._by_kind.get(key)
+		if stack is None:
+			stack = self._by_kind[key] = PotionStack(potion, 0)
+			self._stacks.append(stack)
+		stack.count += count
+		self.total += count
+		return stack
+
+	def take(self, index: int) -> 'Potion':
+		"""Remove one potion from the stack at `index` and return it."""
+		return self._take_from(self._stacks[index])
+
+	def take_kind(self, potion: 'Potion') -> Optional['Potion']:
+		"""Remove one potion of the same kind as `potion`; None if there is none."""
+		stack = self._by_kind.get((potion.name, potion.heal))
+		return self._take_from(stack) if stack is not None else None
+
+	def _take_from(self, stack: PotionStack) -> 'Potion':
+		stack.count -= 1
+		self.total -= 1
+		if not stack.count:
+			# a handful of potion kinds at most: the list scan is not worth an index
+			self._stacks.remove(stack)
+			del self._by_kind[(stack.potion.name, stack.potion.heal)]
+		return stack.potion
+
+	def potion_at(self, flat_index: int) -> Optional['Potion']:
+		"""Potion at `flat_index` in the unstacked order (as listed by `expand`)."""
+		if flat_index < 0:
+			return None
+		for stack in self._stacks:
+			if flat_index < stack.count:
+				return stack.potion
+			flat_index -= stack.count
+		return None
+
+	def expand(self) -> Iterator['Potion']:
+		"""One entry per potion, stack after stack (the save file layout)."""
+		for stack in self._stacks:
+			for _ in range(stack.count):
+				yield stack.potion
+
+	def __len__(self) -> int:
+		return len(self._stacks)
+
+	def __getitem__(self, index: int) -> PotionStack:
+		return self._stacks[index]
+
+	def __iter__(self) -> Iterator[PotionStack]:
+		return iter(self._stacks)
+
+	def __eq__(self, other) -> bool:
+		if not isinstance(other, PotionStacks):
+			return NotImplemented
+		return self._stacks == other._stacks
+
+	def __repr__(self) -> str:
+		return f"PotionStacks({self._stacks!r})"
+
+
+class _Fenwick:
+	"""Binary indexed tree of 0/1 flags: prefix counts and k-th set flag in O(log n)."""
+
+	def __init__(self, ones: int = 0):
+		"""Tree of `ones` flags all set (node i of an all-ones tree covers lowbit(i) flags)."""
+		self._tree = [0] + [i & -i for i in range(1, ones + 1)]
+
+	def __len__(self) -> int:
+		return len(self._tree) - 1
+
+	def append(self, value: int) -> None:
+		i = len(self._tree)
+		# node i covers (i - lowbit(i), i]: its own value plus the nodes below it
+		total = value
+		j = i - 1
+		stop = i - (i & -i)
+		while j > stop:
+			total += self._tree[j]
+			j -= j & -j
+		self._tree.append(total)
+
+	def add(self, index: int, delta: int) -> None:
+		i = index + 1
+		n = len(self._tree)
+		while i < n:
+			self._tree[i] += delta
+			i += i & -i
+
+	def prefix(self, index: int) -> int:
+		"""Sum of the flags before `index`."""
+		total = 0
+		i = index
+		while i > 0:
+			total += self._tree[i]
+			i -= i & -i
+		return total
+
+	def select(self, k: int) -> int:
+		"""Index of the (k+1)-th set flag."""
+		pos = 0
+		step = 1 << (len(self._tree) - 1).bit_length()
+		while step:
+			nxt = pos + step
+			if nxt < len(self._tree) and self._tree[nxt] <= k:
+				pos = nxt
+				k -= self._tree[nxt]
+			step >>= 1
+		return pos
+
+
+class SortedView:
+	"""Read-only sequence of an `OwnedItems` ordered by one of its sort keys."""
+
+	def __init__(self, owned: 'OwnedItems', entries: List[Tuple[Any, int]], reverse: bool):
+		self._owned = owned
+		self._entries = entries
+		self._reverse = reverse
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def __getitem__(self, index: int):
+		n = len(self._entries)
+		if index < 0:
+			index += n
+		if not 0 <= index < n:
+			raise IndexError("sorted view index out of range")
+		if self._reverse:
+			index = n - 1 - index
+		return self._owned.get(self._entries[index][1])
+
+	def __iter__(self):
+		entries = reversed(self._entries) if self._reverse else self._entries
+		return (self._owned.get(uid) for _, uid in entries)
+
+
+class OwnedItems:
+	"""Owned weapons or armors, indexed by position, uid, type and sort keys.
+
+	Behaves like the list it replaces (`len`, iteration, `items[i]`, `append`,
+	`pop(i)`) with O(log n) positional access and removal; each sorted view in
+	use adds O(n) to `append` and removal (see the module docstring).
+	`sort_keys` maps a view name to a picklable key function (e.g.
+	`attrgetter('damage')`).
+	"""
+
+	def __init__(self, items: Iterable = (), sort_keys: Optional[Dict[str, Callable[[Any], Any]]] = None):
+		self.sort_keys = dict(sort_keys or {})
+		# bulk build (loading a save): O(n); the type index and sorted views are built on first use
+		self._slots: List[Any] = list(items)  # None marks a removed item
+		self._len = len(self._slots)
+		self._alive = _Fenwick(self._len)
+		self._pos: Dict[int, int] = {item.uid: slot for slot, item in enumerate(self._slots)}  # uid -> slot
+		if len(self._pos) != self._len:
+			raise ValueError("duplicate item uid")
+		self._by_type: Optional[Dict[Any, Dict[int, Any]]] = None  # item type -> {uid: item}, in insertion order
+		self._sorted: Dict[str, List[Tuple[Any, int]]] = {}  # view name -> sorted (key, uid)
+
+	def __len__(self) -> int:
+		return self._len
+
+	def __iter__(self) -> Iterator:
+		return (item for item in self._slots if item is not None)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return list(self)[index]
+		return self._slots[self._slot(index)]
+
+	def __contains__(self, item) -> bool:
+		return self.owns(item)
+
+	def __eq__(self, other) -> bool:
+		if isinstance(other, OwnedItems):
+			return self._len == other._len and list(self) == list(other)
+		if isinstance(other, list):
+			return list(self) == other
+		return NotImplemented
+
+	def __repr__(self) -> str:
+		return f"OwnedItems({list(self)!r})"
+
+	def _slot(self, index: int) -> int:
+		if index < 0:
+			index += self._len
+		if not 0 <= index < self._len:
+			raise IndexError("item index out of range")
+		return self._alive.select(index)
+
+	def append(self, item) -> None:
+		if item.uid in self._pos:
+			raise ValueError(f"item #{item.uid} is already owned")
+		self._pos[item.uid] = len(self._slots)
+		self._slots.append(item)
+		self._alive.append(1)
+		self._len += 1
+		if self._by_type is not None:
+			self._by_type.setdefault(item.item_type, {})[item.uid] = item
+		for name, entries in self._sorted.items():
+			bisect.insort(entries, (self.sort_keys[name](item), item.uid))
+
+	def pop(self, index: int = -1):
+		slot = self._slot(index)
+		item = self._slots[slot]
+		self._remove_slot(slot, item)
+		return item
+
+	def remove(self, item) -> None:
+		if not self.owns(item):
+			raise ValueError(f"item #{item.uid} is not owned")
+		self._remove_slot(self._pos[item.uid], item)
+
+	def _remove_slot(self, slot: int, item) -> None:
+		self._slots[slot] = None
+		self._alive.add(slot, -1)
+		self._len -= 1
+		del self._pos[item.uid]
+		if self._by_type is not None:
+			same_type = self._by_type[item.item_type]
+			del same_type[item.uid]
+			if not same_type:
+				del self._by_type[item.item_type]
+		for name, entries in self._sorted.items():
+			del entries[bisect.bisect_left(entries, (self.sort_keys[name](item), item.uid))]
+		if len(self._slots) > 32 and len(self._slots) > 2 * self._len:
+			self._compact()
+
+	def _compact(self) -> None:
+		self._slots = [item for item in self._slots if item is not None]
+		self._pos = {item.uid: slot for slot, item in enumerate(self._slots)}
+		self._alive = _Fenwick(len(self._slots))
+
+	def index(self, item) -> int:
+		"""Position of `item` (as in `items[i]`), O(log n)."""
+		if not self.owns(item):
+			raise ValueError(f"item #{item.uid} is not owned")
+		return self._alive.prefix(self._pos[item.uid])
+
+	def get(self, uid: int):
+		slot = self._pos.get(uid)
+		return self._slots[slot] if slot is not None else None
+
+	def owns(self, item) -> bool:
+		"""True if this very object (not just an equal one) is owned."""
+		slot = self._pos.get(getattr(item, 'uid', None))
+		return slot is not None and self._slots[slot] is item
+
+	def by_type(self, item_type) -> List:
+		return list(self._types().get(item_type, {}).values())
+
+	def count_type(self, item_type) -> int:
+		return len(self._types().get(item_type, ()))
+
+	def _types(self) -> Dict[Any, Dict[int, Any]]:
+		if self._by_type is None:
+			self._by_type = {}
+			for item in self:
+				self._by_type.setdefault(item.item_type, {})[item.uid] = item
+		return self._by_type
+
+	def sorted_by(self, name: str, reverse: bool = False) -> SortedView:
+		"""Items ordered by sort key `name`, ties by uid; `reverse=True` reverses the whole order, ties included."""
+		return SortedView(self, self._view(name), reverse)
+
+	def best(self, name: str):
+		"""Item with the highest `name` key (None when empty)."""
+		entries = self._view(name)
+		return self.get(entries[-1][1]) if entries else None
+
+	def _view(self, name: str) -> List[Tuple[Any, int]]:
+		entries = self._sorted.get(name)
+		if entries is None:
+			# first use: one sort, then kept up to date by append/remove
+			key = self.sort_keys[name]
+			entries = self._sorted[name] = sorted((key(item), item.uid) for item in self)
+		return entries
@@ -1,12 +1,32 @@
-from entities import Entity, Player
-from ui_curses import run_curses
+from profiler import STARTUP  # first, so the startup clock includes every import
+import sys
+from typing import Optional
 
-SAVE_FILE = 'save_player.json'
+from binary_save import load_startup_snapshot
+from entities import STORE_SCHEME, Entity, Player, SaveLoadError
+from ui_curses import SAVE_FILE, run_curses
+
+STARTUP.mark('imports')
+
+
+def load_player(path: str = SAVE_FILE) -> Optional[Player]:
+	"""The saved player, from the startup snapshot when it is up to date."""
+	player = None
+	if not path.startswith(STORE_SCHEME):
+		player = load_startup_snapshot(path)
+	if player is None:
+		player = Player.load_from_file(path)
+	return player
 
 
 if __name__ == '__main__':
 	# Try to load saved player
-	player = Player.load_from_file(SAVE_FILE)
+	try:
+		player = load_player(SAVE_FILE)
+	except SaveLoadError as e:
+		# a new hero would be saved over it at the first save point
+		sys.exit(f"{e}\nMove the save away to start a new hero.")
+	STARTUP.mark('load_save')
 	if player is None:
 		# No save found: create default player
 		player = Player(name='Hero', hp=20, max_hp=30, gold=30)
@@ -0,0 +1,151 @@
+"""Bounded message log for the exploration window.
+
+The last `capacity` messages live in a fixed-size ring buffer, so pushing a
+message is O(1) and memory stays constant however long the session runs.
+Messages pushed out of the ring are appended to a session log file, with a
+side index file holding the byte offset of each line (one little-endian
+uint64 per line). Any range of the history can then be read back by seeking
+straight to it, which is what the scrollback view does: it only ever loads
+the lines that are on screen.
+"""
+import struct
+from typing import List, Optional
+
+_OFFSET = struct.Struct('<Q')
+SEARCH_BLOCK = 256  # lines read per step when searching the history
+
+
+class MessageLog:
+	def __init__(self, capacity: int = 200, path: Optional[str] = None):
+		"""Without `path`, messages leaving the ring are dropped (old behaviour)."""
+		if capacity < 1:
+			raise ValueError("capacity must be >= 1")
+		self.capacity = capacity
+		self.path = path
+		self._buf: List[str] = [''] * capacity
+		self._head = 0  # slot of the oldest message in memory
+		self._count = 0  # messages in memory
+		self._total = 0  # messages ever pushed (= index of the next one)
+		self._spilled = 0  # messages written to the session file
+		self._visible = 0  # first message tail() shows (moved by clear())
+		self._log = None
+		self._idx = None
+		self._log_size = 0
+		if path is not None:
+			# one session per file: a new game starts a new history
+			self._log = open(path, 'w+b')
+			self._idx = open(path + '.idx', 'w+b')
+
+	def __len__(self) -> int:
+		return self._total
+
+	@property
+	def first(self) -> int:
+		"""Index of the oldest message that can still be read back."""
+		if self._log is not None:
+			return 0
+		return self._total - self._count
+
+	def append(self, msg: str) -> None:
+		msg = msg.replace('\n', ' ')
+		cap = self.capacity
+		if self._count == cap:
+			self._evict()
+		self._buf[(self._head + self._count) % cap] = msg
+		self._count += 1
+		self._total += 1
+
+	def clear(self) -> None:
+		"""Empty the on-screen part of the log: tail() starts after the messages pushed so far.
+		With a session file they are kept there, for lines() and the scrollback."""
+		self._visible = self._total
+		while self._count:
+			self._evict()
+
+	def _evict(self) -> None:
+		msg = self._buf[self._head]
+		self._buf[self._head] = ''
+		self._head = (self._head + 1) % self.capacity
+		self._count -= 1
+		if self._log is not None:
+			# both files stay positioned at their end between reads (seeking would flush the buffers)
+			data = msg.encode('utf-8') + b'\n'
+			self._idx.write(_OFFSET.pack(self._log_size))
+			self._log.write(data)
+			self._log_size += len(data)
+			self._spilled += 1
+
+	def tail(self, n: int) -> List[str]:
+		"""The last `n` messages pushed since the last clear(), oldest first."""
+		return self.lines(max(self._total - n, self._visible), self._total)
+
+	def lines(self, start: int, stop: int) -> List[str]:
+		"""Messages `start` to `stop` (excluded), read from memory or disk."""
+		start = max(start, self.first)
+		stop = min(stop, self._total)
+		if start >= stop:
+			return []
+		out: List[str] = []
+		mem_first = self._total - self._count
+		if start < mem_first:
+			out.extend(self._read_spilled(start, min(stop, mem_first)))
+			start = mem_first
+		cap = self.capacity
+		first = (self._head + start - mem_first) % cap
+		end = first + stop - start
+		if end <= cap:
+			out.extend(self._buf[first:end])
+		else:
+			out.extend(self._buf[first:])
+			out.extend(self._buf[:end - cap])
+		return out
+
+	def _read_spilled(self, start: int, stop: int) -> List[str]:
+		# offset of each line, plus the start of the following one as the end of the range
+		n = stop - start + (1 if stop < self._spilled else 0)
+		self._idx.seek(start * _OFFSET.size)
+		raw = self._idx.read(n * _OFFSET.size)
+		offsets = [o for (o,) in _OFFSET.iter_unpack(raw)]
+		end = offsets[stop - start] if stop < self._spilled else self._log_size
+		self._log.seek(offsets[0])
+		data = self._log.read(end - offsets[0])
+		self._idx.seek(0, 2)
+		self._log.seek(0, 2)
+		return data.decode('utf-8').split('\n')[:-1]
+
+	def find(self, text: str, start: int, backward: bool = True) -> Optional[int]:
+		"""Index of the nearest message containing `text` (case-insensitive), from `start` included.
+
+		Searches towards older messages when `backward`, newer otherwise.
+		The history is scanned block by block, never loaded as a whole.
+		"""
+		needle = text.lower()
+		if not needle:
+			return None
+		if backward:
+			hi = min(start + 1, self._total)
+			while hi > self.first:
+				lo = max(self.first, hi - SEARCH_BLOCK)
+				block = self.lines(lo, hi)
+				for i in range(len(block) - 1, -1, -1):
+					if needle in block[i].lower():
+						return lo + i
+				hi = lo
+		else:
+			lo = max(start, self.first)
+			while lo < self._total:
+				hi = min(self._total, lo + SEARCH_BLOCK)
+				for i, msg in enumerate(self.lines(lo, hi)):
+					if needle in msg.lower():
+						return lo + i
+				lo = hi
+		return None
+
+	def close(self) -> None:
+		"""Write the messages still in memory to the session file and close it."""
+		if self._log is None:
+			return
+		self.clear()
+		self._log.close()
+		self._idx.close()
+		self._log = self._idx = None
@@ -0,0 +1,132 @@
+"""Double-buffered diff renderer for the curses UI.
+
+`DiffScreen` wraps a curses window and exposes the subset of its API that
+CursesUI draws with (`erase`, `addstr`, `refresh`, `getmaxyx`, ...). Frames
+are built in an off-screen buffer; `refresh()` compares it with the previous
+frame and sends only the changed runs of cells to the terminal with
+`noutrefresh()` + `doupdate()`. Everything else (`getch`, `nodelay`, ...) is
+forwarded to the real window.
+"""
+import curses
+from typing import Callable, List, Optional
+
+# Rough cost of positioning the cursor before a run (ESC [ row ; col H)
+CURSOR_MOVE_BYTES = 8
+
+
+class RenderStats:
+	def __init__(self):
+		self.frames = 0
+		self.runs = 0
+		self.cells = 0
+		self.bytes = 0
+
+	def reset(self) -> None:
+		self.__init__()
+
+	@property
+	def bytes_per_frame(self) -> float:
+		return self.bytes / self.frames if self.frames else 0.0
+
+
+class DiffScreen:
+	"""Off-screen frame buffer diffed against the last frame on each refresh."""
+
+	def __init__(self, window, doupdate: Optional[Callable[[], None]] = None):
+		self.window = window
+		self._doupdate = doupdate if doupdate is not None else curses.doupdate
+		self.stats = RenderStats()
+		self._lines = 0
+		self._cols = 0
+		self._chars: List[List[str]] = []
+		self._attrs: List[List[int]] = []
+		self._front_chars: List[List[str]] = []
+		self._front_attrs: List[List[int]] = []
+		self._full_redraw = True
+		self._resize(*window.getmaxyx())
+
+	def __getattr__(self, name):
+		return getattr(self.window, name)
+
+	def _resize(self, lines: int, cols: int) -> None:
+		self._lines, self._cols = lines, cols
+		self._chars = [[' '] * cols for _ in range(lines)]
+		self._attrs = [[0] * cols for _ in range(lines)]
+		self._front_chars = [row[:] for row in self._chars]
+		self._front_attrs = [row[:] for row in self._attrs]
+		self._full_redraw = True
+
+	def getmaxyx(self):
+		return self.window.getmaxyx()
+
+	def erase(self) -> None:
+		lines, cols = self.window.getmaxyx()
+		if (lines, cols) != (self._lines, self._cols):
+			self._resize(lines, cols)
+			return
+		blank = [' '] * cols
+		zeros = [0] * cols
+		for y in range(lines):
+			self._chars[y][:] = blank
+			self._attrs[y][:] = zeros
+
+	def clear(self) -> None:
+		self.erase()
+		self._full_redraw = True
+
+	def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+		"""Like window.addstr, but text running past the right edge is clipped instead of wrapped."""
+		if y < 0 or y >= self._lines or x < 0 or x >= self._cols:
+			raise curses.error("addstr() returned ERR")
+		text = text[:self._cols - x]
+		end = x + len(text)
+		self._chars[y][x:end] = text
+		self._attrs[y][x:end] = [attr] * len(text)
+
+	def noutrefresh(self) -> None:
+		self._flush()
+		self.window.noutrefresh()
+
+	def refresh(self) -> None:
+		self.noutrefresh()
+		self._doupdate()
+
+	def _flush(self) -> None:
+		stats = self.stats
+		stats.frames += 1
+		if self._full_redraw:
+			self.window.erase()
+			front_chars = [[None] * self._cols for _ in range(self._lines)]
+			front_attrs = [[None] * self._cols for _ in range(self._lines)]
+			self._full_redraw = False
+		else:
+			front_chars, front_attrs = self._front_chars, self._front_attrs
+		last_y, last_x = self._lines - 1, self._cols - 1
+		for y in range(self._lines):
+			chars, attrs = self._chars[y], self._attrs[y]
+			old_chars, old_attrs = front_chars[y], front_attrs[y]
+			if chars == old_chars and attrs == old_attrs:
+				continue
+			x = 0
+			cols = self._cols
+			while x < cols:
+				if chars[x] == old_chars[x] and attrs[x] == old_attrs[x]:
+					x += 1
+					continue
+				# run of changed cells sharing the same attribute
+				start, attr = x, attrs[x]
+				x += 1
+				while x < cols and attrs[x] == attr and (chars[x] != old_chars[x] or attrs[x] != old_attrs[x]):
+					x += 1
+				run = ''.join(chars[start:x])
+				try:
+					self.window.addstr(y, start, run, attr)
+				except curses.error:
+					# writing the bottom-right cell moves the cursor off-screen; the cell is drawn anyway
+					if not (y == last_y and x - 1 == last_x):
+						raise
+				stats.runs += 1
+				stats.cells += len(run)
+				stats.bytes += CURSOR_MOVE_BYTES + len(run.encode('utf-8'))
+		self._front_chars = [row[:] for row in self._chars]
+		self._front_attrs = [row[:] for row in self._attrs]
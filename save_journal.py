@@ -0,0 +1,146 @@
+"""Append-only save journal.
+
+Instead of rewriting the whole `Player.to_dict()` tree on every change, each
+mutating `Player` method (add_gold, spend_gold, add_weapon, sell_armor,
+drink_potion_kind, equip/unequip, ...) appends a small record to
+`<save>.journal`. Every `compact_every` records the journal is folded into a
+full snapshot (the regular save file) and truncated.
+
+Journal layout: one JSON object per line. The first line is a header
+`{"epoch": ...}`; each following line is `{"seq": n, "op": name, "args": [...]}`.
+The snapshot stores the epoch and the last sequence number it contains
+(`journal_epoch`, `journal_seq`), so a crash between writing the snapshot and
+truncating the journal never replays a record twice.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from save_manager import write_json_atomic
+
+COMPACT_EVERY = 200
+
+
+def journal_path(path: str) -> str:
+	return path + '.journal'
+
+
+class SaveJournal:
+	"""Collects Player mutations in memory (UI thread) and commits them to disk (save thread)."""
+
+	def __init__(self, path: str, compact_every: int = COMPACT_EVERY):
+		self.path = path
+		self.log_path = journal_path(path)
+		self.compact_every = compact_every
+		self.epoch = os.urandom(6).hex()  # 12 hex digits, like the uuid4 prefix it replaces (uuid is slow to import)
+		self._lock = threading.Lock()
+		self._seq = 0
+		self._pending: List[Dict[str, Any]] = []
+		self._snapshot: Optional[Dict[str, Any]] = None
+		self._snapshot_due = True
+		self._since_snapshot = 0
+		self._hp: Optional[int] = None
+
+	def attach(self, player) -> None:
+		"""Start journaling `player`. The next capture writes a fresh snapshot of it."""
+		with self._lock:
+			player._journal = self
+			self._snapshot_due = True
+			self._hp = None
+
+	def record(self, op: str, args: List[Any]) -> None:
+		"""Called by Player after each mutation."""
+		with self._lock:
+			self._seq += 1
+			self._pending.append({"seq": self._seq, "op": op, "args": args})
+
+	def capture(self, player) -> None:
+		"""Save point: record direct HP changes (combat) and snapshot the player when compaction is due."""
+		with self._lock:
+			if player.hp != self._hp:
+				self._seq += 1
+				self._pending.append({"seq": self._seq, "op": "set_hp", "args": [player.hp]})
+				self._hp = player.hp
+			if self._snapshot_due or self._since_snapshot + len(self._pending) >= self.compact_every:
+				snap = player.to_dict()
+				snap["journal_epoch"] = self.epoch
+				snap["journal_seq"] = self._seq
+				# the snapshot supersedes every record not yet on disk
+				self._snapshot = snap
+				self._pending = []
+				self._since_snapshot = 0
+				self._snapshot_due = False
+
+	def commit(self) -> None:
+		"""Write the pending snapshot and/or records. Cost is O(change) unless compacting."""
+		with self._lock:
+			snap, self._snapshot = self._snapshot, None
+			records, self._pending = self._pending, []
+			self._since_snapshot += len(records)
+		try:
+			if snap is not None:
+				write_json_atomic(self.path, snap)
+				self._reset_log()
+			if records:
+				with open(self.log_path, 'a', encoding='utf-8') as f:
+					f.write(''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n' for r in records))
+					f.flush()
+					os.fsync(f.fileno())
+		except OSError:
+			# what is on disk may now be incomplete: start over from a full snapshot
+			with self._lock:
+				self._snapshot_due = True
+			raise
+
+	def _reset_log(self) -> None:
+		tmp = self.log_path + '.tmp'
+		with open(tmp, 'w', encoding='utf-8') as f:
+			f.write(json.dumps({"epoch": self.epoch}) + '\n')
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, self.log_path)
+
+
+def replay_journal(player, snapshot: Dict[str, Any], path: str) -> int:
+	"""Apply the journal tail of save `path` on top of `player` (built from `snapshot`).
+	Returns the number of records applied.
+	"""
+	from entities import Armor, Potion, Weapon
+
+	decoders = {"add_potion": Potion.from_dict, "drink_potion_kind": Potion.from_dict, "add_weapon": Weapon.from_dict, "add_armor": Armor.from_dict}
+	try:
+		f = open(journal_path(path), 'r', encoding='utf-8')
+	except OSError:
+		return 0
+	applied = 0
+	with f:
+		try:
+			header = json.loads(f.readline())
+		except ValueError:
+			return 0
+		if header.get("epoch") != snapshot.get("journal_epoch"):
+			# journal from another session, already folded into (or older than) the snapshot
+			return 0
+		last = snapshot.get("journal_seq", 0)
+		for line in f:
+			try:
+				rec = json.loads(line)
+			except ValueError:
+				break  # torn last line after a crash
+			if rec["seq"] <= last:
+				continue
+			op, args = rec["op"], rec["args"]
+			if op == "set_hp":
+				player.hp = args[0]
+			elif op == "drink_potion":
+				# journals written before potions were stacked: index into the flat potion list
+				p = player.inventory.potion_at(args[0])
+				if p is not None:
+					player.drink_potion_kind(p)
+			elif op in decoders:
+				getattr(player, op)(decoders[op](args[0]))
+			else:
+				getattr(player, op)(*args)
+			applied += 1
+	return applied
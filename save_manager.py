@@ -0,0 +1,187 @@
+"""Write-behind saving of the player.
+
+The UI marks the player dirty after each change; a background thread,
+shared by every save file of the process, coalesces bursts of changes into a
+single write. Every write goes to a
+temporary file which is fsync'ed and then atomically renamed over the save,
+so a crash mid-write never leaves a truncated `save_player.json`.
+
+With a `SaveJournal`, writes only append the records of what changed
+(see save_journal.py) and a full snapshot is rewritten on compaction.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+	"""Write `data` as compact JSON to `path` through temp file + fsync + rename."""
+	write_bytes_atomic(path, json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def write_bytes_atomic(path: str, data: bytes) -> None:
+	"""Write `data` to `path` through temp file + fsync + rename."""
+	import tempfile  # only needed once the first save is written, not at startup
+	directory = os.path.dirname(os.path.abspath(path))
+	fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			f.write(data)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tmp, path)
+	except BaseException:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+	_fsync_dir(directory)
+
+
+def _fsync_dir(directory: str) -> None:
+	"""Make the rename itself durable (not supported on Windows)."""
+	try:
+		fd = os.open(directory, os.O_RDONLY)
+	except OSError:
+		return
+	try:
+		os.fsync(fd)
+	except OSError:
+		pass
+	finally:
+		os.close(fd)
+
+
+class SaveWriter:
+	"""One background thread writing the pending saves of any number of SaveManagers.
+
+	Every SaveManager uses the process-wide writer (`shared_writer()`) unless given
+	its own: a server with hundreds of sessions runs one save thread, not hundreds.
+	Writes are done one at a time, the manager whose delay ran out first first.
+	"""
+
+	def __init__(self):
+		self._cond = threading.Condition()
+		self._due: Dict['SaveManager', float] = {}  # managers with a pending state -> write deadline
+		self._thread: Optional[threading.Thread] = None
+
+	def _schedule(self, manager: 'SaveManager') -> None:
+		"""Called with the lock held when `manager` gets a pending state."""
+		if manager not in self._due:
+			# let a burst of changes settle into one write
+			self._due[manager] = time.monotonic() + manager.delay
+		if self._thread is None:
+			# started on the first save, not at startup
+			self._thread = threading.Thread(target=self._run, name='save-writer', daemon=True)
+			self._thread.start()
+		self._cond.notify_all()
+
+	def _next(self) -> Optional['SaveManager']:
+		"""The manager to write now, None before the first deadline (lock held)."""
+		if not self._due:
+			return None
+		for manager in self._due:
+			if manager._hurry or manager._closed:
+				return manager
+		manager, deadline = min(self._due.items(), key=lambda item: item[1])
+		return manager if deadline <= time.monotonic() else None
+
+	def _run(self) -> None:
+		cond = self._cond
+		while True:
+			with cond:
+				manager = self._next()
+				while manager is None:
+					if self._due:
+						cond.wait(min(self._due.values()) - time.monotonic())
+					else:
+						cond.wait()
+					manager = self._next()
+				del self._due[manager]
+				data, manager._pending = manager._pending, None
+				manager._hurry = False
+				manager._writing = True
+			try:
+				manager._write(data)
+				manager.writes += 1
+			except Exception as e:
+				manager.last_error = e
+			finally:
+				with cond:
+					manager._writing = False
+					cond.notify_all()
+
+
+_SHARED_WRITER: Optional[SaveWriter] = None
+
+
+def shared_writer() -> SaveWriter:
+	global _SHARED_WRITER
+	if _SHARED_WRITER is None:
+		_SHARED_WRITER = SaveWriter()
+	return _SHARED_WRITER
+
+
+class SaveManager:
+	"""Write-behind saving of one save file.
+
+	mark_dirty() only snapshots the player in memory; the disk write happens
+	on the writer's thread, at most once per `delay` seconds.
+	"""
+
+	def __init__(self, path: str, delay: float = 0.5, journal=None, writer: Optional[SaveWriter] = None):
+		self.path = path
+		self.delay = delay
+		self.journal = journal
+		self.writes = 0
+		self.last_error: Optional[BaseException] = None
+		self._writer = writer if writer is not None else shared_writer()
+		self._cond = self._writer._cond
+		self._pending: Optional[Dict[str, Any]] = None
+		self._writing = False
+		self._hurry = False
+		self._closed = False
+
+	def track(self, player) -> None:
+		"""Follow a (new) player object, e.g. after a restart."""
+		if self.journal is not None:
+			self.journal.attach(player)
+
+	def mark_dirty(self, player) -> None:
+		"""Schedule a save of the current state of `player` (never blocks on I/O)."""
+		if self.journal is not None:
+			# records are already collected by the journal; only the commit is pending
+			self.journal.capture(player)
+			data = {}
+		else:
+			data = player.to_dict()
+		with self._cond:
+			self._pending = data
+			self._writer._schedule(self)
+
+	def flush(self, wait: bool = True, timeout: Optional[float] = None) -> bool:
+		"""Write any pending state now. With wait=False only skip the coalescing delay.
+		Returns True when nothing is left to write.
+		"""
+		with self._cond:
+			self._hurry = self._pending is not None
+			self._cond.notify_all()
+			if not wait:
+				return self._pending is None and not self._writing
+			return self._cond.wait_for(lambda: self._pending is None and not self._writing, timeout)
+
+	def close(self) -> None:
+		"""Write pending state and wait for it (the writer's thread keeps serving the other managers)."""
+		with self._cond:
+			self._closed = True
+			self._cond.notify_all()
+			self._cond.wait_for(lambda: self._pending is None and not self._writing)
+
+	def _write(self, data: Dict[str, Any]) -> None:
+		if self.journal is not None:
+			self.journal.commit()
+		else:
+			write_json_atomic(self.path, data)
@@ -0,0 +1,275 @@
+"""SQLite save store: the saves of many players in one database.
+
+A save location is a file path (JSON or binary save) or
+`sqlite:<database>#<player id>`, one row of a `SQLiteStore`.
+`Player.save_to_file` and `Player.load_from_file` accept both, and
+`open_saver()` gives the write-behind saver for either.
+
+`SQLiteStore` has two connections per database, shared by every player and
+thread (each behind its lock): one for the writer thread and one for reads,
+in WAL mode with synchronous=NORMAL. Reads never wait for a commit, and a
+commit does not fsync the database (a crash can lose the last commits, never
+leave a corrupt database). `save()` only
+queues the player's state, encoded in the binary save format; a writer
+thread commits everything queued -- the latest state of each player -- in a
+single transaction every `flush_interval` seconds; if it fails, its saves
+are queued again and retried with the next batch. Name and gold are also
+stored in indexed columns for queries across players (`top_by_gold`).
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from binary_save import decode_player, encode_player
+from entities import STORE_SCHEME, Player
+from save_journal import SaveJournal
+from save_manager import SaveManager
+
+FLUSH_INTERVAL = 0.05  # seconds between two commits
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+	id TEXT PRIMARY KEY,
+	name TEXT NOT NULL,
+	gold INTEGER NOT NULL,
+	data BLOB NOT NULL,
+	updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_gold ON players (gold);
+"""
+_UPSERT = "INSERT OR REPLACE INTO players (id, name, gold, data, updated) VALUES (?, ?, ?, ?, ?)"
+
+# (id, name, gold, data, updated)
+Row = Tuple[str, str, int, bytes, float]
+
+
+class SQLiteStore:
+	def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL):
+		self.path = path
+		self.flush_interval = flush_interval
+		self.commits = 0
+		self.rows_written = 0
+		self.failed_commits = 0
+		self.last_error: Optional[BaseException] = None
+		# autocommit mode: transactions are opened explicitly by the writer
+		self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._conn.execute("PRAGMA journal_mode=WAL")
+		self._conn.execute("PRAGMA synchronous=NORMAL")
+		self._conn.executescript(_SCHEMA)
+		self._db = threading.Lock()  # the connection, used by the writer thread
+		# reads get their own connection: in WAL mode they see the last commit without waiting for the next one
+		self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self._read = threading.Lock()  # the reader connection
+		self._cond = threading.Condition()  # the queues below
+		self._pending: Dict[str, Row] = {}  # player id -> latest state, not committed yet
+		self._batch: Dict[str, Row] = {}  # being committed
+		self._hurry = False
+		self._closed = False
+		self._thread = threading.Thread(target=self._run, name='sqlite-store', daemon=True)
+		self._thread.start()
+
+	def save(self, player_id: str, player: Player) -> None:
+		"""Queue the current state of `player`; committed with the next batch."""
+		row = (player_id, player.name, player.gold, encode_player(player), time.time())
+		with self._cond:
+			if self._closed:
+				raise ValueError(f"{self.path} is closed")
+			wake = not self._pending
+			self._pending[player_id] = row
+			if wake:
+				self._cond.notify_all()
+
+	def load(self, player_id: str) -> Optional[Player]:
+		"""Latest state of a player, queued or committed; None if it was never saved."""
+		with self._cond:
+			row = self._pending.get(player_id) or self._batch.get(player_id)
+		if row is not None:
+			data = row[3]
+		else:
+			with self._read:
+				found = self._reader.execute("SELECT data FROM players WHERE id = ?", (player_id,)).fetchone()
+			if found is None:
+				return None
+			data = found[0]
+		return decode_player(data)
+
+	def top_by_gold(self, n: int = 10) -> List[Tuple[str, str, int]]:
+		"""(id, name, gold) of the `n` richest players, from the committed saves (walks the gold index)."""
+		with self._read:
+			return self._reader.execute("SELECT id, name, gold FROM players ORDER BY gold DESC LIMIT ?", (n,)).fetchall()
+
+	def __len__(self) -> int:
+		with self._read:
+			return self._reader.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+	def flush(self, wait: bool = True, timeout: Optional[float] = None) -> bool:
+		"""Commit the queued saves now. With wait=False only skip the batching delay.
+		Returns True when nothing is left to commit; False on timeout or when a commit failed
+		meanwhile (`last_error`; its saves are queued again and retried with the next batch).
+		"""
+		with self._cond:
+			failures = self.failed_commits
+			self._hurry = bool(self._pending)
+			self._cond.notify_all()
+			if wait:
+				self._cond.wait_for(lambda: (not self._pending and not self._batch) or self.failed_commits != failures, timeout)
+			return self.failed_commits == failures and not self._pending and not self._batch
+
+	def close(self) -> None:
+		"""Commit the queued saves and close the connections."""
+		with self._cond:
+			if self._closed:
+				return
+			self._closed = True
+			self._cond.notify_all()
+		self._thread.join()
+		with self._db:
+			self._conn.close()
+		with self._read:
+			self._reader.close()
+
+	def _run(self) -> None:
+		while True:
+			with self._cond:
+				self._cond.wait_for(lambda: self._pending or self._closed)
+				if not self._pending:
+					return
+				# let saves pile up into one transaction
+				deadline = time.monotonic() + self.flush_interval
+				while not (self._hurry or self._closed):
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						break
+					self._cond.wait(remaining)
+				self._batch, self._pending = self._pending, {}
+				self._hurry = False
+			failed = None
+			try:
+				self._commit(list(self._batch.values()))
+			except sqlite3.Error as e:
+				failed = e
+			finally:
+				with self._cond:
+					if failed is not None:
+						self.last_error = failed
+						self.failed_commits += 1
+						if not self._closed:
+							# retried with the next batch, unless a newer state of the player is queued by now
+							# (once closed there is no next batch: they are lost, last_error tells)
+							for player_id, row in self._batch.items():
+								self._pending.setdefault(player_id, row)
+					self._batch = {}
+					self._cond.notify_all()
+
+	def _commit(self, rows: List[Row]) -> None:
+		with self._db:
+			self._conn.execute("BEGIN")
+			try:
+				self._conn.executemany(_UPSERT, rows)
+				self._conn.execute("COMMIT")
+			except BaseException:
+				# a failed COMMIT (e.g. "database is locked") leaves the transaction open:
+				# without the rollback every later BEGIN would fail
+				if self._conn.in_transaction:
+					try:
+						self._conn.execute("ROLLBACK")
+					except sqlite3.Error:
+						pass
+				raise
+		self.commits += 1
+		self.rows_written += len(rows)
+
+
+# one store (and connection) per database file
+_STORES: Dict[str, SQLiteStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def store_for(path: str) -> SQLiteStore:
+	key = os.path.abspath(path)
+	with _STORES_LOCK:
+		store = _STORES.get(key)
+		if store is None:
+			store = _STORES[key] = SQLiteStore(path)
+		return store
+
+
+def close_stores() -> None:
+	"""Commit and close every store opened by store_for()."""
+	with _STORES_LOCK:
+		stores = list(_STORES.values())
+		_STORES.clear()
+	for store in stores:
+		store.close()
+
+
+def store_location(path: str, player_id: str) -> str:
+	return f"{STORE_SCHEME}{path}#{player_id}"
+
+
+def parse_location(location: str) -> Optional[Tuple[str, str]]:
+	"""(database, player id) of a store location; None for a file path."""
+	if not location.startswith(STORE_SCHEME):
+		return None
+	path, sep, player_id = location[len(STORE_SCHEME):].rpartition('#')
+	if not sep or not path or not player_id:
+		raise ValueError(f"bad save location {location!r}, expected {STORE_SCHEME}<database>#<player id>")
+	return path, player_id
+
+
+def save_to_store(player: Player, location: str) -> None:
+	"""Save `player` at a store location and wait for the commit."""
+	path, player_id = parse_location(location)
+	store = store_for(path)
+	store.save(player_id, player)
+	if not store.flush():
+		raise store.last_error
+
+
+def load_from_store(location: str) -> Optional[Player]:
+	path, player_id = parse_location(location)
+	return store_for(path).load(player_id)
+
+
+class StoreSaver:
+	"""Write-behind saves of one player to a SQLiteStore, with the interface of SaveManager.
+
+	Like SaveManager's writer, the store's single thread serves every player,
+	and it commits all their changes in one transaction.
+	"""
+
+	def __init__(self, store: SQLiteStore, player_id: str):
+		self.store = store
+		self.player_id = player_id
+		self.path = store_location(store.path, player_id)
+		self.journal = None
+		self.writes = 0  # saves handed to the store
+
+	@property
+	def last_error(self) -> Optional[BaseException]:
+		return self.store.last_error
+
+	def track(self, player) -> None:
+		pass
+
+	def mark_dirty(self, player) -> None:
+		self.store.save(self.player_id, player)
+		self.writes += 1
+
+	def flush(self, wait: bool = True, timeout: Optional[float] = None) -> bool:
+		return self.store.flush(wait, timeout)
+
+	def close(self) -> None:
+		"""Wait until this player's last save is committed (the store stays open for the others)."""
+		self.store.flush()
+
+
+def open_saver(location: str):
+	"""The write-behind saver of a save location: StoreSaver for a store row, journaled SaveManager for a file."""
+	parsed = parse_location(location)
+	if parsed is None:
+		return SaveManager(location, journal=SaveJournal(location))
+	path, player_id = parsed
+	return StoreSaver(store_for(path), player_id)
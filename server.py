@@ -0,0 +1,249 @@
+"""Multi-player game server: hundreds of GameSessions over TCP in one process.
+
+Every connection plays its own `GameSession` (session.py): its own player,
+`Game` (and so RNG), write-behind save and message log. Saves are journaled
+files `<save dir>/<name>.json`, or with `--store DB` the rows of one SQLite
+database (save_store.py) committed in batches for every player at once. Sessions only run when their player sends a command, all
+on one asyncio loop; loading a save and closing it (the last write) happen
+in worker threads so a big save never stalls the other players.
+
+Protocol, plain UTF-8 text, one line per message:
+  client -> server  first line: the player name (letters, digits, '-', '_'), which picks the save;
+                    then one command per line, keys as in session.parse_keys:
+                    "w", "ENTER", "DOWN*3", "/goblin", "DOWN ENTER", "RIGHT*5"...
+                    at most session.MAX_KEYS_PER_COMMAND keys per command, else "ERR bad command";
+  server -> client  after the login and after each command, a frame: "FRAME <n>" then n lines;
+                    "BYE" when the player quits, "ERR <reason>" for a refused login or command.
+A name is played by one connection at a time.
+
+Usage: python server.py [--host 127.0.0.1] [--port 7777] [--save-dir saves | --store players.db] [--auto SPEC]
+(`--port 0` picks a free port; the address is printed on the first line.)
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import sys
+import time
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from autobattle import AutoPolicy, parse_policy
+from entities import Player, SaveLoadError
+from game import Game
+from message_log import MessageLog
+from profiler import Histogram
+from save_store import close_stores, open_saver, store_location
+from session import CASTLE_MENU, LOG_CAPACITY, MAIN_MENU, GameSession, parse_keys
+
+DEFAULT_PORT = 7777
+NAME_RE = re.compile(r'[A-Za-z0-9_-]{1,32}')
+MAX_LINE = 4096  # longest command line accepted
+BACKLOG = 1024  # pending connections, for many players connecting at once
+MAP_ROWS = 9  # rows of dungeon map per frame, in the explore, combat and dead modes
+LOG_LINES = 12  # exploration messages (and history lines) per frame
+LIST_ROWS = 14  # rows of the buy, sell and inventory lists per frame
+FRAME_COLS = 80
+LIST_TITLES = {'castle_shop': "Castle - Shop (Buy)", 'sell': "Castle - Sell Items", 'inventory': "Inventory"}
+LIST_KEYS = {
+	'castle_shop': "[j/k] Move  [ENTER] Buy  [i] Inventory  [ESC] Castle",
+	'sell': "[j/k] Move  [ENTER] Sell  [ESC] Castle",
+	'inventory': "[j/k] Move  [u] Use  [e] Equip/Unequip  [s] Sort  [ESC] Back",
+}
+
+
+class TextScreen:
+	"""Rows of plain text with the `addstr` of a window, for ListView.draw (attributes are dropped)."""
+
+	def __init__(self, lines: int, cols: int):
+		self.rows = [''] * lines
+		self.cols = cols
+
+	def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+		row = self.rows[y].ljust(x)
+		self.rows[y] = row[:x] + text + row[x + len(text):]
+
+
+def render_frame(session: GameSession) -> List[str]:
+	"""The session as text: status bar, the current panel, the panel message and the keys."""
+	out = [session.status_line()]
+	mode = session.mode
+	if mode == 'main_menu':
+		out.append("Main Menu")
+		out += [f"{'>' if i == session.menu_cursor else ' '} {opt}" for i, opt in enumerate(MAIN_MENU)]
+		keys = "[j/k] Move  [ENTER] Select"
+	elif mode == 'castle_menu':
+		out.append("Castle")
+		out += [f"{'>' if i == session.castle_menu_cursor else ' '} {opt}" for i, opt in enumerate(CASTLE_MENU)]
+		keys = "[j/k] Move  [ENTER] Select  [ESC] Main menu"
+	elif mode in LIST_TITLES:
+		# only the rows in view are formatted, whatever the size of the inventory
+		screen = TextScreen(LIST_ROWS, FRAME_COLS)
+		session.current_list().draw(screen, 0, 0, LIST_ROWS, FRAME_COLS)
+		out.append(LIST_TITLES[mode])
+		out += [row.rstrip() for row in screen.rows]
+		keys = LIST_KEYS[mode]
+	elif mode == 'scrollback':
+		window = session.history_window()
+		out.append(f"History — {session.scroll_top + 1}-{session.scroll_top + len(window)} of {len(session.exploration_log)}")
+		out += window
+		keys = "[PGUP/PGDN] Scroll  [/text ENTER] Search  [n/N] Next/Prev  [ESC] Back"
+		if session.search_input is not None:
+			keys = "/" + session.search_input
+	else:
+		out += session.map_view(FRAME_COLS, MAP_ROWS)
+		out += session.exploration_log.tail(LOG_LINES)
+		keys = session.dungeon_prompt()
+	out.append(session.get_panel_message())
+	out.append(keys)
+	return out
+
+
+def encode_frame(lines: List[str]) -> bytes:
+	return (f"FRAME {len(lines)}\n" + ''.join(line + '\n' for line in lines)).encode('utf-8')
+
+
+class GameServer:
+	def __init__(self, save_dir: str, store: Optional[str] = None, auto_policy: Optional[AutoPolicy] = None):
+		self.save_dir = save_dir
+		self.store = store  # SQLite database holding every save, instead of one file per player
+		self.auto_policy = auto_policy or AutoPolicy()  # auto-battle settings of every session
+		self.sessions: Dict[str, Optional[GameSession]] = {}  # player name -> session (None while it loads)
+		self.served = 0  # connections that logged in
+		self.connections: Dict['asyncio.Task', asyncio.StreamWriter] = {}
+		self.command_time = Histogram()  # ns to run a command and render its frame
+
+	async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+		return await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE, backlog=BACKLOG)
+
+	async def open_session(self, name: str) -> GameSession:
+		if self.store is not None:
+			path = store_location(self.store, name)
+		else:
+			path = os.path.join(self.save_dir, name + '.json')
+		loop = asyncio.get_running_loop()
+		hero = await loop.run_in_executor(None, Player.load_from_file, path)
+		if hero is None:
+			# same new player as main.py
+			hero = Player(name=name, hp=20, max_hp=30, gold=30)
+		saver = open_saver(path)
+		# history kept in memory only: a session file per player would cost two descriptors each
+		session = GameSession(hero, Game(), saver, MessageLog(LOG_CAPACITY))
+		session.size = (LOG_LINES + 6, FRAME_COLS)  # history pages of LOG_LINES
+		session.auto_policy = replace(self.auto_policy)
+		session.push_exploration("Welcome to the dungeon. Walk with the arrow keys or press 'w' to wander.")
+		return session
+
+	async def close_session(self, session: GameSession) -> None:
+		# waits for the last write (the save thread is shared by all sessions)
+		await asyncio.get_running_loop().run_in_executor(None, session.saver.close)
+		session.exploration_log.close()
+
+	async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		name = None
+		session = None
+		self.connections[asyncio.current_task()] = writer
+		try:
+			name = (await reader.readline()).decode('utf-8', 'replace').strip()
+			if not NAME_RE.fullmatch(name):
+				writer.write(b"ERR bad name: 1 to 32 letters, digits, '-' or '_'\n")
+				name = None
+				return
+			if name in self.sessions:
+				writer.write(f"ERR {name} is already playing\n".encode('utf-8'))
+				name = None
+				return
+			self.sessions[name] = None
+			try:
+				session = self.sessions[name] = await self.open_session(name)
+			except SaveLoadError as e:
+				# never replaced by a new hero: the save stays as it is for repair
+				print(e, file=sys.stderr, flush=True)
+				writer.write(f"ERR the save of {name} cannot be loaded\n".encode('utf-8'))
+				return
+			self.served += 1
+			writer.write(encode_frame(render_frame(session)))
+			while True:
+				await writer.drain()
+				line = await reader.readline()
+				if not line:
+					break  # disconnected
+				try:
+					keys = parse_keys(line.decode('utf-8', 'replace'))
+				except ValueError:
+					writer.write(b"ERR bad command\n")
+					continue
+				t0 = time.perf_counter_ns()
+				playing = all(session.handle_key(c) for c in keys)
+				frame = encode_frame(render_frame(session)) if playing else b"BYE\n"
+				self.command_time.record(time.perf_counter_ns() - t0)
+				writer.write(frame)
+				if not playing:
+					await writer.drain()
+					break
+		except (ConnectionError, ValueError):
+			# dropped connection, or a line longer than MAX_LINE
+			pass
+		finally:
+			if session is not None:
+				await self.close_session(session)
+			if name is not None:
+				# released once saved: logging in again loads the last state
+				del self.sessions[name]
+			writer.close()
+			del self.connections[asyncio.current_task()]
+
+	async def shutdown(self) -> None:
+		"""Disconnect every player and wait until their sessions are saved and closed."""
+		# closed rather than cancelled: each connection sees its player leave and saves as usual
+		for writer in self.connections.values():
+			writer.close()
+		await asyncio.gather(*self.connections, return_exceptions=True)
+
+	def summary(self) -> str:
+		s = self.command_time.summary()
+		return (f"{self.served} sessions, {s['count']} commands; per command p50 {s['p50_us']:.0f}us"
+			f"  p95 {s['p95_us']:.0f}us  p99 {s['p99_us']:.0f}us  max {s['max_us']:.0f}us")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Host many players of the dungeon game over TCP.")
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"default {DEFAULT_PORT}, 0 for any free port")
+	parser.add_argument('--save-dir', default='saves', help="one save per player name (default saves/)")
+	parser.add_argument('--store', metavar='DB', help="keep every save in this SQLite database instead")
+	parser.add_argument('--auto', type=parse_policy, default=AutoPolicy(), metavar='SPEC',
+		help="auto-battle policy, e.g. stop=0.3,drink=0.5,potions=no,repeat=20")
+	args = parser.parse_args()
+	if args.store is None:
+		os.makedirs(args.save_dir, exist_ok=True)
+	server = GameServer(args.save_dir, args.store, args.auto)
+
+	async def serve() -> None:
+		loop = asyncio.get_running_loop()
+		stop = asyncio.Event()
+		for sig in (signal.SIGINT, signal.SIGTERM):
+			try:
+				loop.add_signal_handler(sig, stop.set)
+			except (NotImplementedError, RuntimeError):
+				pass  # Windows: Ctrl-C still raises KeyboardInterrupt
+		tcp = await server.start(args.host, args.port)
+		host, port = tcp.sockets[0].getsockname()[:2]
+		print(f"listening on {host}:{port}", flush=True)
+		async with tcp:
+			await stop.wait()
+		await server.shutdown()
+
+	try:
+		asyncio.run(serve())
+	except KeyboardInterrupt:
+		pass
+	finally:
+		# commits the last batch of saves
+		close_stores()
+	print(server.summary(), flush=True)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,755 @@
+"""Game session: the mode/state machine of one player, independent of any front-end.
+
+`GameSession` owns a player, its `Game` (and so its RNG), its save and its
+message log, and turns keys into game actions: menus, dungeon, combat, shop,
+inventory and history browsing. It knows nothing about how it is shown.
+In explore mode the hero walks a `DungeonMap` with the arrow keys; front-
+ends draw the tiles around the hero with `map_view`.
+CursesUI (ui_curses.py) draws one on a terminal; server.py hosts hundreds
+of them behind a TCP socket.
+
+Keys are ints with the same codes as curses' getch() (`KEY_UP`, ... below),
+so a curses front-end passes its keys through unchanged; `parse_keys` reads
+them from text ("w", "ENTER", "DOWN*3", "/goblin"). Front-ends that
+animate or schedule repaints override the hooks (`request_redraw`,
+`call_later`, `animate_encounter`); by default they do nothing.
+"""
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from autobattle import LOW_HP, MAX_ROUNDS, SLAIN, AutoPolicy, BattleReport, auto_explore, auto_resolve
+from dungeon_map import DungeonMap
+from encounter import AttackSummary, Encounter
+from entities import Armor, Player, Weapon
+from game import Game
+from message_log import MessageLog
+from save_manager import SaveManager
+from widgets import ListView, Section
+
+# key codes of curses' getch() for the keys the game uses
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
+KEY_HOME = 262
+KEY_BACKSPACE = 263
+KEY_NPAGE = 338
+KEY_PPAGE = 339
+KEY_END = 360
+
+KEY_NAMES: Dict[str, int] = {
+	'ENTER': ord('\n'),
+	'ESC': 27,
+	'UP': KEY_UP,
+	'DOWN': KEY_DOWN,
+	'LEFT': KEY_LEFT,
+	'RIGHT': KEY_RIGHT,
+	'PGUP': KEY_PPAGE,
+	'PGDN': KEY_NPAGE,
+	'HOME': KEY_HOME,
+	'END': KEY_END,
+	'BACKSPACE': KEY_BACKSPACE,
+	'SPACE': ord(' '),
+}
+
+LOG_CAPACITY = 200  # messages kept in memory
+PANEL_MESSAGE_TIME = 2.0  # seconds a panel message stays visible
+SCREEN_SIZE = (24, 80)  # (lines, cols) assumed by front-ends that don't report theirs
+MAIN_MENU = ['Go to Dungeon', 'Go to Castle', 'Quit']
+CASTLE_MENU = ['Buy Items', 'Sell Items', 'Inventory', 'Return to Main Menu']
+# inventory orders for weapons/armors: (label, weapon view, armor view); None = order of acquisition
+INVENTORY_SORTS = [('acquired', None, None), ('best', 'damage', 'value'), ('price', 'cost', 'cost')]
+# arrow keys of explore mode: one step on the dungeon map
+WALK_KEYS = {KEY_UP: (0, -1), KEY_DOWN: (0, 1), KEY_LEFT: (-1, 0), KEY_RIGHT: (1, 0)}
+HERO_TILE = '@'
+# keys one parse_keys() call may return: a single command of a remote player can't hold the game for long
+MAX_KEYS_PER_COMMAND = 64
+
+
+def parse_keys(text: str, max_keys: Optional[int] = MAX_KEYS_PER_COMMAND) -> List[int]:
+	"""Keys of whitespace-separated tokens: a key name (KEY_NAMES), characters typed in a row, `token*N` repeats.
+	Raises ValueError for a bad repeat count or more than `max_keys` keys in all (None: no limit).
+	"""
+	keys: List[int] = []
+	for token in text.split():
+		count = 1
+		if '*' in token[1:]:
+			token, n = token.rsplit('*', 1)
+			count = int(n)
+			if count < 0:
+				raise ValueError(f"negative repeat count in {token}*{n}")
+		seq = [KEY_NAMES[token]] if token in KEY_NAMES else [ord(ch) for ch in token]
+		# checked before the keys are built: `w*100000000` must not allocate anything
+		if max_keys is not None and len(keys) + len(seq) * count > max_keys:
+			raise ValueError(f"more than {max_keys} keys in one command")
+		keys.extend(seq * count)
+	return keys
+
+
+class GameSession:
+	"""One player's game: a key goes in, the state below changes; front-ends read the state to draw it."""
+
+	def __init__(self, hero: Player, game: Game, saver: SaveManager, log: Optional[MessageLog] = None):
+		self.hero = hero
+		self.saver = saver  # write-behind saves, never blocks the session
+		# Initial state of the hero, to restart from. Taken before the first key is handled
+		# (nothing changes the hero earlier), so it costs nothing before the first frame
+		self.hero_template: Optional[Dict[str, Any]] = None
+		self.saver.track(self.hero)
+		self.game = game
+		self.size = SCREEN_SIZE
+
+		# Two separate message systems
+		# Multi-line log for explore/combat modes: ring buffer, older messages spill to disk
+		self.exploration_log = log if log is not None else MessageLog(LOG_CAPACITY)
+		self.panel_message: str = ""  # Single-line message for menus/panels
+		self.panel_message_time: float = 0  # Time when panel message was set
+
+		self.mode = 'main_menu'  # start at main menu
+		self.encounter: Optional[Encounter] = None  # fight in progress (combat mode)
+		self.auto_policy = AutoPolicy()  # when auto-battle ('f') drinks potions and hands the fight back
+		# the game's seed, else one per hero name: a hero finds the same dungeon every time
+		self.dungeon_map = DungeonMap(game.rng_seed if game.rng_seed is not None else zlib.crc32(hero.name.encode()))
+		self.hero_pos: Optional[Tuple[int, int]] = None  # on the dungeon map; the entrance until the first step
+		self.menu_cursor = 0
+		# scrolling lists (cursor + viewport) of the inventory, buy and sell panels
+		self.inventory_view = ListView(indent=2)
+		self.inventory_sort = 0  # index in INVENTORY_SORTS, cycled with 's'
+		self.shop_view = ListView()
+		self.sell_view = ListView()
+		self.castle_menu_cursor = 0  # cursor pour le menu du château
+		self.previous_mode = None  # mode précédent avant d'ouvrir l'inventaire
+		# scrollback view over the whole exploration history
+		self.scroll_top = 0  # index of the first message shown
+		self.search_query = ""
+		self.search_input: Optional[str] = None  # text being typed after '/', None when not searching
+		self.search_hit: Optional[int] = None  # index of the highlighted match
+
+	# --- front-end hooks ---
+
+	def request_redraw(self) -> None:
+		"""Ask the front-end for a frame (it draws after each key anyway)."""
+
+	def call_later(self, delay: float, callback: Callable, *args) -> None:
+		"""Run `callback(*args)` after `delay` seconds; ignored without a front-end loop."""
+
+	def animate_encounter(self, text: str) -> None:
+		"""Show the encounter banner `text` for a moment."""
+
+	def screen_size(self) -> Tuple[int, int]:
+		"""(lines, cols) of the front-end's screen; sizes the history pages."""
+		return self.size
+
+	# --- state shown by the front-ends ---
+
+	def status_line(self) -> str:
+		"""Hero summary with effective stats."""
+		hero = self.hero
+		return f"{hero.name} — HP: {hero.hp}/{hero.max_hp}  DMG: {hero.damage}  ARM: {hero.armor_class}  Gold: {hero.gold}"
+
+	def dungeon_prompt(self) -> str:
+		"""Keys of the explore, combat and dead modes."""
+		if self.mode == 'dead':
+			return "[r] Restart  [q] Quit"
+		if self.mode == 'explore':
+			return f"[arrows] Walk  [w] Wander  [f] Auto x{self.auto_policy.repeat}  [i] Inventory  [m] Menu  [h] Help"
+		prompt = "[a] Attack  [f] Auto  [r] Flee  [i] Inventory"
+		encounter = self.encounter
+		if encounter is not None and encounter.target >= 0:
+			t = encounter.target
+			prompt += f"    {encounter.names[t]} {encounter.hp[t]}/{encounter.max_hp[t]}"
+			if encounter.alive > 1:
+				prompt += f" (+{encounter.alive - 1} more)"
+		return prompt
+
+	def position(self) -> Tuple[int, int]:
+		if self.hero_pos is None:
+			self.hero_pos = self.dungeon_map.start()
+		return self.hero_pos
+
+	def map_view(self, width: int, height: int) -> List[str]:
+		"""Rows of the dungeon map centred on the hero, who is drawn as HERO_TILE."""
+		x, y = self.position()
+		x0, y0 = x - width // 2, y - height // 2
+		rows = self.dungeon_map.view(x0, y0, width, height)
+		row = rows[y - y0]
+		rows[y - y0] = row[:x - x0] + HERO_TILE + row[x - x0 + 1:]
+		return rows
+
+	def current_list(self) -> Optional[ListView]:
+		"""List of the buy, sell or inventory panel, pointed at the current items; None in other modes."""
+		if self.mode == 'castle_shop':
+			self._shop_sections()
+			return self.shop_view
+		if self.mode == 'sell':
+			self._sell_sections()
+			return self.sell_view
+		if self.mode == 'inventory':
+			self._inventory_sections()
+			return self.inventory_view
+		return None
+
+	def history_window(self) -> List[str]:
+		"""Messages of the history page being browsed (only those are read, from memory or the session file)."""
+		return self.exploration_log.lines(self.scroll_top, self.scroll_top + self._scroll_page())
+
+	# --- actions ---
+
+	def push_exploration(self, msg: str) -> None:
+		"""Add message to exploration log (multi-line display)"""
+		self.exploration_log.append(msg)
+
+	def push_panel(self, msg: str) -> None:
+		"""Set panel message (single-line display, shown for 2 seconds)"""
+		self.panel_message = msg
+		self.panel_message_time = time.time()
+		# repaint once it expires, even if no key is pressed
+		self.call_later(PANEL_MESSAGE_TIME, self.request_redraw)
+
+	def get_panel_message(self) -> str:
+		"""Get current panel message if still valid (within 2 seconds)"""
+		if self.panel_message and time.time() - self.panel_message_time < PANEL_MESSAGE_TIME:
+			return self.panel_message
+		return ""
+
+	def restart(self) -> None:
+		"""Restore hero to initial state and return to exploration."""
+		self.hero = Player.from_dict(self.hero_template)
+		self.saver.track(self.hero)
+		self.encounter = None
+		self.mode = 'explore'
+		self.hero_pos = None  # back at the entrance
+		self.exploration_log.clear()
+		self.push_exploration("You are revived. Press 'w' to continue wandering.")
+
+	def open_inventory(self) -> None:
+		self.previous_mode = self.mode  # Sauvegarder le mode actuel
+		self.inventory_view.cursor = 0
+		self.mode = 'inventory'
+		# Ne pas effacer les messages pour que les push soient visibles
+		# self.log.clear()  # REMOVED to keep messages visible
+
+	def close_inventory(self) -> None:
+		# Ne pas effacer les messages pour qu'ils restent visibles
+		# self.log.clear()  # REMOVED to keep messages visible
+		# Retourner au mode précédent (ou explore par défaut)
+		self.mode = self.previous_mode if self.previous_mode else 'explore'
+		self.previous_mode = None  # Réinitialiser
+
+	def open_scrollback(self) -> None:
+		"""Browse the whole exploration history, starting from the latest page."""
+		self.previous_mode = self.mode
+		self.mode = 'scrollback'
+		self.scroll_top = self._max_scroll_top()
+		self.search_input = None
+		self.search_hit = None
+
+	def close_scrollback(self) -> None:
+		self.mode = self.previous_mode if self.previous_mode else 'explore'
+		self.previous_mode = None
+		self.search_input = None
+		self.search_hit = None
+
+	def _scroll_page(self) -> int:
+		lines, _ = self.screen_size()
+		return max(1, lines - 6)
+
+	def _max_scroll_top(self) -> int:
+		log = self.exploration_log
+		return max(log.first, len(log) - self._scroll_page())
+
+	def scroll_to(self, top: int) -> None:
+		self.scroll_top = max(self.exploration_log.first, min(top, self._max_scroll_top()))
+
+	def search(self, backward: bool = True) -> None:
+		"""Jump to the next match of `search_query`, older messages first."""
+		if not self.search_query:
+			return
+		if self.search_hit is not None:
+			start = self.search_hit - 1 if backward else self.search_hit + 1
+		else:
+			start = self.scroll_top + self._scroll_page() - 1 if backward else self.scroll_top
+		hit = self.exploration_log.find(self.search_query, start, backward)
+		if hit is None:
+			self.push_panel(f"Pattern not found: {self.search_query}")
+			return
+		self.search_hit = hit
+		self.scroll_to(hit - self._scroll_page() // 2)
+
+	def _inventory_sections(self) -> None:
+		"""Point the inventory list at the hero's current potions, weapons and armors."""
+		hero = self.hero
+		label, weapon_key, armor_key = INVENTORY_SORTS[self.inventory_sort]
+		# sorted views are maintained by the containers: nothing is sorted here
+		weapons = hero.weapons.sorted_by(weapon_key, reverse=True) if weapon_key else hero.weapons
+		armors = hero.armors.sorted_by(armor_key, reverse=True) if armor_key else hero.armors
+		suffix = f" (by {label})" if weapon_key else ""
+		self.inventory_view.set_sections([
+			Section("Potions:", hero.inventory, lambda s: f"{s.potion.name} x{s.count} (+{s.potion.heal} HP)", empty="(none)"),
+			Section(f"Weapons{suffix}:", weapons, lambda w: f"{w.name} {'(E)' if hero.equipped_weapon is w else '   '} (DMG+{w.damage}) #{w.uid}"),
+			Section(f"Armors{suffix}:", armors, lambda a: f"{a.name} {'(E)' if hero.equipped_armor is a else '   '} (ARM {a.value})"),
+		])
+
+	def try_drink_selected(self) -> None:
+		"""Legacy method - kept for backward compatibility but unused"""
+		pots = self.hero.list_potions()
+		if not pots:
+			self.push_panel("You have no potions.")
+			return
+		idx = self.inventory_view.cursor
+		healed = self.hero.drink_potion(idx)
+		if healed is None:
+			self.push_panel("Invalid selection.")
+		else:
+			self.push_panel(f"You drink {pots[idx].name} and recover {healed} HP.")
+
+	def _shop_sections(self) -> None:
+		# offers of the current visit; their display lines are precomputed by the shop
+		visit = self.game.shop_visit()
+		self.shop_view.set_sections([
+			Section("Weapons:", visit.weapons, visit.line),
+			Section("Armors:", visit.armors, visit.line),
+		])
+
+	def _sell_sections(self) -> None:
+		# weapons then armors: one cursor over both lists
+		hero = self.hero
+		self.sell_view.set_sections([
+			Section("Weapons:", hero.weapons, lambda w: f"{w.name} {'(E)' if hero.equipped_weapon is w else '   '} (DMG+{w.damage}) sell:{w.cost//2}"),
+			Section("Armors:", hero.armors, lambda a: f"{a.name} {'(E)' if hero.equipped_armor is a else '   '} (ARM {a.value}) sell:{a.cost // 2}"),
+		])
+
+	def handle_key(self, c: int) -> bool:
+		"""Dispatch one key to the current mode. Returns False when the player quits."""
+		if self.hero_template is None:
+			self.hero_template = self.hero.to_dict()
+		# Dispatch to appropriate handler based on mode (Open/Closed Principle)
+		if self.mode == 'main_menu':
+			return self._handle_main_menu(c)
+		elif self.mode == 'castle_menu':
+			self._handle_castle_menu(c)
+		elif self.mode == 'castle_shop':
+			self._handle_castle_shop(c)
+		elif self.mode == 'sell':
+			self._handle_sell_mode(c)
+		elif self.mode == 'dead':
+			return self._handle_dead_mode(c)
+		elif self.mode == 'inventory':
+			self._handle_inventory_mode(c)
+		elif self.mode == 'explore':
+			self._handle_explore_mode(c)
+		elif self.mode == 'combat':
+			self._handle_combat_mode(c)
+		elif self.mode == 'scrollback':
+			self._handle_scrollback_mode(c)
+		return True
+
+	def _handle_main_menu(self, c: int) -> bool:
+		"""Handle main menu input. Returns False if user wants to quit."""
+		if c in (KEY_DOWN, ord('j')):
+			self.menu_cursor = min(self.menu_cursor + 1, len(MAIN_MENU) - 1)
+		elif c in (KEY_UP, ord('k')):
+			self.menu_cursor = max(0, self.menu_cursor - 1)
+		elif c in (ord('\n'), ord('\r')):
+			if self.menu_cursor == 0:
+				# go to dungeon
+				self.mode = 'explore'
+				self.push_exploration('You head into the dungeon...')
+			elif self.menu_cursor == 1:
+				# Save player backup when entering the Castle
+				self.saver.mark_dirty(self.hero)
+				self.mode = 'castle_menu'
+				self.castle_menu_cursor = 0
+			else:
+				return False  # Quit
+		elif c == ord('q'):
+			return False  # Quit
+		return True  # Continue
+
+	def _handle_castle_menu(self, c: int) -> None:
+		"""Handle castle menu input."""
+		if c in (KEY_DOWN, ord('j')):
+			self.castle_menu_cursor = min(self.castle_menu_cursor + 1, len(CASTLE_MENU) - 1)
+		elif c in (KEY_UP, ord('k')):
+			self.castle_menu_cursor = max(0, self.castle_menu_cursor - 1)
+		elif c in (ord('\n'), ord('\r')):
+			if self.castle_menu_cursor == 0:
+				# Go to Buy
+				self.mode = 'castle_shop'
+				self.shop_view.cursor = 0
+				self.game.enter_shop()
+			elif self.castle_menu_cursor == 1:
+				# Go to Sell
+				self.mode = 'sell'
+				self.sell_view.cursor = 0
+			elif self.castle_menu_cursor == 2:
+				# Go to Inventory
+				self.open_inventory()
+			else:
+				# Return to Main Menu
+				self.mode = 'main_menu'
+				self.menu_cursor = 0
+		elif c == 27:  # Esc - return to main menu
+			self.mode = 'main_menu'
+			self.menu_cursor = 0
+
+	def _handle_castle_shop(self, c: int) -> None:
+		"""Handle castle shop input."""
+		self._shop_sections()
+		if c in (KEY_DOWN, ord('j')):
+			self.shop_view.move(1)
+		elif c in (KEY_UP, ord('k')):
+			self.shop_view.move(-1)
+		elif c == KEY_NPAGE:
+			self.shop_view.page(1)
+		elif c == KEY_PPAGE:
+			self.shop_view.page(-1)
+		elif c in (ord('\n'), ord('\r')):
+			self._buy_item()
+		elif c == ord('i'):
+			self.open_inventory()
+		elif c == 27:  # Esc - return to castle menu
+			self.mode = 'castle_menu'
+			self.castle_menu_cursor = 0
+
+	def _buy_item(self) -> None:
+		"""Buy selected item (Dependency Inversion - depends on abstractions)."""
+		sel = self.shop_view.selection()
+		if sel is None:
+			return
+		section, _ = sel
+		visit = self.game.shop_visit()
+		offer = self.shop_view.selected_item()
+		if visit.stock(offer) == 0:
+			self.push_panel(f"{offer.name} is sold out.")
+		elif self.hero.spend_gold(visit.price(offer)):
+			visit.buy(offer)
+			# shop items are shared types: the purchase creates a new owned instance
+			if section == 0:
+				self.hero.add_weapon(Weapon(offer.item_type))
+			else:
+				self.hero.add_armor(Armor(offer.item_type))
+			self.push_panel(f"You bought {offer.name}.")
+			self.saver.mark_dirty(self.hero)
+		else:
+			self.push_panel("Not enough gold.")
+
+	def _handle_sell_mode(self, c: int) -> None:
+		"""Handle sell mode input."""
+		self._sell_sections()
+		if c in (KEY_DOWN, ord('j')):
+			self.sell_view.move(1)
+		elif c in (KEY_UP, ord('k')):
+			self.sell_view.move(-1)
+		elif c == KEY_NPAGE:
+			self.sell_view.page(1)
+		elif c == KEY_PPAGE:
+			self.sell_view.page(-1)
+		elif c in (ord('\n'), ord('\r')):
+			self._sell_item()
+		elif c == 27:  # Esc - return to castle menu
+			self.mode = 'castle_menu'
+			self.castle_menu_cursor = 0
+
+	def _sell_item(self) -> None:
+		"""Sell selected item."""
+		sel = self.sell_view.selection()
+		if sel is None:
+			self.push_panel("Nothing to sell.")
+			return
+		section, idx = sel
+		if section == 0:
+			w = self.hero.weapons[idx]
+			if self.hero.equipped_weapon is w:
+				self.push_panel("Cannot sell equipped weapon. Unequip it first.")
+				return
+			val = self.hero.sell_weapon(idx)
+			if val:
+				self.push_panel(f"Sold weapon for {val} gold.")
+				self.saver.mark_dirty(self.hero)
+			else:
+				self.push_panel("Nothing to sell.")
+		else:
+			a = self.hero.armors[idx]
+			if self.hero.equipped_armor is a:
+				self.push_panel("Cannot sell equipped armor. Unequip it first.")
+				return
+			val = self.hero.sell_armor(idx)
+			if val:
+				self.push_panel(f"Sold armor for {val} gold.")
+				self.saver.mark_dirty(self.hero)
+			else:
+				self.push_panel("Nothing to sell.")
+
+	def _handle_dead_mode(self, c: int) -> bool:
+		"""Handle dead mode input. Returns False if user wants to quit."""
+		if c == ord('r'):
+			self.restart()
+		elif c == ord('q'):
+			return False  # Quit
+		elif c in (KEY_PPAGE, ord('/')):
+			self._open_scrollback_key(c)
+		return True  # Continue
+
+	def _open_scrollback_key(self, c: int) -> None:
+		"""PgUp opens the history, '/' opens it straight into a search."""
+		self.open_scrollback()
+		if c == ord('/'):
+			self.search_input = ""
+		else:
+			self.scroll_to(self.scroll_top - self._scroll_page())
+
+	def _handle_scrollback_mode(self, c: int) -> None:
+		"""Handle scrollback input (and the search prompt while typing)."""
+		if self.search_input is not None:
+			if c in (ord('\n'), ord('\r')):
+				self.search_query, self.search_input = self.search_input, None
+				self.search_hit = None
+				self.search()
+			elif c == 27:  # ESC cancels the search
+				self.search_input = None
+			elif c in (KEY_BACKSPACE, 127, 8):
+				self.search_input = self.search_input[:-1]
+			elif 32 <= c < 127:
+				self.search_input += chr(c)
+			return
+		page = self._scroll_page()
+		if c == KEY_PPAGE:
+			self.scroll_to(self.scroll_top - page)
+		elif c in (KEY_NPAGE, ord(' ')):
+			self.scroll_to(self.scroll_top + page)
+		elif c in (KEY_UP, ord('k')):
+			self.scroll_to(self.scroll_top - 1)
+		elif c in (KEY_DOWN, ord('j')):
+			self.scroll_to(self.scroll_top + 1)
+		elif c in (KEY_HOME, ord('g')):
+			self.scroll_to(self.exploration_log.first)
+		elif c in (KEY_END, ord('G')):
+			self.scroll_to(self._max_scroll_top())
+		elif c == ord('/'):
+			self.search_input = ""
+		elif c == ord('n'):
+			self.search(backward=True)
+		elif c == ord('N'):
+			self.search(backward=False)
+		elif c in (ord('q'), 27):  # 'q' or ESC key
+			self.close_scrollback()
+
+	def _handle_inventory_mode(self, c: int) -> None:
+		"""Handle inventory mode input."""
+		self._inventory_sections()
+		if c in (KEY_DOWN, ord('j')):
+			self.inventory_view.move(1)
+		elif c in (KEY_UP, ord('k')):
+			self.inventory_view.move(-1)
+		elif c == KEY_NPAGE:
+			self.inventory_view.page(1)
+		elif c == KEY_PPAGE:
+			self.inventory_view.page(-1)
+		elif c == ord('u'):
+			self._use_item()
+		elif c == ord('e'):
+			self._equip_item()
+		elif c == ord('s'):
+			self.inventory_sort = (self.inventory_sort + 1) % len(INVENTORY_SORTS)
+			self.inventory_view.cursor = 0
+		elif c in (ord('i'), 27):  # 'i' or ESC key
+			self.close_inventory()
+
+	def _use_item(self) -> None:
+		"""Use selected item (only potions)."""
+		sel = self.inventory_view.selection()
+		if sel is not None and sel[0] == 0:
+			healed = self.hero.drink_potion(sel[1])
+			if healed is None:
+				self.push_panel("Invalid selection.")
+			else:
+				self.push_panel(f"You drink a potion and recover {healed} HP.")
+			self.saver.mark_dirty(self.hero)
+		else:
+			self.push_panel("Cannot use this item. Only potions can be used.")
+
+	def _equip_item(self) -> None:
+		"""Equip/unequip selected item (weapons and armors)."""
+		sel = self.inventory_view.selection()
+		if sel is None:
+			return
+		section = sel[0]
+		if section == 0:
+			self.push_panel("Cannot equip a potion. Use 'u' to drink.")
+		elif section == 1:
+			# weapon slot (the list may be sorted: look up its position in the hero's weapons)
+			w = self.inventory_view.selected_item()
+			if self.hero.equipped_weapon is w:
+				self.hero.unequip_weapon()
+				self.push_panel(f"You unequipped {w.name}.")
+			else:
+				self.hero.equip_weapon(self.hero.weapons.index(w))
+				self.push_panel(f"You equipped {w.name}.")
+			self.saver.mark_dirty(self.hero)
+		else:
+			# armor slot
+			a = self.inventory_view.selected_item()
+			if self.hero.equipped_armor is a:
+				self.hero.unequip_armor()
+				self.push_panel(f"You unequipped {a.name}.")
+			else:
+				self.hero.equip_armor(self.hero.armors.index(a))
+				self.push_panel(f"You equipped {a.name}.")
+			self.saver.mark_dirty(self.hero)
+
+	def _handle_explore_mode(self, c: int) -> None:
+		"""Handle explore mode input."""
+		if c in WALK_KEYS:
+			self._walk(*WALK_KEYS[c])
+		elif c == ord('w'):
+			msg, encounter = self.game.wander_encounter(self.hero)
+			self.push_exploration(msg)
+			if encounter:
+				self._start_encounter(encounter)
+		elif c == ord('f'):
+			self._auto_explore()
+		elif c == ord('h'):
+			self.push_exploration(f"Controls: arrows-walk, w-wander, f-auto-battle {self.auto_policy.repeat} fights, i-inventory, m-menu, h-help, PgUp-history, /-search")
+		elif c == ord('i'):
+			self.open_inventory()
+		elif c == ord('m'):
+			self.mode = 'main_menu'
+			self.menu_cursor = 0
+		elif c in (KEY_PPAGE, ord('/')):
+			self._open_scrollback_key(c)
+
+	def _walk(self, dx: int, dy: int) -> None:
+		"""One step on the dungeon map (walls stop the hero), which may run into monsters."""
+		x, y = self.position()
+		x, y = x + dx, y + dy
+		if not self.dungeon_map.is_floor(x, y):
+			return
+		self.hero_pos = (x, y)
+		# chunks the next steps will show are generated now, a few at a time, not when a frame needs them
+		lines, cols = self.screen_size()
+		self.dungeon_map.prefetch(x - cols // 2, y - lines // 2, cols, lines)
+		msg, encounter = self.game.step_encounter(self.hero)
+		if encounter:
+			self.push_exploration(msg)
+			self._start_encounter(encounter)
+
+	def _start_encounter(self, encounter: Encounter) -> None:
+		self.encounter = encounter
+		self.mode = 'combat'
+		if len(encounter) > 1:
+			self.animate_encounter(f"!! PACK OF {len(encounter)} !!")
+		else:
+			self.animate_encounter(f"!! {encounter.kinds[0].upper()} ENCOUNTER !!")
+
+	def _handle_combat_mode(self, c: int) -> None:
+		"""Handle combat mode input."""
+		if c == ord('a'):
+			self._attack_monster()
+		elif c == ord('f'):
+			self._auto_battle()
+		elif c == ord('r'):
+			self._attempt_flee()
+		elif c == ord('i'):
+			self.open_inventory()
+		elif c in (KEY_PPAGE, ord('/')):
+			self._open_scrollback_key(c)
+
+	def _attack_monster(self) -> None:
+		"""One combat round: monsters ahead of the hero in initiative, the hero's attack, the other monsters."""
+		encounter = self.encounter
+		r = encounter.play_round(self.hero, self.game.rng)
+		self._log_attacks(r.before)
+		if r.target >= 0:
+			if r.dealt > 0:
+				self.push_exploration(f"You hit {encounter.names[r.target]} for {r.dealt} damage.")
+			else:
+				self.push_exploration("You miss!")
+			if r.killed:
+				self._handle_monster_defeated(r.target)
+		# Monsters' turn
+		self._log_attacks(r.after)
+		if not self.hero.is_alive():
+			self._hero_slain()
+
+	def _handle_monster_defeated(self, i: int) -> None:
+		"""Handle the defeat of monster `i` of the encounter, its loot, and the end of the fight."""
+		encounter = self.encounter
+		self.push_exploration(f"{encounter.names[i]} has been defeated!")
+		monster = encounter.monster(i)
+
+		# Handle loot
+		p = self.game.handle_loot(monster)
+		if p:
+			self.hero.add_potion(p)
+			self.push_exploration(f"You found a {p.name}!")
+
+		# Award gold
+		gold = self.game.gold_reward(monster)
+		if gold > 0:
+			self.hero.add_gold(gold)
+			self.push_exploration(f"You gained {gold} gold.")
+
+		if encounter.is_over():
+			if len(encounter) > 1:
+				self.push_exploration(f"The pack of {len(encounter)} has been defeated!")
+			self.mode = 'explore'
+			self.encounter = None
+
+	def _log_attacks(self, attacks: AttackSummary) -> None:
+		"""Log the attacks of a group of monsters on the player, in one line."""
+		if attacks.attacks == 1:
+			if attacks.hits:
+				self.push_exploration(f"{attacks.attacker} hits you for {attacks.damage} damage.")
+			else:
+				self.push_exploration(f"{attacks.attacker} misses!")
+		elif attacks.hits:
+			self.push_exploration(f"{attacks.attacks} monsters attack: {attacks.hits} hit you for {attacks.damage} damage, {attacks.misses} miss.")
+		elif attacks.attacks:
+			self.push_exploration(f"{attacks.attacks} monsters attack: all miss!")
+
+	def _hero_slain(self) -> None:
+		# persist what was saved before the fatal fight without waiting for the disk
+		self.saver.flush(wait=False)
+		self.push_exploration("You have been slain! Game over.")
+		self.push_exploration("Press 'r' to restart or 'q' to quit.")
+		self.mode = 'dead'
+		self.encounter = None
+
+	def _auto_battle(self) -> None:
+		"""Resolve the rest of the fight without a message or a frame per swing."""
+		report = BattleReport(encounters=1)
+		auto_resolve(self.game, self.hero, self.encounter, self.auto_policy, report)
+		self._end_auto_battle(report, self.encounter if report.stopped in (LOW_HP, MAX_ROUNDS) else None)
+
+	def _auto_explore(self) -> None:
+		"""Wander and auto-battle `auto_policy.repeat` encounters in a row."""
+		report = BattleReport()
+		self._end_auto_battle(report, auto_explore(self.game, self.hero, self.auto_policy, report))
+
+	def _end_auto_battle(self, report: BattleReport, unfinished: Optional[Encounter]) -> None:
+		self.push_exploration(report.summary(self.hero))
+		self.saver.mark_dirty(self.hero)
+		if report.stopped == SLAIN:
+			self._hero_slain()
+		elif unfinished is not None:
+			# the policy handed the fight back
+			self.encounter = unfinished
+			self.mode = 'combat'
+		else:
+			self.encounter = None
+			self.mode = 'explore'
+
+	def _attempt_flee(self) -> None:
+		"""Attempt to flee from combat."""
+		if self.game.attempt_flee(self.hero, self.encounter):
+			self.push_exploration("You fled successfully.")
+			self.mode = 'explore'
+			self.encounter = None
+		else:
+			self.push_exploration("Flee failed!")
+			# every monster gets a free attack
+			self._log_attacks(self.encounter.attack_hero(self.hero, self.game.rng))
+			if not self.hero.is_alive():
+				self._hero_slain()
@@ -0,0 +1,183 @@
+"""Castle shop stock, loaded from a data file.
+
+`shop.json` lists the weapons and armors on sale (name, stats, base cost and
+optionally a per-visit `stock`) and a `price_variation`. `ShopLoader.get()`
+parses it once into an immutable `ShopCatalog` (item types interned in the
+catalog, display lines already formatted) and only reads the file again when
+its mtime changes (checked at most once per `check_interval` seconds), so it
+can be called on every frame and edited while the game runs.
+
+Each trip to the shop is a `ShopVisit` over the shared catalog: a price factor
+and the remaining stock for this visit. Only the lines whose price or stock
+differ from the catalog are formatted again, and only once.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from catalog import CATALOG, ArmorType, WeaponType
+from compat import add_slots
+
+SHOP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shop.json')
+
+# stock used when the data file is missing or unreadable
+DEFAULT_STOCK: Dict[str, Any] = {
+	"price_variation": 0.0,
+	"weapons": [
+		{"name": "Short Sword", "damage": 2, "cost": 10},
+		{"name": "Long Sword", "damage": 4, "cost": 20},
+		{"name": "Great Axe", "damage": 6, "cost": 35},
+	],
+	"armors": [
+		{"name": "Leather Armor", "value": 12, "cost": 12},
+		{"name": "Chain Mail", "value": 16, "cost": 28},
+		{"name": "Plate Armor", "value": 20, "cost": 50},
+	],
+}
+
+
+@add_slots
+@dataclass(frozen=True)
+class ShopOffer:
+	item_type: Union[WeaponType, ArmorType]
+	stock: Optional[int]  # per visit, None = unlimited
+	line: str  # display line at base price and full stock
+
+	@property
+	def name(self) -> str:
+		return self.item_type.name
+
+	@property
+	def cost(self) -> int:
+		return self.item_type.cost
+
+
+@add_slots
+@dataclass(frozen=True)
+class ShopCatalog:
+	weapons: Tuple[ShopOffer, ...]
+	armors: Tuple[ShopOffer, ...]
+	price_variation: float = 0.0
+
+	@property
+	def weapon_types(self) -> List[WeaponType]:
+		return [o.item_type for o in self.weapons]
+
+	@property
+	def armor_types(self) -> List[ArmorType]:
+		return [o.item_type for o in self.armors]
+
+	def visit(self, rng=None) -> 'ShopVisit':
+		"""Start a visit; prices vary by up to ±price_variation when a dice.Dice is given."""
+		factor = 1.0
+		if rng is not None and self.price_variation:
+			factor += self.price_variation * (2 * rng.random() - 1)
+		return ShopVisit(self, round(factor, 2))
+
+
+def format_offer(item_type: Union[WeaponType, ArmorType], price: int, stock: Optional[int]) -> str:
+	if isinstance(item_type, WeaponType):
+		text = f"{item_type.name} (DMG+{item_type.damage}) cost:{price}"
+	else:
+		text = f"{item_type.name} (ARM {item_type.value}) cost:{price}"
+	if stock is not None:
+		text += f" [{stock} left]" if stock else " [sold out]"
+	return text
+
+
+def build_catalog(data: Dict[str, Any]) -> ShopCatalog:
+	"""Validate the decoded data file and build the catalog (raises ValueError/KeyError/TypeError)."""
+	def offer(item_type, d) -> ShopOffer:
+		stock = d.get("stock")
+		stock = None if stock is None else int(stock)
+		return ShopOffer(item_type, stock, format_offer(item_type, item_type.cost, stock))
+
+	weapons = tuple(offer(CATALOG.weapon_type(str(d["name"]), int(d["damage"]), int(d["cost"])), d) for d in data.get("weapons", []))
+	armors = tuple(offer(CATALOG.armor_type(str(d["name"]), int(d["value"]), int(d["cost"])), d) for d in data.get("armors", []))
+	return ShopCatalog(weapons, armors, float(data.get("price_variation", 0.0)))
+
+
+class ShopLoader:
+	"""Cached shop catalog, re-read from `path` only when the file's mtime changes."""
+
+	def __init__(self, path: str = SHOP_FILE, check_interval: float = 1.0):
+		self.path = path
+		self.check_interval = check_interval
+		self._checked = 0.0  # time.monotonic() of the last stat
+		self._mtime: Optional[int] = None
+		self._catalog: Optional[ShopCatalog] = None
+		self.error: Optional[str] = None  # why the last reload failed, if it did
+
+	def get(self) -> ShopCatalog:
+		now = time.monotonic()
+		if self._catalog is not None and now - self._checked < self.check_interval:
+			return self._catalog
+		self._checked = now
+		try:
+			mtime = os.stat(self.path).st_mtime_ns
+		except OSError:
+			mtime = None
+		if self._catalog is not None and mtime == self._mtime:
+			return self._catalog
+		self._mtime = mtime
+		if mtime is None:
+			if self._catalog is None:
+				self._catalog = build_catalog(DEFAULT_STOCK)
+			return self._catalog
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				self._catalog = build_catalog(json.load(f))
+			self.error = None
+		except (OSError, ValueError, KeyError, TypeError) as e:
+			# keep selling the previous stock while the file is being edited
+			self.error = f"{self.path}: {e}"
+			if self._catalog is None:
+				self._catalog = build_catalog(DEFAULT_STOCK)
+		return self._catalog
+
+
+class ShopVisit:
+	"""Prices and stock for one trip to the shop, layered over an immutable catalog."""
+
+	def __init__(self, catalog: ShopCatalog, price_factor: float = 1.0):
+		self.catalog = catalog
+		self.price_factor = price_factor
+		self._sold: Dict[ShopOffer, int] = {}  # offers bought during this visit
+		self._lines: Dict[ShopOffer, str] = {}  # lines that differ from the catalog's
+
+	@property
+	def weapons(self) -> Tuple[ShopOffer, ...]:
+		return self.catalog.weapons
+
+	@property
+	def armors(self) -> Tuple[ShopOffer, ...]:
+		return self.catalog.armors
+
+	def price(self, offer: ShopOffer) -> int:
+		if self.price_factor == 1.0:
+			return offer.cost
+		return max(1, round(offer.cost * self.price_factor))
+
+	def stock(self, offer: ShopOffer) -> Optional[int]:
+		if offer.stock is None:
+			return None
+		return offer.stock - self._sold.get(offer, 0)
+
+	def line(self, offer: ShopOffer) -> str:
+		if self.price_factor == 1.0 and offer not in self._sold:
+			return offer.line
+		text = self._lines.get(offer)
+		if text is None:
+			text = self._lines[offer] = format_offer(offer.item_type, self.price(offer), self.stock(offer))
+		return text
+
+	def buy(self, offer: ShopOffer) -> bool:
+		"""Take one unit off this visit's stock; False when sold out."""
+		left = self.stock(offer)
+		if left is not None and left <= 0:
+			return False
+		self._sold[offer] = self._sold.get(offer, 0) + 1
+		self._lines.pop(offer, None)
+		return True
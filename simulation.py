@@ -0,0 +1,133 @@
+"""Headless Monte Carlo combat simulator.
+
+Runs many Player vs Monster duels at once on NumPy vectors (d20 rolls, HP
+arrays) instead of Python objects. The rules mirror a UI duel in which the
+hero has the initiative:
+
+- the hero acts first (`_attack_monster`), the monster answers (`_monster_attack`);
+- an attack hits when the d20 roll is >= the defender's `armor_class` and
+  removes `damage` HP, floored at 0 (`Entity.attack`);
+- a failed flee gives the monster a free attack (`Game.attempt_flee`).
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from entities import Entity
+from game import FLEE_CHANCE, FLEE_HP_BONUS
+
+# Duel outcomes
+ONGOING = 0
+WIN = 1
+LOSS = 2
+FLED = 3
+
+
+@dataclass
+class DuelStats:
+	"""Aggregated outcome of a batch of duels."""
+	duels: int
+	wins: int
+	losses: int
+	fled: int
+	unresolved: int
+	total_rounds: int
+	total_hp_lost: int
+
+	@property
+	def win_rate(self) -> float:
+		return self.wins / self.duels if self.duels else 0.0
+
+	@property
+	def loss_rate(self) -> float:
+		return self.losses / self.duels if self.duels else 0.0
+
+	@property
+	def flee_rate(self) -> float:
+		return self.fled / self.duels if self.duels else 0.0
+
+	@property
+	def mean_rounds(self) -> float:
+		return self.total_rounds / self.duels if self.duels else 0.0
+
+	@property
+	def mean_hp_lost(self) -> float:
+		return self.total_hp_lost / self.duels if self.duels else 0.0
+
+
+def simulate_duels(hero: Entity, monster: Entity, n: int = 100_000, flee_below: Optional[int] = None, max_rounds: int = 1000, seed: Optional[int] = None, rng: Optional[np.random.Generator] = None) -> DuelStats:
+	"""Simulate `n` independent duels between copies of `hero` and `monster`.
+
+	flee_below: if set, the hero tries to flee instead of attacking whenever
+	the hero's HP is <= this value.
+	max_rounds: duels still running after this many rounds are reported as
+	unresolved (e.g. both armor classes above 20).
+	"""
+	if rng is None:
+		rng = np.random.default_rng(seed)
+
+	hero_dmg, hero_ac = hero.damage, hero.armor_class
+	mon_dmg, mon_ac = monster.damage, monster.armor_class
+
+	hero_hp = np.full(n, hero.hp, dtype=np.int64)
+	mon_hp = np.full(n, monster.hp, dtype=np.int64)
+	rounds = np.zeros(n, dtype=np.int64)
+	outcome = np.full(n, ONGOING, dtype=np.int8)
+	active = np.arange(n)
+
+	for r in range(1, max_rounds + 1):
+		if active.size == 0:
+			break
+		size = active.size
+		h = hero_hp[active]
+		m = mon_hp[active]
+		rounds[active] = r
+
+		# Hero's turn: flee attempt or attack
+		if flee_below is not None:
+			fleeing = h <= flee_below
+			chance = np.where(h > m, FLEE_CHANCE + FLEE_HP_BONUS, FLEE_CHANCE)
+			escaped = fleeing & (rng.random(size) < chance)
+			attacking = ~fleeing
+		else:
+			escaped = np.zeros(size, dtype=bool)
+			attacking = np.ones(size, dtype=bool)
+		hits = attacking & (rng.integers(1, 21, size) >= mon_ac)
+		m = np.where(hits, np.maximum(0, m - hero_dmg), m)
+		killed = attacking & (m <= 0)
+
+		# Monster's turn (also the free attack after a failed flee)
+		answering = ~(killed | escaped)
+		hits = answering & (rng.integers(1, 21, size) >= hero_ac)
+		h = np.where(hits, np.maximum(0, h - mon_dmg), h)
+		slain = answering & (h <= 0)
+
+		hero_hp[active] = h
+		mon_hp[active] = m
+		result = outcome[active]
+		result[killed] = WIN
+		result[escaped] = FLED
+		result[slain] = LOSS
+		outcome[active] = result
+		active = active[result == ONGOING]
+
+	return DuelStats(
+		duels=n,
+		wins=int(np.count_nonzero(outcome == WIN)),
+		losses=int(np.count_nonzero(outcome == LOSS)),
+		fled=int(np.count_nonzero(outcome == FLED)),
+		unresolved=int(np.count_nonzero(outcome == ONGOING)),
+		total_rounds=int(rounds.sum()),
+		total_hp_lost=int((hero.hp - hero_hp).sum()),
+	)
+
+
+if __name__ == '__main__':
+	from entities import Monster, Player, Weapon, Armor
+
+	player = Player(name='Hero', hp=20, max_hp=30, equipped_weapon=Weapon.create(name='Long Sword', damage=4, cost=20), equipped_armor=Armor.create(name='Leather Armor', value=12, cost=12))
+	goblin = Monster(name='Goblin', hp=10, max_hp=10, _damage=3, armor=11)
+	for flee in (None, 5):
+		stats = simulate_duels(player, goblin, n=200_000, flee_below=flee, seed=1)
+		print(f"flee_below={flee}: win {stats.win_rate:.3f}  loss {stats.loss_rate:.3f}  fled {stats.flee_rate:.3f}  rounds {stats.mean_rounds:.2f}  hp lost {stats.mean_hp_lost:.2f}")
@@ -0,0 +1,154 @@
+"""Exact duel outcome solver.
+
+Models a fight as a Markov chain over (hero_hp, monster_hp) with the turn
+order of a UI duel the hero has the initiative in (the hero's attack, then
+the monster's: `Encounter.duel_foe`) and the hit rule of `Entity.attack`
+(d20 roll >= armor_class, HP floored at 0).
+
+Results are memoized on the (hp, damage, armor_class) tuples of both sides,
+so repeated queries (e.g. the combat HUD redrawing every frame) are cache hits.
+Pure stdlib, usable from the UI.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import heappop, heappush
+from typing import Dict, Tuple
+
+from entities import Entity
+
+# (hp, damage, armor_class)
+Stats = Tuple[int, int, int]
+
+# Probability mass below which the round distribution is truncated
+ROUND_TOLERANCE = 1e-12
+MAX_ROUNDS = 10_000
+
+
+@dataclass(frozen=True)
+class DuelOdds:
+	"""Full outcome distribution of a duel where the hero always attacks."""
+	win: float
+	loss: float
+	unresolved: float  # nobody can ever hit (both armor classes above 20)
+	expected_rounds: float
+	rounds: Tuple[Tuple[int, float], ...]  # (round, P(duel ends on that round))
+	hero_hp: Tuple[Tuple[int, float], ...]  # (remaining hero hp, probability), 0 = hero slain
+
+
+def hit_chance(armor_class: int) -> float:
+	"""Probability that a d20 roll is >= armor_class."""
+	return max(0, min(20, 21 - armor_class)) / 20
+
+
+def _transitions(h: int, m: int, hero: Stats, monster: Stats) -> Dict[Tuple[int, int], float]:
+	"""One round from state (h, m). Terminal states are (h, 0) for a win and (0, m) for a loss."""
+	p = hit_chance(monster[2])
+	q = hit_chance(hero[2])
+	out: Dict[Tuple[int, int], float] = {}
+	for m2, pm in ((max(0, m - hero[1]), p), (m, 1 - p)):
+		if pm == 0:
+			continue
+		if m2 == 0:
+			out[(h, 0)] = out.get((h, 0), 0.0) + pm
+			continue
+		for h2, ph in ((max(0, h - monster[1]), q), (h, 1 - q)):
+			if ph:
+				out[(h2, m2)] = out.get((h2, m2), 0.0) + pm * ph
+	return out
+
+
+@lru_cache(maxsize=4096)
+def duel_odds(hero: Stats, monster: Stats, with_rounds: bool = True) -> DuelOdds:
+	"""Solve the duel between hero and monster, both given as (hp, damage, armor_class).
+	with_rounds=False leaves `rounds` empty: most of the work, not needed for the odds alone.
+	"""
+	start = (hero[0], monster[0])
+	if hero[0] <= 0:
+		return DuelOdds(0.0, 1.0, 0.0, 0.0, (), ((0, 1.0),))
+	if monster[0] <= 0:
+		return DuelOdds(1.0, 0.0, 0.0, 1.0, ((1, 1.0),), ((hero[0], 1.0),))
+
+	# Absorption probabilities: every transition except the self-loop strictly
+	# decreases (h, m) in lexicographic order, so visiting states from the
+	# largest down accumulates each state's mass before it is spread further.
+	mass: Dict[Tuple[int, int], float] = {start: 1.0}
+	pending = [(-start[0], -start[1])]
+	hp_dist: Dict[int, float] = {}
+	unresolved = 0.0
+	expected_rounds = 0.0
+	while pending:
+		nh, nm = heappop(pending)
+		state = (-nh, -nm)
+		w = mass.pop(state)
+		trans = _transitions(state[0], state[1], hero, monster)
+		stay = trans.pop(state, 0.0)
+		if stay >= 1.0:
+			unresolved += w
+			continue
+		# geometric number of rounds spent in this state
+		expected_rounds += w / (1 - stay)
+		for (h2, m2), pr in trans.items():
+			pr = w * pr / (1 - stay)
+			if m2 == 0:
+				hp_dist[h2] = hp_dist.get(h2, 0.0) + pr
+			elif h2 == 0:
+				hp_dist[0] = hp_dist.get(0, 0.0) + pr
+			elif (h2, m2) in mass:
+				mass[(h2, m2)] += pr
+			else:
+				mass[(h2, m2)] = pr
+				heappush(pending, (-h2, -m2))
+
+	loss = hp_dist.get(0, 0.0)
+	win = sum((v for k, v in hp_dist.items() if k > 0), 0.0)
+	if unresolved:
+		expected_rounds = float('inf')
+
+	rounds = _round_distribution(start, hero, monster) if with_rounds else ()
+	return DuelOdds(win=win, loss=loss, unresolved=unresolved, expected_rounds=expected_rounds, rounds=rounds, hero_hp=tuple(sorted(hp_dist.items())))
+
+
+def _round_distribution(start: Tuple[int, int], hero: Stats, monster: Stats) -> Tuple[Tuple[int, float], ...]:
+	"""P(duel ends on round r), iterating the chain until the remaining mass is negligible."""
+	dist = []
+	live: Dict[Tuple[int, int], float] = {start: 1.0}
+	cache: Dict[Tuple[int, int], Dict[Tuple[int, int], float]] = {}
+	for r in range(1, MAX_ROUNDS + 1):
+		ended = 0.0
+		nxt: Dict[Tuple[int, int], float] = {}
+		for state, w in live.items():
+			trans = cache.get(state)
+			if trans is None:
+				trans = cache[state] = _transitions(state[0], state[1], hero, monster)
+			for s2, pr in trans.items():
+				if s2[0] == 0 or s2[1] == 0:
+					ended += w * pr
+				else:
+					nxt[s2] = nxt.get(s2, 0.0) + w * pr
+		if ended:
+			dist.append((r, ended))
+		live = nxt
+		if sum(live.values()) < ROUND_TOLERANCE:
+			break
+	return tuple(dist)
+
+
+def entity_stats(entity: Entity) -> Stats:
+	return (entity.hp, entity.damage, entity.armor_class)
+
+
+def odds_for(hero: Entity, monster: Entity) -> DuelOdds:
+	"""Convenience wrapper taking live entities (e.g. the current combat)."""
+	return duel_odds(entity_stats(hero), entity_stats(monster))
+
+
+if __name__ == '__main__':
+	import time
+
+	for hero_stats, monster_stats in (((20, 6, 12), (10, 3, 11)), ((20, 2, 10), (16, 6, 12)), ((30, 8, 20), (16, 6, 12))):
+		t0 = time.perf_counter()
+		o = duel_odds(hero_stats, monster_stats)
+		t1 = time.perf_counter()
+		duel_odds(hero_stats, monster_stats)
+		t2 = time.perf_counter()
+		print(f"hero {hero_stats} vs {monster_stats}: win {o.win:.4f}  loss {o.loss:.4f}  E[rounds] {o.expected_rounds:.3f}  solve {1e3 * (t1 - t0):.2f} ms  cached {1e6 * (t2 - t1):.1f} us")
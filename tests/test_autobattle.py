@@ -0,0 +1,134 @@
+import pytest
+
+from autobattle import LOW_HP, MAX_ROUNDS, SLAIN, WON, AutoPolicy, BattleReport, _pick_potion, auto_explore, auto_resolve, parse_policy
+from encounter import Encounter
+from entities import Armor, Monster, Player, Potion, Weapon
+from game import Game
+
+
+def test_parse_policy():
+	assert parse_policy('') == AutoPolicy()
+	policy = parse_policy(' stop=0.3, drink=0.5,potions=no ,repeat=20,rounds=50')
+	assert (policy.stop_below, policy.drink_below, policy.use_potions, policy.repeat, policy.max_rounds) == (0.3, 0.5, False, 20, 50)
+	assert parse_policy('stop=0,drink=1,repeat=1,rounds=1').repeat == 1
+
+
+@pytest.mark.parametrize('spec', [
+	'stop=2', 'stop=-0.1', 'drink=-1', 'drink=1.5', 'stop=nan',
+	'repeat=0', 'repeat=-1', 'rounds=0',
+	'repeat=x', 'potions=maybe', 'speed=3', 'stop',
+])
+def test_bad_policy(spec):
+	with pytest.raises(ValueError):
+		parse_policy(spec)
+
+
+# --- auto_resolve / auto_explore, on seeded games ---
+
+def hero(hp=30, max_hp=30, potions=(), weapon=None, armor=None):
+	h = Player(name='Hero', hp=hp, max_hp=max_hp, gold=0, equipped_weapon=weapon, equipped_armor=armor)
+	for p in potions:
+		h.add_potion(p)
+	return h
+
+
+SMALL = Potion('Small Healing Potion', 5)
+LARGE = Potion('Large Healing Potion', 12)
+HUGE = Potion('Huge Healing Potion', 25)
+
+
+def fight(game, h, *monsters, **policy):
+	report = BattleReport()
+	encounter = Encounter(list(monsters), game.rng)
+	return auto_resolve(game, h, encounter, AutoPolicy(**policy), report), encounter, report
+
+
+def test_pick_potion():
+	h = hero(hp=10, potions=[SMALL, LARGE, HUGE])
+	assert _pick_potion(h) == HUGE  # 20 missing: the only one healing it all
+	h.hp = 20
+	assert _pick_potion(h) == LARGE
+	h.hp = 27
+	assert _pick_potion(h) == SMALL
+	h = hero(hp=1, max_hp=60, potions=[SMALL, LARGE])
+	assert _pick_potion(h) == LARGE  # none is enough: the biggest
+	assert _pick_potion(hero()) is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_won(seed):
+	game = Game(seed=seed)
+	h = hero(weapon=Weapon.create('Great Axe', 6, 35))
+	goblins = [Monster(name='Goblin', hp=4, max_hp=4), Monster(name='Goblin', hp=4, max_hp=4)]
+	result, encounter, report = fight(game, h, *goblins)
+	assert result == WON == report.stopped and encounter.is_over()
+	assert (report.won, report.kills) == (1, 2)
+	assert report.rounds >= 1 and report.dealt >= 8
+	assert report.taken == 30 - h.hp
+	# every coin and potion looted is in the report
+	assert report.gold == h.gold and report.potions_found == h.inventory.total
+
+
+def test_slain():
+	h = hero(hp=3, max_hp=3)
+	result, encounter, report = fight(Game(seed=1), h, Monster(name='Ogre', hp=500, max_hp=500, _damage=20), stop_below=0)
+	assert result == SLAIN == report.stopped
+	assert not h.is_alive() and not encounter.is_over() and report.won == 0
+
+
+def test_max_rounds():
+	# nobody ever hits anybody
+	h = hero(armor=Armor.create('Wall', 1000, 0))
+	wall = Monster(name='Wall', hp=10, max_hp=10, armor=1000)
+	result, _, report = fight(Game(seed=1), h, wall, max_rounds=7)
+	assert result == MAX_ROUNDS == report.stopped
+	assert report.rounds == 7 and report.dealt == report.taken == 0 and h.hp == 30
+
+
+def test_low_hp_without_potions():
+	h = hero(hp=5, potions=[SMALL])
+	result, encounter, report = fight(Game(seed=1), h, Monster(name='Goblin', hp=4, max_hp=4), use_potions=False)
+	assert result == LOW_HP == report.stopped and report.rounds == 0
+	assert h.inventory.total == 1 and not encounter.is_over()
+	# with potions allowed it drinks until above drink_below, then fights
+	h = hero(hp=5, potions=[SMALL, SMALL, LARGE], weapon=Weapon.create('Great Axe', 6, 35))
+	result, _, report = fight(Game(seed=1), h, Monster(name='Goblin', hp=4, max_hp=4))
+	assert result == WON
+	# the large one (+12: 17 HP, above 15), the small ones kept
+	assert report.potions_drunk == 1 and report.potions_found == 0
+	assert h.hp == 17 and h.list_potions() == [SMALL] and h.inventory.total == 2
+
+
+def test_low_hp_once_potions_run_out():
+	"""Below drink_below it drinks what it has; still below stop_below afterwards, it hands over."""
+	h = hero(hp=2, potions=[SMALL])
+	result, encounter, report = fight(Game(seed=1), h, Monster(name='Goblin', hp=4, max_hp=4), drink_below=1, stop_below=0.5)
+	assert result == LOW_HP == report.stopped
+	assert report.potions_drunk == 1 and h.hp == 7 and h.inventory.total == 0
+	assert report.rounds == 0 and not encounter.is_over()
+
+
+def test_explore_repeat():
+	game = Game(seed=3)
+	h = hero(hp=500, max_hp=500, weapon=Weapon.create('Great Axe', 6, 35), armor=Armor.create('Plate Armor', 20, 50))
+	report = BattleReport()
+	assert auto_explore(game, h, AutoPolicy(repeat=4, stop_below=0), report) is None
+	assert report.encounters == report.won == 4 and report.stopped == WON
+	assert report.gold == h.gold and report.kills >= 4
+
+
+def test_explore_too_hurt_to_start():
+	h = hero(hp=3)
+	report = BattleReport()
+	assert auto_explore(Game(seed=1), h, AutoPolicy(use_potions=False), report) is None
+	assert report.encounters == 0 and report.stopped == LOW_HP
+
+
+def test_explore_returns_the_unfinished_fight():
+	game = Game(seed=2)
+	h = hero()
+	report = BattleReport()
+	encounter = auto_explore(game, h, AutoPolicy(stop_below=0.99, use_potions=False, repeat=50), report)
+	assert encounter is not None and not encounter.is_over()
+	assert h.is_alive() and report.stopped == LOW_HP
+	assert report.won == report.encounters - 1
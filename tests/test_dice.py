@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from dice import Dice
+
+
+def test_seeded_sequence():
+	assert [Dice(5).d20() for _ in range(3)] == [Dice(5).d20() for _ in range(3)]
+	a, b = Dice(9), Dice(9)
+	assert b.rolls(6, 1000) == [a.roll(6) for _ in range(1000)]
+
+
+def test_ranges():
+	dice = Dice(1)
+	assert {dice.d20() for _ in range(2000)} == set(range(1, 21))
+	assert {dice.randint(-2, 2) for _ in range(500)} == set(range(-2, 3))
+	assert {dice.roll(1000) for _ in range(5000)} <= set(range(1, 1001))
+	assert dice.randint(3, 3) == 3
+	assert all(0.0 <= dice.random() < 1.0 for _ in range(100))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_tiny_blocks(seed):
+	"""With one byte per block every byte of 240..255 is rejected for a d20: the block is drawn again."""
+	dice = Dice(seed=seed, block_size=1)
+	assert all(1 <= dice.d20() <= 20 for _ in range(200))
+	assert len(dice.rolls(100, 50)) == 50
+
+
+def test_bad_dice():
+	dice = Dice(1)
+	for faces in (0, -3):
+		with pytest.raises(ValueError):
+			dice.roll(faces)
+	with pytest.raises(ValueError):
+		dice.randint(5, 4)
+	with pytest.raises(ValueError):
+		random.Random(1).randint(5, 4)  # same contract
+	with pytest.raises(ValueError):
+		Dice(block_size=0)
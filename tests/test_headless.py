@@ -0,0 +1,93 @@
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+
+from entities import Monster
+from headless import VirtualScreen, make_headless_ui, replay
+
+
+@pytest.fixture
+def ui(tmp_path):
+	ui = make_headless_ui(VirtualScreen(), str(tmp_path))
+	yield ui
+	ui.saver.close()
+	ui.exploration_log.close()
+
+
+def test_replay(ui):
+	report = replay(ui, [10, ord('w'), (24, 80), ord('w')])  # ENTER: into the dungeon
+	assert report.keys == 4
+	assert ui.mode != 'main_menu'
+	assert ui.stdscr.window.getmaxyx() == (24, 80)
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGWINCH'), reason="no SIGWINCH")
+def test_resize_without_a_key(ui, monkeypatch):
+	"""A resize reaches curses as a queued KEY_RESIZE and a SIGWINCH, stdin staying quiet:
+	the frame at the new size must not wait for the next key."""
+	screen = ui.stdscr.window
+	screen.resize(8, 30)  # too small to play
+	read_fd, write_fd = os.pipe()
+	stdin = os.fdopen(read_fd)
+	monkeypatch.setattr(sys, 'stdin', stdin)
+	ui.frame_time = 0
+
+	async def drive():
+		task = asyncio.ensure_future(ui.run(watch_stdin=True))
+		await asyncio.sleep(0.05)
+		assert 'Terminal too small' in screen.text()
+		screen.feed([(30, 100)])  # what ncurses queues on a resize
+		os.kill(os.getpid(), signal.SIGWINCH)
+		await asyncio.sleep(0.05)
+		ui.stop()
+		await task
+
+	try:
+		asyncio.run(drive())
+	finally:
+		stdin.close()
+		os.close(write_fd)
+	assert screen.getmaxyx() == (30, 100) and not screen.keys
+	assert 'Terminal too small' not in screen.text()
+	assert 'Main Menu' in screen.text()
+
+
+def _odds_shown(ui, monster):
+	"""What the combat prompt shows for `monster`, once the background solve is over."""
+	async def drive():
+		task = asyncio.ensure_future(ui.run(watch_stdin=False))
+		await asyncio.sleep(0)
+		shown = [ui._win_odds(monster)]
+		for _ in range(200):
+			await asyncio.sleep(0.01)
+			if ui._win_odds(monster) != '...':
+				break
+		shown.append(ui._win_odds(monster))
+		ui.stop()
+		await task
+		return shown
+
+	return asyncio.run(drive())
+
+
+def test_win_odds(ui):
+	shown = _odds_shown(ui, Monster(name='Goblin', hp=7, max_hp=7))
+	assert shown[0] == '...' and shown[1].endswith('%')
+
+
+def test_win_odds_failure(ui, monkeypatch):
+	"""A solve that raises shows "?" instead of "..." forever, and is not started again on every frame."""
+	import solver
+	calls = []
+
+	def broken(hero, monster):
+		calls.append(monster)
+		raise RuntimeError("solver bug")
+
+	monkeypatch.setattr(solver, 'duel_odds', broken)
+	monster = Monster(name='Goblin', hp=7, max_hp=7)
+	assert _odds_shown(ui, monster) == ['...', '?']
+	assert ui._win_odds(monster) == '?' and len(calls) == 1
@@ -0,0 +1,157 @@
+"""Inventory containers and the Player methods built on them."""
+import random
+from operator import attrgetter
+
+import pytest
+
+from entities import Armor, Player, Potion, Weapon
+from inventory import OwnedItems, PotionStacks
+
+SMALL = Potion('Small Healing Potion', 5)
+LARGE = Potion('Large Healing Potion', 12)
+
+
+def weapons(*damages):
+	return [Weapon.create(f'W{d}', d, 10 * d) for d in damages]
+
+
+def owned(items=()):
+	return OwnedItems(items, {'damage': attrgetter('damage'), 'cost': attrgetter('cost')})
+
+
+def test_list_behaviour():
+	a, b, c, d = weapons(3, 1, 2, 5)
+	items = owned([a, b, c])
+	items.append(d)
+	assert len(items) == 4 and list(items) == [a, b, c, d]
+	assert items[0] is a and items[-1] is d and items[1:3] == [b, c]
+	assert items.pop(1) is b
+	assert list(items) == [a, c, d] and items.index(d) == 2
+	items.remove(a)
+	assert list(items) == [c, d] and items.index(c) == 0
+	assert items.pop() is d
+	assert list(items) == [c]
+	with pytest.raises(IndexError):
+		items[1]
+
+
+def test_identity_not_equality():
+	w = Weapon.create('Long Sword', 4, 20)
+	twin = Weapon(w.item_type, w.uid)  # equal, but another object
+	items = owned([w])
+	assert items.owns(w) and not items.owns(twin)
+	assert items.get(w.uid) is w
+	with pytest.raises(ValueError):
+		items.remove(twin)
+	with pytest.raises(ValueError):
+		items.index(Weapon.create('Long Sword', 4, 20))
+
+
+def test_duplicate_uid():
+	w = Weapon.create('Long Sword', 4, 20)
+	with pytest.raises(ValueError):
+		owned([w, Weapon(w.item_type, w.uid)])
+	items = owned([w])
+	with pytest.raises(ValueError):
+		items.append(Weapon(w.item_type, w.uid))
+
+
+def test_by_type():
+	a, b = weapons(2, 2)
+	c, = weapons(4)
+	items = owned([a, c, b])
+	assert items.by_type(a.item_type) == [a, b]
+	items.remove(a)
+	assert items.count_type(a.item_type) == 1 and items.by_type(c.item_type) == [c]
+
+
+def test_sorted_views():
+	items = owned(weapons(3, 1, 4, 1, 5))
+	assert [w.damage for w in items.sorted_by('damage')] == [1, 1, 3, 4, 5]
+	assert [w.damage for w in items.sorted_by('damage', reverse=True)] == [5, 4, 3, 1, 1]
+	assert items.best('damage').damage == 5
+	# ties by uid, reversed with the rest
+	ones = [w.uid for w in items if w.damage == 1]
+	assert [w.uid for w in items.sorted_by('damage') if w.damage == 1] == sorted(ones)
+	assert [w.uid for w in items.sorted_by('damage', reverse=True) if w.damage == 1] == sorted(ones, reverse=True)
+	# kept up to date once built
+	view = items.sorted_by('damage')
+	items.append(weapons(2)[0])
+	items.remove(items.best('damage'))
+	assert [w.damage for w in view] == [1, 1, 2, 3, 4]
+	assert view[0].damage == 1 and view[-1].damage == 4 and len(view) == 5
+	with pytest.raises(IndexError):
+		view[5]
+
+
+def test_matches_a_list():
+	"""Random appends and removals (with compactions) against a plain list."""
+	rng = random.Random(7)
+	model = weapons(*(rng.randint(1, 9) for _ in range(50)))
+	items = owned(model)
+	items.sorted_by('damage')
+	for step in range(2000):
+		op = rng.random()
+		if op < 0.4 or not model:
+			w = weapons(rng.randint(1, 9))[0]
+			model.append(w)
+			items.append(w)
+		elif op < 0.7:
+			i = rng.randrange(len(model))
+			assert items.pop(i) is model.pop(i)
+		else:
+			w = rng.choice(model)
+			model.remove(w)
+			items.remove(w)
+		if step % 97 == 0:
+			assert list(items) == model
+			assert all(items.index(w) == i for i, w in enumerate(model))
+			assert [w.uid for w in items.sorted_by('damage')] == [w.uid for w in sorted(model, key=lambda w: (w.damage, w.uid))]
+	assert list(items) == model and len(items) == len(model)
+
+
+def test_potion_stacks():
+	stacks = PotionStacks([SMALL, LARGE, SMALL])
+	assert [(s.potion, s.count) for s in stacks] == [(SMALL, 2), (LARGE, 1)]
+	assert stacks.total == 3 and list(stacks.expand()) == [SMALL, SMALL, LARGE]
+	assert stacks.potion_at(2) == LARGE and stacks.potion_at(3) is None
+
+
+def test_drink_potion():
+	hero = Player(name='Hero', hp=10, max_hp=30, inventory=[SMALL, SMALL, LARGE])
+	assert hero.drink_potion(0) == 5
+	assert hero.hp == 15 and [s.count for s in hero.inventory] == [1, 1]
+	assert hero.drink_potion(0) == 5
+	# the emptied stack is gone: the large potion moved to index 0
+	assert hero.list_potions() == [LARGE]
+	assert hero.drink_potion(1) is None and hero.drink_potion(-1) is None
+	hero.hp = 25
+	assert hero.drink_potion(0) == 5  # healed up to max HP only
+	assert hero.hp == 30 and hero.inventory.total == 0
+	assert hero.drink_potion(0) is None
+
+
+def test_drink_potion_kind():
+	hero = Player(name='Hero', hp=1, max_hp=30, inventory=[SMALL, LARGE])
+	assert hero.drink_potion_kind(Potion('Large Healing Potion', 12)) == 12
+	assert hero.hp == 13 and hero.list_potions() == [SMALL]
+	assert hero.drink_potion_kind(LARGE) is None
+	assert hero.drink_potion_kind(Potion('Small Healing Potion', 6)) is None  # same name, other kind
+	assert hero.hp == 13
+
+
+def test_equip_and_sell():
+	hero = Player(name='Hero', hp=10, max_hp=10, gold=0)
+	for w in weapons(2, 4):
+		hero.add_weapon(w)
+	hero.add_armor(Armor.create('Chain Mail', 16, 28))
+	assert not hero.equip_weapon(2)
+	assert hero.equip_weapon(1) and hero.damage == 6
+	assert hero.equip_armor(0) and hero.armor_class == 16
+	assert hero.sell_weapon(0) == 10  # half price, the equipped weapon stays
+	assert hero.equipped_weapon is hero.weapons[0]
+	assert hero.sell_weapon(0) == 20
+	assert hero.equipped_weapon is None and hero.damage == 2
+	assert hero.sell_armor(0) == 14
+	assert hero.equipped_armor is None and hero.armor_class == 10
+	assert hero.gold == 44 and hero.sell_weapon(0) is None
@@ -0,0 +1,40 @@
+import pytest
+
+from message_log import MessageLog
+
+
+@pytest.fixture(params=['memory', 'file'])
+def log(request, tmp_path):
+	log = MessageLog(4, path=str(tmp_path / 'session.log') if request.param == 'file' else None)
+	yield log
+	log.close()
+
+
+def test_ring_and_history(log):
+	for i in range(10):
+		log.append(f"message {i}")
+	assert len(log) == 10
+	assert log.tail(3) == ['message 7', 'message 8', 'message 9']
+	if log.path is None:
+		assert log.first == 6 and log.lines(0, 10) == [f"message {i}" for i in range(6, 10)]
+	else:
+		assert log.first == 0 and log.lines(2, 8) == [f"message {i}" for i in range(2, 8)]
+		assert log.find('MESSAGE 3', 9) == 3 and log.find('message 3', 4, backward=False) is None
+
+
+def test_clear_empties_the_panel(log):
+	"""A restart clears the panel; with a session file the old messages stay in the history only."""
+	for i in range(6):
+		log.append(f"old {i}")
+	log.clear()
+	assert log.tail(5) == []
+	log.append('new')
+	assert log.tail(5) == ['new']
+	if log.path is not None:
+		assert log.lines(0, 7) == [f"old {i}" for i in range(6)] + ['new']
+		assert log.find('old 5', 6) == 5
+
+
+def test_multiline_message(log):
+	log.append('two\nlines')
+	assert log.tail(1) == ['two lines']
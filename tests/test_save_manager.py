@@ -0,0 +1,54 @@
+import json
+import threading
+
+from entities import Player
+from save_manager import SaveManager, SaveWriter
+
+
+def _threads():
+	return {t.name for t in threading.enumerate()}
+
+
+def test_many_managers_one_thread(tmp_path):
+	writer = SaveWriter()
+	before = threading.active_count()
+	savers = [SaveManager(str(tmp_path / f'p{i}.json'), delay=0.01, writer=writer) for i in range(50)]
+	heroes = [Player(name=f'p{i}', hp=5, max_hp=5, gold=i) for i in range(50)]
+	for saver, hero in zip(savers, heroes):
+		saver.mark_dirty(hero)
+		hero.add_gold(100)
+		saver.mark_dirty(hero)
+	assert threading.active_count() == before + 1
+	for saver in savers:
+		saver.close()
+	for i, saver in enumerate(savers):
+		assert saver.last_error is None and saver.writes >= 1
+		assert json.load(open(saver.path, encoding='utf-8'))['gold'] == i + 100
+
+
+def test_flush_skips_the_delay(tmp_path):
+	saver = SaveManager(str(tmp_path / 'save.json'), delay=60)
+	hero = Player(name='Hero', hp=5, max_hp=5, gold=1)
+	saver.mark_dirty(hero)
+	assert saver.flush(timeout=5)
+	assert json.load(open(saver.path, encoding='utf-8'))['gold'] == 1
+	# a slow manager does not hold back the others
+	other = SaveManager(str(tmp_path / 'other.json'), delay=0)
+	saver.mark_dirty(hero)
+	other.mark_dirty(hero)
+	assert other.flush(timeout=5) and not saver.flush(wait=False)
+	saver.close()
+	other.close()
+	assert 'save-writer' in _threads()
+
+
+def test_write_error_is_kept(tmp_path):
+	saver = SaveManager(str(tmp_path / 'missing' / 'save.json'), delay=0)
+	saver.mark_dirty(Player(name='Hero', hp=5, max_hp=5))
+	saver.close()
+	assert isinstance(saver.last_error, OSError)
+	# the shared thread still serves the others
+	ok = SaveManager(str(tmp_path / 'ok.json'), delay=0)
+	ok.mark_dirty(Player(name='Hero', hp=5, max_hp=5))
+	ok.close()
+	assert ok.last_error is None and ok.writes == 1
@@ -1,90 +1,94 @@
 import curses
-import time
-import copy
-from typing import List
-from entities import Entity, Player
+import os
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from autobattle import AutoPolicy, parse_policy
+from binary_save import write_startup_snapshot
+from entities import STORE_SCHEME, Entity, Monster, Player
 from game import Game
+from message_log import MessageLog
+from profiler import STARTUP, Profiler
+from render import DiffScreen
+from save_journal import SaveJournal
+from save_manager import SaveManager
+from session import CASTLE_MENU, LOG_CAPACITY, MAIN_MENU, GameSession
+
+if TYPE_CHECKING:
+	# asyncio and the solver are imported when first used: the main menu needs neither
+	import asyncio
+	from solver import DuelOdds, Stats
 
 
 MIN_COLS = 40
 MIN_LINES = 10
-SAVE_FILE = 'save_player.json'
-
-
-class CursesUI:
-	def __init__(self, stdscr, hero: Player, game: Game):
-		self.stdscr = stdscr
-		self.hero = hero
-		# Keep a deep copy of the initial hero so we can restart
-		self.hero_template = copy.deepcopy(hero)
-		self.game = game
-
-		# Two separate message systems
-		self.exploration_log: List[str] = []  # Multi-line log for explore/combat modes
-		self.panel_message: str = ""  # Single-line message for menus/panels
-		self.panel_message_time: float = 0  # Time when panel message was set
-
-		self.mode = 'main_menu'  # start at main menu
-		self.current_monster = None
-		self.inventory_cursor = 0
-		self.menu_cursor = 0
-		self.shop_cursor = 0
-		self.sell_cursor = 0
-		self.castle_menu_cursor = 0  # cursor pour le menu du château
-		self.previous_mode = None  # mode précédent avant d'ouvrir l'inventaire
-
-	def push_exploration(self, msg: str) -> None:
-		"""Add message to exploration log (multi-line display)"""
-		self.exploration_log.append(msg)
-		# keep last 100 messages
-		if len(self.exploration_log) > 100:
-			self.exploration_log.pop(0)
-
-	def push_panel(self, msg: str) -> None:
-		"""Set panel message (single-line display, shown for 2 seconds)"""
-		self.panel_message = msg
-		self.panel_message_time = time.time()
-
-	def get_panel_message(self) -> str:
-		"""Get current panel message if still valid (within 2 seconds)"""
-		if self.panel_message and time.time() - self.panel_message_time < 2:
-			return self.panel_message
-		return ""
-
-	def restart(self) -> None:
-		"""Restore hero to initial state and return to exploration."""
-		self.hero = copy.deepcopy(self.hero_template)
-		self.current_monster = None
-		self.mode = 'explore'
-		self.exploration_log.clear()
-		self.push_exploration("You are revived. Press 'w' to continue wandering.")
-
-	def open_inventory(self) -> None:
-		self.previous_mode = self.mode  # Sauvegarder le mode actuel
-		self.inventory_cursor = 0
-		self.mode = 'inventory'
-		# Ne pas effacer les messages pour que les push soient visibles
-		# self.log.clear()  # REMOVED to keep messages visible
-		try:
-			self.stdscr.erase()
-			self.stdscr.refresh()
-		except Exception:
-			pass
-
-	def close_inventory(self) -> None:
-		# Ne pas effacer les messages pour qu'ils restent visibles
-		# self.log.clear()  # REMOVED to keep messages visible
-		# Retourner au mode précédent (ou explore par défaut)
-		self.mode = self.previous_mode if self.previous_mode else 'explore'
-		self.previous_mode = None  # Réinitialiser
+SAVE_FILE = os.environ.get('DND_SAVE', 'save_player.json')  # or a store row, sqlite:<database>#<player id>
+LOG_FILE = 'session.log'  # full exploration history of the current session
+FRAME_TIME = 1 / 60  # minimum delay between two frames (redraw requests are coalesced)
+POLL_INTERVAL = 0.01  # input polling period where stdin cannot be watched by the event loop
+FLASH_STEP = 0.15  # encounter animation: duration of each of its 4 steps
+PROFILE_FILE = 'profile_stats.json'  # hot-path timings, written on exit when the profiler ran
+PROFILER_KEY = ord('`')  # hidden key: show/hide the live timings
+PROFILER_REFRESH = 0.5  # seconds between two overlay updates
+ODDS_FAILED = object()  # win odds whose solve raised: shown as "?", not solved again
+
+
+def resize_terminal() -> None:
+	"""Give curses the terminal's new size after a SIGWINCH: the event loop's handler replaces
+	ncurses' own, so nothing else would. resizeterm() queues a KEY_RESIZE when the size changed."""
+	try:
+		cols, lines = os.get_terminal_size(sys.__stdout__.fileno())
+	except (AttributeError, OSError, ValueError):
+		return
+	if curses.is_term_resized(lines, cols):
+		curses.resizeterm(lines, cols)
+
+
+class CursesUI(GameSession):
+	"""Curses front-end of a GameSession: draws it and runs its event loop."""
+
+	def __init__(self, stdscr, hero: Player, game: Game, saver: SaveManager, log: Optional[MessageLog] = None,
+			doupdate: Optional[Callable[[], None]] = None, curs_set: Optional[Callable[[int], None]] = None,
+			profiler: Optional[Profiler] = None, resize_term: Optional[Callable[[], None]] = None):
+		"""`doupdate`/`curs_set`/`resize_term` default to the curses functions; pass no-ops to run without a terminal (see headless.py)."""
+		super().__init__(hero, game, saver, log)
+		# Frames are drawn off-screen and only the changed cells reach the terminal
+		self.stdscr = DiffScreen(stdscr, doupdate=doupdate)
+		self._curs_set = curs_set if curs_set is not None else curses.curs_set
+		self._resize_term = resize_term if resize_term is not None else resize_terminal
+
+		# event loop state (see run()): redraw requests, timers, background jobs
+		self._loop: Optional['asyncio.AbstractEventLoop'] = None
+		self._redraw: Optional['asyncio.Event'] = None
+		self._stop: Optional['asyncio.Event'] = None
+		self.frame_time = FRAME_TIME
+		self.poll_interval = POLL_INTERVAL
+		self.flash: Optional[Tuple[str, int]] = None  # encounter banner being animated (text, attr)
+		self._odds: Dict[Tuple['Stats', 'Stats'], Any] = {}  # DuelOdds, None while being solved, or ODDS_FAILED
+		# hot-path timings; nothing is timed until instrumented (hidden key or DND_PROFILE=1)
+		self.profiler = profiler if profiler is not None else Profiler()
+		self._profiler_rows: List[str] = []  # overlay text, refreshed every PROFILER_REFRESH
+
+	def screen_size(self) -> Tuple[int, int]:
+		return self.stdscr.getmaxyx()
+
+	def draw_scrollback(self, lines: int, cols: int) -> None:
 		try:
-			self.stdscr.erase()
-			self.stdscr.refresh()
-		except Exception:
+			window = self.history_window()
+			last = self.scroll_top + len(window)
+			self.stdscr.addstr(0, 0, f"History — {self.scroll_top + 1}-{last} of {len(self.exploration_log)}"[:cols-1], curses.A_REVERSE)
+			for idx, msg in enumerate(window):
+				attr = curses.A_REVERSE if self.scroll_top + idx == self.search_hit else 0
+				self.stdscr.addstr(1 + idx, 0, msg[:cols-1], attr)
+			if self.search_input is not None:
+				prompt = "/" + self.search_input
+			else:
+				prompt = self.get_panel_message() or "[PgUp/PgDn] Scroll  [/] Search  [n/N] Next/Prev  [Esc] Back"
+			self.stdscr.addstr(lines-2, 0, prompt[:cols-1], curses.A_BOLD)
+		except curses.error:
+			# Window resized during drawing - will retry on next frame
 			pass
 
 	def draw_inventory(self, lines: int, cols: int) -> None:
-		self.check_bounds()
 		try:
 			# Draw inventory centered
 			title = "Inventory"
@@ -93,43 +97,13 @@ class CursesUI:
 			# Gold display
 			self.stdscr.addstr(2, 0, f"Gold: {self.hero.gold}")
 
-			# Potions
-			pots = self.hero.list_potions()
-			self.stdscr.addstr(4, 0, "Potions:")
-			start_idx = 0
-			if not pots:
-				self.stdscr.addstr(5, 2, "(none)")
-				start_idx = 0
-			else:
-				for idx, p in enumerate(pots):
-					marker = '>' if self.inventory_cursor == idx else ' '
-					self.stdscr.addstr(5 + idx, 2, f"{marker} {p.name} (+{p.heal} HP)")
-				start_idx = len(pots)
-
-			# Weapons
-			wep_start = 7 + max(0, len(pots))
-			self.stdscr.addstr(wep_start, 0, "Weapons:")
-			for i, w in enumerate(self.hero.weapons):
-				idx = start_idx + i
-				marker = '>' if self.inventory_cursor == idx else ' '
-				equip_mark = '(E)' if self.hero.equipped_weapon is w else '   '
-				self.stdscr.addstr(wep_start + 1 + i, 2, f"{marker} {w.name} {equip_mark} (DMG+{w.damage}) {id(w)}")
-			wep_count = len(self.hero.weapons)
-
-			# Armors
-			arm_start = wep_start + 2 + max(0, wep_count)
-			self.stdscr.addstr(arm_start, 0, "Armors:")
-			for j, a in enumerate(self.hero.armors):
-				idx = start_idx + wep_count + j
-				marker = '>' if self.inventory_cursor == idx else ' '
-				equip_mark = '(E)' if self.hero.equipped_armor is a else '   '
-				self.stdscr.addstr(arm_start + 1 + j, 2, f"{marker} {a.name} {equip_mark} (ARM {a.value})")
-			arm_count = len(self.hero.armors)
+			# Potions, weapons, armors: only the rows that fit above the footer are drawn
+			self._inventory_sections()
+			self.inventory_view.draw(self.stdscr, 4, 0, lines - 8, min(cols, 80))
 
 			# Footer with separator line
 			separator_line = lines - 4
-			if separator_line > arm_start + arm_count + 2:
-				self.stdscr.addstr(separator_line, 0, "─" * min(cols - 1, 60))
+			self.stdscr.addstr(separator_line, 0, "─" * min(cols - 1, 60))
 
 			# Special line for pushed messages (always visible)
 			message_line = lines - 3
@@ -142,31 +116,16 @@ class CursesUI:
 				self.stdscr.addstr(message_line, 0, "")
 
 			# Instructions line
-			self.stdscr.addstr(lines-2, 0, "[u] Use item  [e] Equip/Unequip  [Esc] Return to previous panel", curses.A_REVERSE)
+			self.stdscr.addstr(lines-2, 0, "[u] Use item  [e] Equip/Unequip  [s] Sort  [Esc] Return to previous panel", curses.A_REVERSE)
 
 		except curses.error:
 			# Window resized during drawing - will retry on next frame
 			pass
 
-	def try_drink_selected(self) -> None:
-		"""Legacy method - kept for backward compatibility but unused"""
-		pots = self.hero.list_potions()
-		if not pots:
-			self.push_panel("You have no potions.")
-			return
-		idx = self.inventory_cursor
-		healed = self.hero.drink_potion(idx)
-		if healed is None:
-			self.push_panel("Invalid selection.")
-		else:
-			self.push_panel(f"You drink {pots[idx].name} and recover {healed} HP.")
-
 	def draw_main_menu(self, lines: int, cols: int) -> None:
-		self.check_bounds()
 		try:
-			options = ['Go to Dungeon', 'Go to Castle', 'Quit']
 			self.stdscr.addstr(2, 0, "Main Menu", curses.A_UNDERLINE)
-			for idx, opt in enumerate(options):
+			for idx, opt in enumerate(MAIN_MENU):
 				marker = '>' if idx == self.menu_cursor else ' '
 				self.stdscr.addstr(4 + idx, 0, f"{marker} {opt}")
 			# Special line for pushed messages
@@ -177,14 +136,12 @@ class CursesUI:
 			pass
 
 	def draw_castle_menu(self, lines: int, cols: int) -> None:
-		self.check_bounds()
 		try:
 			self.stdscr.addstr(1, 0, "Castle", curses.A_UNDERLINE)
 			self.stdscr.addstr(3, 0, f"Gold: {self.hero.gold}")
 
-			options = ['Buy Items', 'Sell Items', 'Inventory', 'Return to Main Menu']
 			self.stdscr.addstr(5, 0, "What would you like to do?")
-			for idx, opt in enumerate(options):
+			for idx, opt in enumerate(CASTLE_MENU):
 				marker = '>' if idx == self.castle_menu_cursor else ' '
 				self.stdscr.addstr(7 + idx, 0, f"{marker} {opt}")
 
@@ -196,21 +153,11 @@ class CursesUI:
 			pass
 
 	def draw_buy_menu(self, lines: int, cols: int) -> None:
-		self.check_bounds()
 		try:
 			self.stdscr.addstr(1, 0, "Castle - Shop (Buy)", curses.A_UNDERLINE)
 			self.stdscr.addstr(3, 0, f"Gold: {self.hero.gold}")
-			weps = self.game.get_shop_weapons()
-			arms = self.game.get_shop_armors()
-			self.stdscr.addstr(5, 0, "Weapons:")
-			for i, w in enumerate(weps):
-				marker = '>' if self.shop_cursor == i else ' '
-				self.stdscr.addstr(6 + i, 0, f"{marker} {w.name} (DMG+{w.damage}) cost:{w.cost}")
-			base = 10 + len(weps)
-			self.stdscr.addstr(base, 0, "Armors:")
-			for j, a in enumerate(arms):
-				marker = '>' if self.shop_cursor == (len(weps) + j) else ' '
-				self.stdscr.addstr(base + 1 + j, 0, f"{marker} {a.name} (ARM {a.value}) cost:{a.cost}")
+			self._shop_sections()
+			self.shop_view.draw(self.stdscr, 5, 0, lines - 10, min(cols, 80))
 			# Special line for pushed messages
 			self.stdscr.addstr(lines-4, 0, self.get_panel_message())
 			# shop actions
@@ -220,22 +167,11 @@ class CursesUI:
 			pass
 
 	def draw_sell_menu(self, lines: int, cols: int) -> None:
-		self.check_bounds()
 		try:
 			self.stdscr.addstr(1, 0, "Castle - Sell Items", curses.A_UNDERLINE)
 			self.stdscr.addstr(3, 0, f"Gold: {self.hero.gold}")
-			self.stdscr.addstr(5, 0, "Weapons:")
-			for i, w in enumerate(self.hero.weapons):
-				marker = '>' if self.sell_cursor == i else ' '
-				equip_mark = '(E)' if self.hero.equipped_weapon is w else '   '
-				self.stdscr.addstr(6 + i, 0, f"{marker} {w.name} {equip_mark} (DMG+{w.damage}) sell:{w.cost//2}")
-			base = 10 + len(self.hero.weapons) + 2
-			self.stdscr.addstr(base, 0, "Armors:")
-			# weapons then armors: mark selected by sell_cursor (combined index)
-			for j, a in enumerate(self.hero.armors):
-				marker = '>' if self.sell_cursor == (len(self.hero.weapons) + j) else ' '
-				equip_mark = '(E)' if self.hero.equipped_armor is a else '   '
-				self.stdscr.addstr(base + 1 + j, 0, f"{marker} {a.name} {equip_mark} (ARM {a.value}) sell:{a.cost // 2}")
+			self._sell_sections()
+			self.sell_view.draw(self.stdscr, 5, 0, lines - 9, min(cols, 80))
 
 			# Special line for pushed messages
 			self.stdscr.addstr(lines-3, 0, self.get_panel_message())
@@ -247,423 +183,297 @@ class CursesUI:
 	def draw(self) -> None:
 		self.stdscr.erase()
 		lines, cols = self.stdscr.getmaxyx()
-		self.check_bounds()
-		# If main menu
-		if self.mode == 'main_menu':
-			self.draw_main_menu(lines, cols)
-			self.stdscr.refresh()
-			return
-		# If in castle menu
-		if self.mode == 'castle_menu':
-			self.draw_castle_menu(lines, cols)
-			self.stdscr.refresh()
-			return
-		# If in castle shop
-		if self.mode == 'castle_shop':
-			self.draw_buy_menu(lines, cols)
-			self.stdscr.refresh()
-			return
-		# If selling
-		if self.mode == 'sell':
-			self.draw_sell_menu(lines, cols)
-			self.stdscr.refresh()
-			return
-		# If in inventory mode, draw it and return early (BEFORE exploration log)
-		if self.mode == 'inventory':
-			self.draw_inventory(lines, cols)
-			self.stdscr.refresh()
-			return
+		if self.check_bounds():
+			if self.mode == 'main_menu':
+				self.draw_main_menu(lines, cols)
+			elif self.mode == 'castle_menu':
+				self.draw_castle_menu(lines, cols)
+			elif self.mode == 'castle_shop':
+				self.draw_buy_menu(lines, cols)
+			elif self.mode == 'sell':
+				self.draw_sell_menu(lines, cols)
+			elif self.mode == 'inventory':
+				# inventory replaces the exploration log entirely
+				self.draw_inventory(lines, cols)
+			elif self.mode == 'scrollback':
+				self.draw_scrollback(lines, cols)
+			else:
+				self.draw_dungeon(lines, cols)
+			if self.profiler.overlay:
+				self.draw_profiler_overlay(lines, cols)
+		self.stdscr.refresh()
 
+	def draw_dungeon(self, lines: int, cols: int) -> None:
+		"""Explore, combat and dead modes: status bar, dungeon map, exploration log and prompt."""
 		try:
 			# Status bar (top) - show effective stats
-			status = f"{self.hero.name} — HP: {self.hero.hp}/{self.hero.max_hp}  DMG: {self.hero.damage}  ARM: {self.hero.armor_class}  Gold: {self.hero.gold}"
-			self.stdscr.addstr(0, 0, status, curses.A_REVERSE)
+			self.stdscr.addstr(0, 0, self.status_line(), curses.A_REVERSE)
 
-			# Exploration log window (multi-line for explore/combat modes ONLY)
-			log_h = lines - 6
-			start = max(0, len(self.exploration_log) - log_h)
-			for idx, msg in enumerate(self.exploration_log[start:]):
-				self.stdscr.addstr(1 + idx, 0, msg[:cols-1])
+			# Dungeon map around the hero, then the exploration log (explore/combat modes ONLY)
+			map_h = (lines - 6) // 2
+			for idx, row in enumerate(self.map_view(cols - 1, map_h)):
+				self.stdscr.addstr(1 + idx, 0, row)
+			log_h = lines - 6 - map_h
+			for idx, msg in enumerate(self.exploration_log.tail(log_h)):
+				self.stdscr.addstr(1 + map_h + idx, 0, msg[:cols-1])
 
 			# Prompt
-			if self.mode == 'dead':
-				prompt = "[r] Restart  [q] Quit"
-			elif self.mode == 'explore':
-				prompt = "[w] Wander  [i] Inventory  [m] Menu  [h] Help"
-			else:
-				prompt = "[a] Attack  [r] Flee  [i] Inventory"
-			self.stdscr.addstr(lines-2, 0, prompt, curses.A_BOLD)
+			prompt = self.dungeon_prompt()
+			if self.mode == 'combat' and self.encounter:
+				foe = self.encounter.duel_foe()
+				if foe is not None:
+					# the solver models a duel in which the hero strikes first
+					prompt += f"    Win odds: {self._win_odds(foe)}"
+			self.stdscr.addstr(lines-2, 0, prompt[:cols-1], curses.A_BOLD)
+			if self.flash is not None:
+				self.stdscr.addstr(0, 0, self.flash[0].center(40)[:cols-1], self.flash[1])
 		except curses.error:
 			# Window resized during drawing - will retry on next frame
 			pass
-		self.stdscr.refresh()
+
+	def draw_profiler_overlay(self, lines: int, cols: int) -> None:
+		"""Live hot-path timings, boxed in the top-right corner."""
+		rows = self._profiler_rows[:max(0, lines - 2)]
+		width = min(max(len(r) for r in rows) + 2, cols - 1)
+		x = cols - 1 - width
+		try:
+			for y, text in enumerate(rows):
+				self.stdscr.addstr(1 + y, x, f" {text}".ljust(width)[:width], curses.A_REVERSE if y == 0 else 0)
+		except curses.error:
+			pass
+
+	def _win_odds(self, monster: Monster) -> str:
+		"""Exact win odds of a duel with `monster`, solved off the UI thread the first time."""
+		from solver import duel_odds, entity_stats
+		key = (entity_stats(self.hero), entity_stats(monster))
+		if key not in self._odds:
+			if self._loop is None:
+				try:
+					self._odds[key] = duel_odds(*key)
+				except Exception:
+					self._odds[key] = ODDS_FAILED
+			else:
+				self._odds[key] = None  # pending
+				self.run_in_background(duel_odds, *key, on_done=lambda odds: self._odds.__setitem__(key, odds),
+					on_error=lambda e: self._odds.__setitem__(key, ODDS_FAILED))
+		odds = self._odds[key]
+		if odds is None:
+			return "..."
+		return "?" if odds is ODDS_FAILED else f"{odds.win:.0%}"
 
 	def animate_encounter(self, text: str) -> None:
-		# simple flash animation
+		"""Flash a banner over the status bar for a moment; keys keep being handled meanwhile."""
+		if self._loop is None:
+			return
 		for i in range(4):
 			attr = curses.A_BLINK if i % 2 == 0 else curses.A_BOLD
-			self.stdscr.addstr(0, 0, text.center(40), attr)
-			self.stdscr.refresh()
-			time.sleep(0.15)
+			self.call_later(i * FLASH_STEP, self._set_flash, (text, attr))
+		self.call_later(4 * FLASH_STEP, self._set_flash, None)
 
-	def check_bounds(self):
+	def _set_flash(self, flash: Optional[Tuple[str, int]]) -> None:
+		self.flash = flash
+		self.request_redraw()
+
+	def check_bounds(self) -> bool:
+		"""False (after drawing a notice) while the terminal is too small to play."""
 		lines, cols = self.stdscr.getmaxyx()
-		while cols < MIN_COLS or lines < MIN_LINES:
-			try:
-				self.stdscr.erase()
-				self.stdscr.addstr(0, 0, "Terminal too small. Resize to continue.")
-				self.stdscr.refresh()
-			except curses.error:
-				# Window too small even for error message
+		if cols >= MIN_COLS and lines >= MIN_LINES:
+			return True
+		try:
+			self.stdscr.addstr(0, 0, "Terminal too small. Resize to continue.")
+		except curses.error:
+			# Window too small even for error message
+			pass
+		return False
+
+	# --- event loop ---
+
+	def request_redraw(self) -> None:
+		"""Ask for a frame; requests made before the next frame is drawn give a single draw."""
+		if self._redraw is not None:
+			self._redraw.set()
+
+	def call_later(self, delay: float, callback: Callable, *args) -> None:
+		"""Timer on the UI loop (ignored when the UI is driven without a loop, e.g. benchmarks)."""
+		if self._loop is not None:
+			self._loop.call_later(delay, callback, *args)
+
+	def run_in_background(self, fn: Callable, *args, on_done: Optional[Callable] = None,
+			on_error: Optional[Callable[[BaseException], None]] = None) -> None:
+		"""Run `fn(*args)` in a worker thread; `on_done(result)`, or `on_error(exception)` if it raised,
+		then runs on the UI loop, followed by a frame. Without `on_error` the exception goes to the loop's handler."""
+		future = self._loop.run_in_executor(None, fn, *args)
+
+		def _done(f: 'asyncio.Future') -> None:
+			if f.cancelled():
 				pass
-			time.sleep(0.5)  # wait before checking again
-			lines, cols = self.stdscr.getmaxyx()
+			elif f.exception() is not None:
+				if on_error is not None:
+					on_error(f.exception())
+				else:
+					self._loop.call_exception_handler({'message': f"background job {fn!r} failed", 'exception': f.exception(), 'future': f})
+			elif on_done is not None:
+				on_done(f.result())
+			self.request_redraw()
+
+		future.add_done_callback(_done)
 
 	def mainloop(self) -> None:
 		"""Main game loop following Single Responsibility Principle"""
-		self.stdscr.nodelay(False)
-		curses.curs_set(0)
-		self.push_exploration("Welcome to the dungeon. Press 'w' to wander.")
-
+		# the main menu is on screen before the event loop machinery is even imported
+		self._curs_set(0)
+		self.draw()
+		STARTUP.mark('first_frame')
+		import asyncio
+		asyncio.run(self.run())
+
+	async def run(self, watch_stdin: bool = True) -> None:
+		"""Event-driven UI: keys are read when stdin is readable, frames are drawn on request.
+
+		With `watch_stdin=False` the window's getch() is polled instead (every
+		`poll_interval` seconds), which is how headless.py feeds recorded keys.
+
+		A resize queues KEY_RESIZE without making stdin readable: SIGWINCH is
+		watched too, so the new size is drawn without waiting for a key.
+		"""
+		import asyncio
+		import signal
+		self._loop = asyncio.get_running_loop()
+		self._redraw = asyncio.Event()
+		self._stop = asyncio.Event()
+		self.stdscr.nodelay(True)
+		self._curs_set(0)
+		self.push_exploration("Welcome to the dungeon. Walk with the arrow keys or press 'w' to wander.")
+
+		fd = poller = winch = None
+		if watch_stdin:
+			try:
+				fd = sys.stdin.fileno()
+				self._loop.add_reader(fd, self._on_input)
+			except (AttributeError, NotImplementedError, OSError, ValueError):
+				# no selectable stdin (e.g. Windows console): poll getch() instead
+				fd = None
+			winch = getattr(signal, 'SIGWINCH', None)
+			if winch is not None:
+				try:
+					self._loop.add_signal_handler(winch, self._on_resize)
+				except (NotImplementedError, RuntimeError):
+					winch = None  # not the main thread: the next key picks up the new size
+		if fd is None:
+			poller = asyncio.ensure_future(self._poll_input())
+		frames = asyncio.ensure_future(self._frames())
+		self.request_redraw()
+		try:
+			await self._stop.wait()
+		finally:
+			if fd is not None:
+				self._loop.remove_reader(fd)
+			if winch is not None:
+				self._loop.remove_signal_handler(winch)
+			for task in (poller, frames):
+				if task is not None:
+					task.cancel()
+			self._loop = self._redraw = self._stop = None
+
+	async def _frames(self) -> None:
+		import asyncio
 		while True:
-			self.check_bounds()
+			await self._redraw.wait()
+			self._redraw.clear()
 			self.draw()
-			c = self.stdscr.getch()
-
-			# Dispatch to appropriate handler based on mode (Open/Closed Principle)
-			if self.mode == 'main_menu':
-				if not self._handle_main_menu(c):
-					break  # User chose to quit
-			elif self.mode == 'castle_menu':
-				self._handle_castle_menu(c)
-			elif self.mode == 'castle_shop':
-				self._handle_castle_shop(c)
-			elif self.mode == 'sell':
-				self._handle_sell_mode(c)
-			elif self.mode == 'dead':
-				if not self._handle_dead_mode(c):
-					break  # User chose to quit
-			elif self.mode == 'inventory':
-				self._handle_inventory_mode(c)
-			elif self.mode == 'explore':
-				self._handle_explore_mode(c)
-			elif self.mode == 'combat':
-				self._handle_combat_mode(c)
-
-	def _handle_main_menu(self, c: int) -> bool:
-		"""Handle main menu input. Returns False if user wants to quit."""
-		if c in (curses.KEY_DOWN, ord('j')):
-			self.menu_cursor = min(self.menu_cursor + 1, 2)
-		elif c in (curses.KEY_UP, ord('k')):
-			self.menu_cursor = max(0, self.menu_cursor - 1)
-		elif c in (ord('\n'), ord('\r')):
-			if self.menu_cursor == 0:
-				# go to dungeon
-				self.mode = 'explore'
-				self.push_exploration('You head into the dungeon...')
-			elif self.menu_cursor == 1:
-				# Save player backup when entering the Castle
-				try:
-					self.hero.save_to_file(SAVE_FILE)
-				except Exception:
-					pass
-				self.mode = 'castle_menu'
-				self.castle_menu_cursor = 0
-			else:
-				return False  # Quit
-		elif c == ord('q'):
-			return False  # Quit
-		return True  # Continue
-
-	def _handle_castle_menu(self, c: int) -> None:
-		"""Handle castle menu input."""
-		if c in (curses.KEY_DOWN, ord('j')):
-			self.castle_menu_cursor = min(self.castle_menu_cursor + 1, 3)
-		elif c in (curses.KEY_UP, ord('k')):
-			self.castle_menu_cursor = max(0, self.castle_menu_cursor - 1)
-		elif c in (ord('\n'), ord('\r')):
-			if self.castle_menu_cursor == 0:
-				# Go to Buy
-				self.mode = 'castle_shop'
-				self.shop_cursor = 0
-			elif self.castle_menu_cursor == 1:
-				# Go to Sell
-				self.mode = 'sell'
-				self.sell_cursor = 0
-			elif self.castle_menu_cursor == 2:
-				# Go to Inventory
-				self.open_inventory()
-			else:
-				# Return to Main Menu
-				self.mode = 'main_menu'
-				self.menu_cursor = 0
-		elif c == 27:  # Esc - return to main menu
-			self.mode = 'main_menu'
-			self.menu_cursor = 0
-
-	def _handle_castle_shop(self, c: int) -> None:
-		"""Handle castle shop input."""
-		weps = self.game.get_shop_weapons()
-		arms = self.game.get_shop_armors()
-		total_items = len(weps) + len(arms)
-
-		if c in (curses.KEY_DOWN, ord('j')):
-			self.shop_cursor = (self.shop_cursor + 1) % max(1, total_items)
-		elif c in (curses.KEY_UP, ord('k')):
-			self.shop_cursor = (self.shop_cursor - 1) % max(1, total_items)
-		elif c in (ord('\n'), ord('\r')):
-			self._buy_item(weps, arms)
-		elif c == ord('i'):
-			self.open_inventory()
-		elif c == 27:  # Esc - return to castle menu
-			self.mode = 'castle_menu'
-			self.castle_menu_cursor = 0
-
-	def _buy_item(self, weps, arms) -> None:
-		"""Buy selected item (Dependency Inversion - depends on abstractions)."""
-		if self.shop_cursor < len(weps):
-			item = weps[self.shop_cursor]
-			if self.hero.spend_gold(item.cost):
-				try:
-					import copy as _copy
-					self.hero.add_weapon(_copy.deepcopy(item))
-				except Exception:
-					self.hero.add_weapon(item)
-				self.push_panel(f"You bought {item.name}.")
-				try:
-					self.hero.save_to_file(SAVE_FILE)
-				except Exception:
-					pass
-			else:
-				self.push_panel("Not enough gold.")
-		else:
-			idx = self.shop_cursor - len(weps)
-			item = arms[idx]
-			if self.hero.spend_gold(item.cost):
-				try:
-					import copy as _copy
-					self.hero.add_armor(_copy.deepcopy(item))
-				except Exception:
-					self.hero.add_armor(item)
-				self.push_panel(f"You bought {item.name}.")
-				try:
-					self.hero.save_to_file(SAVE_FILE)
-				except Exception:
-					pass
-			else:
-				self.push_panel("Not enough gold.")
-
-	def _handle_sell_mode(self, c: int) -> None:
-		"""Handle sell mode input."""
-		total_sell = len(self.hero.weapons) + len(self.hero.armors)
-
-		if c in (curses.KEY_DOWN, ord('j')):
-			self.sell_cursor = (self.sell_cursor + 1) % max(1, total_sell)
-		elif c in (curses.KEY_UP, ord('k')):
-			self.sell_cursor = (self.sell_cursor - 1) % max(1, total_sell)
-		elif c in (ord('\n'), ord('\r')):
-			self._sell_item()
-		elif c == 27:  # Esc - return to castle menu
-			self.mode = 'castle_menu'
-			self.castle_menu_cursor = 0
-
-	def _sell_item(self) -> None:
-		"""Sell selected item."""
-		if self.sell_cursor < len(self.hero.weapons):
-			w = self.hero.weapons[self.sell_cursor]
-			if self.hero.equipped_weapon is w:
-				self.push_panel("Cannot sell equipped weapon. Unequip it first.")
-				return
-			val = self.hero.sell_weapon(self.sell_cursor)
-			if val:
-				self.push_panel(f"Sold weapon for {val} gold.")
-				try:
-					self.hero.save_to_file(SAVE_FILE)
-				except Exception:
-					pass
-			else:
-				self.push_panel("Nothing to sell.")
-		else:
-			idx = self.sell_cursor - len(self.hero.weapons)
-			a = self.hero.armors[idx]
-			if self.hero.equipped_armor is a:
-				self.push_panel("Cannot sell equipped armor. Unequip it first.")
-				return
-			val = self.hero.sell_armor(idx)
-			if val:
-				self.push_panel(f"Sold armor for {val} gold.")
-				try:
-					self.hero.save_to_file(SAVE_FILE)
-				except Exception:
-					pass
-			else:
-				self.push_panel("Nothing to sell.")
-
-	def _handle_dead_mode(self, c: int) -> bool:
-		"""Handle dead mode input. Returns False if user wants to quit."""
-		if c == ord('r'):
-			self.restart()
-		elif c == ord('q'):
-			return False  # Quit
-		return True  # Continue
-
-	def _handle_inventory_mode(self, c: int) -> None:
-		"""Handle inventory mode input."""
-		if c in (curses.KEY_DOWN, ord('j')):
-			total = len(self.hero.inventory) + len(self.hero.weapons) + len(self.hero.armors)
-			if total > 0:
-				self.inventory_cursor = (self.inventory_cursor + 1) % total
-		elif c in (curses.KEY_UP, ord('k')):
-			total = len(self.hero.inventory) + len(self.hero.weapons) + len(self.hero.armors)
-			if total > 0:
-				self.inventory_cursor = (self.inventory_cursor - 1) % total
-		elif c == ord('u'):
-			self._use_item()
-		elif c == ord('e'):
-			self._equip_item()
-		elif c in (ord('i'), 27):  # 'i' or ESC key
-			self.close_inventory()
-
-	def _use_item(self) -> None:
-		"""Use selected item (only potions)."""
-		if self.inventory_cursor < len(self.hero.inventory):
-			healed = self.hero.drink_potion(self.inventory_cursor)
-			if healed is None:
-				self.push_panel("Invalid selection.")
-			else:
-				self.push_panel(f"You drink a potion and recover {healed} HP.")
-			try:
-				self.hero.save_to_file(SAVE_FILE)
-			except Exception:
-				pass
-		else:
-			self.push_panel("Cannot use this item. Only potions can be used.")
-
-	def _equip_item(self) -> None:
-		"""Equip/unequip selected item (weapons and armors)."""
-		inv_len = len(self.hero.inventory)
-		wep_len = len(self.hero.weapons)
-
-		if self.inventory_cursor < inv_len:
-			self.push_panel("Cannot equip a potion. Use 'u' to drink.")
-		elif self.inventory_cursor < inv_len + wep_len:
-			# weapon slot
-			idx = self.inventory_cursor - inv_len
-			w = self.hero.weapons[idx]
-			if self.hero.equipped_weapon is w:
-				self.hero.unequip_weapon()
-				self.push_panel(f"You unequipped {w.name}.")
-			else:
-				self.hero.equip_weapon(idx)
-				self.push_panel(f"You equipped {w.name}.")
-			try:
-				self.hero.save_to_file(SAVE_FILE)
-			except Exception:
-				pass
-		else:
-			# armor slot
-			idx = self.inventory_cursor - inv_len - wep_len
-			a = self.hero.armors[idx]
-			if self.hero.equipped_armor is a:
-				self.hero.unequip_armor()
-				self.push_panel(f"You unequipped {a.name}.")
-			else:
-				self.hero.equip_armor(idx)
-				self.push_panel(f"You equipped {a.name}.")
-			try:
-				self.hero.save_to_file(SAVE_FILE)
-			except Exception:
-				pass
+			await asyncio.sleep(self.frame_time)
 
-	def _handle_explore_mode(self, c: int) -> None:
-		"""Handle explore mode input."""
-		if c == ord('w'):
-			msg, monster = self.game.wander(self.hero)
-			self.push_exploration(msg)
-			if monster:
-				self.current_monster = monster
-				self.mode = 'combat'
-				self.animate_encounter(f"!! {monster.name.upper()} ENCOUNTER !!")
-		elif c == ord('h'):
-			self.push_exploration("Controls: w-wander, i-inventory, m-menu, h-help")
-		elif c == ord('i'):
-			self.open_inventory()
-		elif c == ord('m'):
-			self.mode = 'main_menu'
-			self.menu_cursor = 0
-
-	def _handle_combat_mode(self, c: int) -> None:
-		"""Handle combat mode input."""
-		if c == ord('a'):
-			self._attack_monster()
-		elif c == ord('r'):
-			self._attempt_flee()
-		elif c == ord('i'):
-			self.open_inventory()
-
-	def _attack_monster(self) -> None:
-		"""Attack the current monster."""
-		d = self.game.attack(self.hero, self.current_monster)
-		if d > 0:
-			self.push_exploration(f"You hit {self.current_monster.name} for {d} damage.")
-		else:
-			self.push_exploration("You miss!")
+	async def _poll_input(self) -> None:
+		import asyncio
+		while True:
+			self._on_input()
+			await asyncio.sleep(self.poll_interval)
 
-		if not self.current_monster.is_alive():
-			self._handle_monster_defeated()
-			return
+	def stop(self) -> None:
+		"""Leave run() after the current callback, as if the player had quit."""
+		if self._stop is not None:
+			self._stop.set()
 
-		# Monster's turn
-		self._monster_attack()
-
-	def _handle_monster_defeated(self) -> None:
-		"""Handle monster defeat and loot."""
-		self.push_exploration(f"{self.current_monster.name} has been defeated!")
-
-		# Handle loot
-		p = self.game.handle_loot(self.current_monster)
-		if p:
-			self.hero.add_potion(p)
-			self.push_exploration(f"You found a {p.name}!")
-
-		# Award gold
-		gold = self.game.gold_reward(self.current_monster)
-		if gold > 0:
-			self.hero.add_gold(gold)
-			self.push_exploration(f"You gained {gold} gold.")
-
-		self.mode = 'explore'
-		self.current_monster = None
-
-	def _monster_attack(self) -> None:
-		"""Monster attacks the player."""
-		md = self.game.attack(self.current_monster, self.hero)
-		if md > 0:
-			self.push_exploration(f"{self.current_monster.name} hits you for {md} damage.")
-		else:
-			self.push_exploration(f"{self.current_monster.name} misses!")
-
-		if not self.hero.is_alive():
-			self.push_exploration("You have been slain! Game over.")
-			self.push_exploration("Press 'r' to restart or 'q' to quit.")
-			self.mode = 'dead'
-			self.current_monster = None
-
-	def _attempt_flee(self) -> None:
-		"""Attempt to flee from combat."""
-		if self.game.attempt_flee(self.hero, self.current_monster):
-			self.push_exploration("You fled successfully.")
-			self.mode = 'explore'
-			self.current_monster = None
-		else:
-			self.push_exploration("Flee failed!")
-			self._monster_attack()  # Monster gets a free attack
+	def _on_input(self) -> None:
+		"""Handle every key waiting in the input buffer."""
+		while not self._stop.is_set():
+			c = self.stdscr.getch()
+			if c == -1:
+				break
+			if not self.handle_key(c):
+				self._stop.set()
+			self.request_redraw()
+
+	def _on_resize(self) -> None:
+		"""SIGWINCH: handle the KEY_RESIZE it queues (and any key behind it), then draw at the new size."""
+		self._resize_term()
+		self._on_input()
+		self.request_redraw()
+
+	def toggle_profiler(self) -> None:
+		"""Show/hide the timings overlay. Timing starts the first time and then runs until exit."""
+		self.profiler.overlay = not self.profiler.overlay
+		if self.profiler.overlay:
+			self.profiler.instrument(self)
+			self._refresh_profiler()
+
+	def _refresh_profiler(self) -> None:
+		if self.profiler.overlay:
+			# percentiles walk the histograms: computed twice a second, not on every frame
+			self._profiler_rows = self.profiler.rows()
+			self.request_redraw()
+			self.call_later(PROFILER_REFRESH, self._refresh_profiler)
+
+	def handle_key(self, c: int) -> bool:
+		"""Dispatch one key to the current mode. Returns False when the player quits."""
+		if c == PROFILER_KEY:
+			self.toggle_profiler()
+			return True
+		if c == curses.KEY_RESIZE or not self.check_bounds():
+			# the next frame picks up the new size
+			return True
+		return super().handle_key(c)
 
 
 def run_curses(hero: Entity):
 	game = Game()
+	if SAVE_FILE.startswith(STORE_SCHEME):
+		from save_store import open_saver
+		saver = open_saver(SAVE_FILE)
+	else:
+		# journaled saves: each change appends a small record instead of rewriting the whole file
+		saver = SaveManager(SAVE_FILE, journal=SaveJournal(SAVE_FILE))
+	log = MessageLog(LOG_CAPACITY, path=LOG_FILE)
+	# ESC arrives as a lone key after this many ms (curses' default of 1 s would stall the loop's input)
+	os.environ.setdefault('ESCDELAY', '25')
+	profiler = Profiler()
+	try:
+		auto_policy = parse_policy(os.environ.get('DND_AUTO', ''))
+	except ValueError as e:
+		print(f"DND_AUTO ignored, default auto-battle policy used: {e}", file=sys.stderr)
+		auto_policy = AutoPolicy()
 	def _wrapped(stdscr):
-		ui = CursesUI(stdscr, hero, game)
+		ui = CursesUI(stdscr, hero, game, saver, log, profiler=profiler)
+		ui.auto_policy = auto_policy
+		STARTUP.mark('ui_init')
+		if os.environ.get('DND_PROFILE'):
+			profiler.instrument(ui)
 		ui.mainloop()
 
-	curses.wrapper(_wrapped)
+	try:
+		curses.wrapper(_wrapped)
+	finally:
+		# flush on quit
+		saver.close()
+		log.close()
+		# after the saver: its last write is timed too
+		profiler.save(PROFILE_FILE)
+		if SAVE_FILE.startswith(STORE_SCHEME):
+			from save_store import close_stores
+			close_stores()
+		else:
+			try:
+				# the next launch reads this instead of parsing the save and replaying its journal
+				write_startup_snapshot(SAVE_FILE)
+			except (OSError, ValueError) as e:
+				print(f"Startup snapshot not written: {e}")
@@ -0,0 +1,132 @@
+"""Reusable curses widgets.
+
+`ListView` is the scrolling list used by the inventory, shop and sell panels:
+several titled sections (potions, weapons, armors...) browsed with a single
+cursor. Only the rows inside the viewport are formatted and drawn, so a list
+with thousands of entries costs the same per frame as a short one.
+"""
+import bisect
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+class Section:
+	"""A titled group of rows; `fmt` turns an item into its text and is only called for visible rows."""
+
+	def __init__(self, title: str, items: Sequence, fmt: Callable[[object], str], empty: Optional[str] = None):
+		self.title = title
+		self.items = items
+		self.fmt = fmt
+		self.empty = empty  # row shown when there are no items (None: no row)
+
+
+class ListView:
+	"""Sectioned list with one cursor over all items and a scrolling viewport.
+
+	Rows are laid out as: section title, one row per item (or the `empty`
+	row), then a blank spacer. `_offsets` (first item index of each section)
+	and `_rows` (first row of each section) are rebuilt by `set_sections`, so
+	mapping the cursor to its item or its row never walks the lists.
+	"""
+
+	def __init__(self, indent: int = 0, wrap: bool = True):
+		self.indent = indent
+		self.wrap = wrap  # moving past either end jumps to the other one
+		self.cursor = 0
+		self.top = 0  # first row shown
+		self.height = 1  # rows shown by the last draw, used for paging
+		self.sections: List[Section] = []
+		self._offsets: List[int] = [0]
+		self._rows: List[int] = [0]
+
+	def set_sections(self, sections: List[Section]) -> None:
+		"""Replace the content (call again whenever a list changes size); the cursor is clamped."""
+		self.sections = sections
+		offsets, rows = [0], [0]
+		for s in sections:
+			n = len(s.items)
+			offsets.append(offsets[-1] + n)
+			rows.append(rows[-1] + 2 + (n if n or s.empty is None else 1))
+		self._offsets, self._rows = offsets, rows
+		total = offsets[-1]
+		self.cursor = min(self.cursor, total - 1) if total else 0
+
+	def __len__(self) -> int:
+		return self._offsets[-1]
+
+	@property
+	def row_count(self) -> int:
+		# no spacer after the last section
+		return max(0, self._rows[-1] - 1)
+
+	def selection(self) -> Optional[Tuple[int, int]]:
+		"""(section index, index in that section) of the cursor, or None when the list is empty."""
+		if not len(self):
+			return None
+		s = bisect.bisect_right(self._offsets, self.cursor) - 1
+		return s, self.cursor - self._offsets[s]
+
+	def selected_item(self):
+		sel = self.selection()
+		if sel is None:
+			return None
+		s, i = sel
+		return self.sections[s].items[i]
+
+	def _item_row(self, index: int) -> int:
+		s = bisect.bisect_right(self._offsets, index) - 1
+		return self._rows[s] + 1 + index - self._offsets[s]
+
+	def move(self, delta: int) -> None:
+		total = len(self)
+		if not total:
+			return
+		if self.wrap and abs(delta) == 1:
+			self.cursor = (self.cursor + delta) % total
+		else:
+			self.cursor = max(0, min(self.cursor + delta, total - 1))
+
+	def page(self, direction: int) -> None:
+		self.move(direction * max(1, self.height - 1))
+
+	def _scroll(self, height: int) -> None:
+		"""Move the viewport the least needed to show the cursor row (and its section title when first)."""
+		max_top = max(0, self.row_count - height)
+		if len(self):
+			row = self._item_row(self.cursor)
+			s = bisect.bisect_right(self._offsets, self.cursor) - 1
+			first = self._rows[s] if self.cursor == self._offsets[s] else row
+			if first < self.top:
+				self.top = first
+			elif row >= self.top + height:
+				self.top = row - height + 1
+		self.top = max(0, min(self.top, max_top))
+
+	def _row_text(self, row: int) -> Tuple[str, bool]:
+		"""(text, is_title) of a layout row."""
+		s = bisect.bisect_right(self._rows, row) - 1
+		section = self.sections[s]
+		local = row - self._rows[s]
+		if local == 0:
+			return section.title, True
+		n = len(section.items)
+		if local <= n:
+			marker = '>' if self._offsets[s] + local - 1 == self.cursor else ' '
+			return f"{' ' * self.indent}{marker} {section.fmt(section.items[local - 1])}", False
+		if n == 0 and section.empty is not None and local == 1:
+			return f"{' ' * (self.indent + 2)}{section.empty}", False
+		return "", False
+
+	def draw(self, window, y: int, x: int, height: int, width: int, title_attr: int = 0) -> None:
+		"""Draw the visible rows in the `height` x `width` box at (y, x)."""
+		self.height = max(1, height)
+		self._scroll(self.height)
+		last = min(self.row_count, self.top + self.height)
+		for row in range(self.top, last):
+			text, is_title = self._row_text(row)
+			if text:
+				window.addstr(y + row - self.top, x, text[:width - 1], title_attr if is_title else 0)
+		# scroll hints in the right margin
+		if self.top > 0:
+			window.addstr(y, x + width - 1, '↑')
+		if last < self.row_count:
+			window.addstr(y + self.height - 1, x + width - 1, '↓')